@@ -0,0 +1,102 @@
+import asyncio
+import hmac
+import logging
+import threading
+from typing import Optional
+from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse
+from app.core import profiling
+from app.core.config import settings
+from app.utils.fastjson import FastJSONResponse
+
+router = APIRouter(prefix="/debug")
+logger = logging.getLogger("payloadbridge")
+
+DEBUG_TOKEN_HEADER = "X-Debug-Token"
+
+# One profile at a time: concurrent samplers would only slow the process they are measuring
+_profiling = False
+
+
+def enabled() -> bool:
+    return settings.DEBUG_ENDPOINTS_ENABLED and bool(settings.DEBUG_TOKEN)
+
+
+def _check_access(request: Request) -> Optional[FastJSONResponse]:
+    if not enabled():
+        return FastJSONResponse(status_code=404, content={"error": "Not found"})
+    token = request.headers.get(DEBUG_TOKEN_HEADER, "")
+    if not hmac.compare_digest(token.encode(), settings.DEBUG_TOKEN.encode()):
+        logger.warning("Rejected debug request to %s", request.url.path)
+        return FastJSONResponse(status_code=401, content={"error": f"Missing or invalid {DEBUG_TOKEN_HEADER} header"})
+    return None
+
+
+@router.get("/profile")
+async def profile(request: Request, seconds: float = 10.0, interval: float = 0.005, threads: str = "loop", idle: bool = False):
+    # Samples stacks for `seconds` and returns them collapsed ("frame;frame;... count"), ready for flamegraph.pl or
+    # speedscope. threads=loop profiles the event loop thread; threads=all adds the worker and logging threads.
+    # Idle samples (threads waiting in select/queues) are left out unless idle=true.
+    global _profiling
+    error = _check_access(request)
+    if error:
+        return error
+    if not 0 < seconds <= settings.DEBUG_PROFILE_MAX_SECONDS or threads not in ("loop", "all"):
+        return FastJSONResponse(status_code=422, content={"error": "Invalid input",
+                                                          "details": f"seconds must be in (0, {settings.DEBUG_PROFILE_MAX_SECONDS:g}] and threads loop or all"})
+    if _profiling:
+        return FastJSONResponse(status_code=409, content={"error": "A profile is already running"})
+    _profiling = True
+    try:
+        thread_ids = [threading.get_ident()] if threads == "loop" else None
+        logger.info("Profiling %s thread(s) for %.1fs", threads, seconds)
+        stacks = await asyncio.to_thread(profiling.sample_stacks, seconds, min(1.0, max(0.001, interval)), thread_ids, idle)
+    finally:
+        _profiling = False
+    return PlainTextResponse(profiling.collapsed(stacks), headers={"X-Profile-Samples": str(sum(stacks.values()))})
+
+
+@router.get("/loop")
+async def loop_stalls(request: Request):
+    error = _check_access(request)
+    if error:
+        return error
+    monitor = profiling.loop_monitor()
+    if monitor is None:
+        return FastJSONResponse(status_code=404, content={"error": "Loop monitor not running"})
+    return FastJSONResponse(status_code=200, content=monitor.snapshot())
+
+
+@router.post("/memory")
+async def memory_start(request: Request, frames: int = 25):
+    # Starts tracemalloc (if needed) and takes the baseline that GET /debug/memory diffs against
+    error = _check_access(request)
+    if error:
+        return error
+    frames = min(100, max(1, frames))
+    await asyncio.to_thread(profiling.memory.start, frames)
+    return FastJSONResponse(status_code=200, content={"status": "tracing", "frames": frames})
+
+
+@router.get("/memory")
+async def memory_diff(request: Request, top: int = 25, group_by: str = "lineno", rebase: bool = False):
+    error = _check_access(request)
+    if error:
+        return error
+    if group_by not in ("lineno", "filename", "traceback"):
+        return FastJSONResponse(status_code=422, content={"error": "Invalid input", "details": "group_by must be lineno, filename or traceback"})
+    # Snapshots of a large heap take a while; keep them off the event loop. None: not running, or stopped meanwhile
+    diff = await asyncio.to_thread(profiling.memory.diff, min(100, max(1, top)), group_by, rebase)
+    if diff is None:
+        return FastJSONResponse(status_code=409, content={"error": "tracemalloc is not running; POST /debug/memory first"})
+    return FastJSONResponse(status_code=200, content=diff)
+
+
+@router.delete("/memory")
+async def memory_stop(request: Request):
+    error = _check_access(request)
+    if error:
+        return error
+    # Waits for a diff in progress
+    await asyncio.to_thread(profiling.memory.stop)
+    return FastJSONResponse(status_code=200, content={"status": "stopped"})
@@ -1,100 +1,378 @@
-router = APIRouter()
-logger = logging.getLogger("payloadbridge")
-
-@router.get("/healthcheck")
-async def healthcheck():
-    return {"status": "ok"}
-@router.get("/healthcheck")
-async def healthcheck():
-    return {"status": "ok"}
 from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import JSONResponse
-from app.models.order_line import OrderPayload
-from app.services.auth_utils import get_okta_headers
+from fastapi.responses import PlainTextResponse
+from app.utils.fastjson import FastJSONResponse
+from app.utils import fastjson
+from app.models.order_schema import validate_order
+from app.services.auth_utils import caller_key, get_okta_headers
+from app.services import admission, capture, idempotency, mapping, reference_data, validation_pool
+from app.services.batch import mapped, run_batch
+from app.services.bridge import send_order
+from app.services.chunking import forward_order
+from app.services.jobs import get_job_queue
+from app.services.line_rules import Violation, get_rule_engine, recvue_failure
+from app.services.streaming import parse_streamed_order, streamed_order_body, validation_details, validate_header
+from app.utils.ndjson import iter_ndjson_lines
+from app.utils.validators import validation_message
+from app.core import deadline, log, metrics, tracing
 from app.core.config import settings
-import httpx
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 import logging
 import uuid
 import re
-from app.core.config import settings
 
 router = APIRouter()
 logger = logging.getLogger("payloadbridge")
-logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO))
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+@router.get("/healthcheck")
+async def healthcheck():
+    return {"status": "ok"}
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    if not settings.METRICS_ENABLED:
+        return FastJSONResponse(status_code=404, content={"error": "Metrics disabled"})
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+def _check_auth_headers(request: Request, request_id: str) -> Tuple[Optional[str], Optional[str], Optional[FastJSONResponse]]:
+    headers = request.headers
+    access_token = headers.get("access_token")
+    host_name = headers.get("hostName")
+    if not access_token:
+        logger.error("Missing access_token header")
+        return None, None, FastJSONResponse(status_code=400, content={"error": "Missing access_token header", "request_id": request_id})
+    if not host_name:
+        logger.error("Missing hostName header")
+        return None, None, FastJSONResponse(status_code=400, content={"error": "Missing hostName header", "request_id": request_id})
+    # Validate hostName format (simple domain check)
+    if not re.match(r"^[a-zA-Z0-9.-]+$", host_name):
+        logger.error("Invalid hostName format: %s", host_name)
+        return None, None, FastJSONResponse(status_code=400, content={"error": "Invalid hostName format", "request_id": request_id})
+    return access_token, host_name, None
+
+async def _authorize(access_token: str, host_name: str, request_id: str) -> Tuple[Optional[Dict[str, str]], Optional[FastJSONResponse]]:
+    try:
+        with metrics.stage("authorize"), tracing.span("authorize"):
+            okta_headers = await get_okta_headers(access_token, host_name)
+        metrics.set_tenant(okta_headers.get("tenantIdentifier"))
+        capture.set_tenant(okta_headers.get("tenantIdentifier"))
+        log.bind(tenant=okta_headers.get("tenantIdentifier"))
+        return okta_headers, None
+    except HTTPException as e:
+        logger.error("Auth error: %s", e.detail)
+        return None, FastJSONResponse(status_code=e.status_code, content={"error": "Auth error", "details": e.detail, "request_id": request_id})
+    except Exception as e:
+        logger.error("Auth error: %s", e)
+        return None, FastJSONResponse(status_code=500, content={"error": "Auth error", "details": str(e), "request_id": request_id})
+
+def _map_order(source: str, body: Any, request_id: str) -> Tuple[Any, Optional[bytes], Optional[FastJSONResponse]]:
+    # Orders in another source's shape are mapped to the RecVue schema by that source's compiled spec, and the
+    # mapped order is what gets validated, hashed and forwarded
+    transform = mapping.get_mapping(source)
+    if transform is None:
+        logger.error("Unknown payload source: %s", source)
+        return None, None, FastJSONResponse(status_code=400, content={"error": f"Unknown {mapping.SOURCE_HEADER}", "details": source, "request_id": request_id})
+    try:
+        with metrics.stage("map"), tracing.span("map", source=source):
+            body = transform(body)
+            return body, fastjson.dumps(body), None
+    except mapping.MappingError as e:
+        logger.error("Mapping error (%s): %s", source, e)
+        return None, None, FastJSONResponse(status_code=422, content={"error": "Mapping error", "details": str(e), "request_id": request_id})
 
 @router.post("/invoke_order_creation")
 async def invoke_order_creation(request: Request):
+    # With CAPTURE_ENABLED, sampled orders are recorded with their outcome for benchmarks/replay.py
+    recording = capture.begin()
+    response = await _invoke_order_creation(request)
+    if recording is not None:
+        capture.finish(recording, request.url.path, request.headers, response.status_code)
+    return response
+
+async def _invoke_order_creation(request: Request):
     request_id = str(uuid.uuid4())
-    tenant = None
+    log.bind(request_id=request_id)
+    deadline.start(deadline.from_headers(request.headers, settings.REQUEST_DEADLINE))
     try:
-        body = await request.json()
-        headers = request.headers
-
-        access_token = headers.get("access_token")
-        host_name = headers.get("hostName")
-        if not access_token:
-            logger.error(f"[{request_id}] Missing access_token header")
-            return JSONResponse(status_code=400, content={"error": "Missing access_token header", "request_id": request_id})
-        if not host_name:
-            logger.error(f"[{request_id}] Missing hostName header")
-            return JSONResponse(status_code=400, content={"error": "Missing hostName header", "request_id": request_id})
-        # Validate hostName format (simple domain check)
-        if not re.match(r"^[a-zA-Z0-9.-]+$", host_name):
-            logger.error(f"[{request_id}] Invalid hostName format: {host_name}")
-            return JSONResponse(status_code=400, content={"error": "Invalid hostName format", "request_id": request_id})
-
-        # Validate payload
-        try:
-            order = OrderPayload(**body)
-        except Exception as e:
-            logger.error(f"[{request_id}] Validation error: {e}")
-            return JSONResponse(status_code=422, content={"error": "Invalid input", "details": str(e), "request_id": request_id})
+        # Keep the raw bytes: they are validated once and forwarded verbatim on every attempt
+        with metrics.stage("parse"), tracing.span("parse"):
+            raw_body = await request.body()
+            body = fastjson.loads(raw_body)
+        capture.note_body(body, len(raw_body))
+        source = request.headers.get(mapping.SOURCE_HEADER)
+        if source:
+            body, raw_body, error = _map_order(source, body, request_id)
+            if error:
+                return error
+        lines = body.get("orderLines") if isinstance(body, dict) else None
+        _observe_order(request, raw_body, len(lines) if isinstance(lines, list) else None)
 
-        # Get Okta/RecVue headers
-        try:
-            okta_headers = await get_okta_headers(access_token, host_name)
-        except HTTPException as e:
-            logger.error(f"[{request_id}] Auth error: {e.detail}")
-            return JSONResponse(status_code=e.status_code, content={"error": "Auth error", "details": e.detail, "request_id": request_id})
-        except Exception as e:
-            logger.error(f"[{request_id}] Auth error: {e}")
-            return JSONResponse(status_code=500, content={"error": "Auth error", "details": str(e), "request_id": request_id})
+        access_token, host_name, error = _check_auth_headers(request, request_id)
+        if error:
+            return error
+
+        # Replayed/retried submissions of the same order are answered from the idempotency store
+        digest = idempotency.content_hash(body)
+        key = idempotency.request_key(access_token, host_name, digest, request.headers.get("Idempotency-Key"))
+        return await idempotency.run_once(key, digest, request_id,
+                                          lambda: _create_order(body, raw_body, access_token, host_name, request_id))
+    except Exception as e:
+        logger.critical("Unhandled error: %s", e, exc_info=True)
+        return FastJSONResponse(status_code=500, content={"error": "Internal server error", "details": str(e), "request_id": request_id})
+
+async def _validate_order(body: Union[Dict[str, Any], bytes], raw_body: bytes, request_id: str) -> Tuple[Optional[int], Optional[FastJSONResponse]]:
+    # Returns the order's line count; large orders are validated in the process pool to keep the event loop free
+    if validation_pool.should_offload(len(raw_body)):
+        with metrics.stage("validate"), tracing.span("validate", schema_mode=settings.ORDER_SCHEMA_MODE, offloaded=True):
+            outcome, details, line_count = await validation_pool.check_order_offloaded(raw_body)
+        if outcome == validation_pool.INVALID:
+            return None, _invalid_order(details, request_id)
+        if outcome == validation_pool.RULE_VIOLATIONS:
+            return None, _rule_violations(details, request_id)
+        return line_count, None
+
+    try:
+        with metrics.stage("validate"), tracing.span("validate", schema_mode=settings.ORDER_SCHEMA_MODE):
+            order = validate_order(body)
+    except Exception as e:
+        return None, _invalid_order(validation_message(e), request_id)
+
+    # lineType-driven field rules, reported together in RecVue's error format
+    with metrics.stage("rules"), tracing.span("rules"):
+        violations = get_rule_engine().check_order(order, order.hdrIntent)
+    if violations:
+        return None, _rule_violations(violations, request_id)
+    return len(order.orderLines), None
+
+def _invalid_order(details: str, request_id: str) -> FastJSONResponse:
+    logger.error("Validation error: %s", details)
+    return FastJSONResponse(status_code=422, content={"error": "Invalid input", "details": details, "request_id": request_id})
 
+def _rule_violations(violations: List[Violation], request_id: str) -> FastJSONResponse:
+    logger.error("lineType rule violations: %d", len(violations))
+    return idempotency.not_stored(FastJSONResponse(status_code=422, content={**recvue_failure(violations), "request_id": request_id}))
+
+def _check_reference_data(okta_headers: Dict[str, str], order: Any, request_id: str) -> Optional[FastJSONResponse]:
+    # Lookup-backed fields (order type, business unit, customer accounts, ...) against the tenant's reference data
+    if not reference_data.enabled():
+        return None
+    with metrics.stage("reference"), tracing.span("reference"):
+        violations = reference_data.check_order(okta_headers.get("tenantIdentifier"), order)
+    if not violations:
+        return None
+    logger.error("Reference data violations: %d", len(violations))
+    return idempotency.not_stored(FastJSONResponse(status_code=422, content={**recvue_failure(violations), "request_id": request_id}))
+
+async def _create_order(body: Any, raw_body: bytes, access_token: str, host_name: str, request_id: str) -> FastJSONResponse:
+    # The body is already decoded for the idempotency hash, so validate the dict rather than re-parsing the bytes
+    line_count, error = await _validate_order(body, raw_body, request_id)
+    if error:
+        return error
+
+    # Get Okta/RecVue headers
+    okta_headers, error = await _authorize(access_token, host_name, request_id)
+    if error:
+        return error
+    error = _check_reference_data(okta_headers, body, request_id)
+    if error:
+        return error
+
+    # Forward payload to RecVue (in line chunks when the order is large), once admission control lets it through
+    try:
+        async with admission.admit(okta_headers.get("tenantIdentifier"), line_count):
+            status_code, content = await forward_order(raw_body, okta_headers, request_id, body)
+    except admission.Rejected as e:
+        return _shed(e, request_id)
+    return FastJSONResponse(status_code=status_code, content=content)
+
+def _shed(e: admission.Rejected, request_id: str) -> FastJSONResponse:
+    return FastJSONResponse(status_code=e.status_code, headers={"Retry-After": e.retry_after_header()}, content=e.content(request_id))
+
+@router.post("/invoke_order_creation/async", status_code=202)
+async def invoke_order_creation_async(request: Request):
+    # Validates and authorizes synchronously, then queues the RecVue POST; poll GET /jobs/{job_id} for the result
+    request_id = str(uuid.uuid4())
+    log.bind(request_id=request_id)
+    if not settings.JOBS_ENABLED:
+        return _jobs_disabled(request_id)
+    deadline.start(deadline.from_headers(request.headers, settings.REQUEST_DEADLINE))
+    try:
+        with metrics.stage("parse"), tracing.span("parse"):
+            raw_body = await request.body()
+        source = request.headers.get(mapping.SOURCE_HEADER)
+        if source:
+            _, raw_body, error = _map_order(source, fastjson.loads(raw_body), request_id)
+            if error:
+                return error
+
+        access_token, host_name, error = _check_auth_headers(request, request_id)
+        if error:
+            return error
+        line_count, error = await _validate_order(raw_body, raw_body, request_id)
+        if error:
+            return error
+        _observe_order(request, raw_body, line_count)
+        okta_headers, error = await _authorize(access_token, host_name, request_id)
+        if error:
+            return error
+        error = _check_reference_data(okta_headers, raw_body, request_id)
+        if error:
+            return error
+
+        job_id = await get_job_queue().submit(raw_body, okta_headers, _job_caller(access_token, host_name))
+        logger.info("Queued job %s", job_id, extra={"job_id": job_id})
+        return FastJSONResponse(status_code=202, headers={"Location": f"/jobs/{job_id}"},
+                                content={"job_id": job_id, "status": "queued", "request_id": request_id})
+    except Exception as e:
+        logger.critical("Unhandled error: %s", e, exc_info=True)
+        return FastJSONResponse(status_code=500, content={"error": "Internal server error", "details": str(e), "request_id": request_id})
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request):
+    request_id = str(uuid.uuid4())
+    log.bind(request_id=request_id, job_id=job_id)
+    if not settings.JOBS_ENABLED:
+        return _jobs_disabled(request_id)
+    access_token, host_name, error = _check_auth_headers(request, request_id)
+    if error:
+        return error
+    # Jobs are only visible to the caller (token + hostName) that submitted them
+    job = await get_job_queue().get(job_id, _job_caller(access_token, host_name))
+    if job is None:
+        return FastJSONResponse(status_code=404, content={"error": "Job not found", "request_id": request_id})
+    return FastJSONResponse(status_code=200, content=job)
+
+def _jobs_disabled(request_id: str) -> FastJSONResponse:
+    return FastJSONResponse(status_code=404, content={"error": "Async jobs are disabled", "request_id": request_id})
+
+def _observe_order(request: Request, raw_body: bytes, line_count: Optional[int]) -> None:
+    metrics.observe_payload(request.url.path, len(raw_body), line_count)
+
+def _job_caller(access_token: str, host_name: str) -> str:
+    return ":".join(caller_key(access_token, host_name))
+
+@router.post("/invoke_order_creation/batch")
+async def invoke_order_creation_batch(request: Request):
+    # Accepts a JSON array of orders, or NDJSON (one order per line) which is consumed incrementally
+    batch_id = str(uuid.uuid4())
+    log.bind(request_id=batch_id, batch_id=batch_id)
+    deadline.start(deadline.from_headers(request.headers))
+    try:
+        access_token, host_name, error = _check_auth_headers(request, batch_id)
+        if error:
+            return error
+
+        # Authorize once for the whole batch
+        okta_headers, error = await _authorize(access_token, host_name, batch_id)
+        if error:
+            return error
         tenant = okta_headers.get("tenantIdentifier")
 
-        # Forward payload to RecVue
-        recvue_url = f"https://{tenant}.recvue.com/api/v2.0/order/orderlines"
-        max_retries = 2
-        for attempt in range(max_retries + 1):
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type in NDJSON_CONTENT_TYPES:
+            records = iter_ndjson_lines(request.stream(), settings.NDJSON_MAX_RECORD_BYTES)
+        else:
             try:
-                async with httpx.AsyncClient() as client:
-                    resp = await client.post(recvue_url, json=body, headers=okta_headers, timeout=settings.TIMEOUT)
-                    log_msg = f"[{request_id}] RecVue response: {resp.status_code}"
-                    if tenant:
-                        log_msg += f" tenant={tenant}"
-                    logger.info(log_msg)
-                    try:
-                        content = resp.json()
-                    except Exception:
-                        content = {"error": "RecVue returned non-JSON response", "raw": resp.text}
-                    return JSONResponse(status_code=resp.status_code, content={"recvue": content, "request_id": request_id, "tenant": tenant})
-            except (httpx.RequestError, httpx.HTTPStatusError) as e:
-                log_msg = f"[{request_id}] RecVue API attempt {attempt+1} failed: {e}"
-                if tenant:
-                    log_msg += f" tenant={tenant}"
-                logger.warning(log_msg)
-                if attempt == max_retries:
-                    if isinstance(e, httpx.HTTPStatusError):
-                        return JSONResponse(status_code=e.response.status_code, content={"error": "RecVue error", "details": str(e), "request_id": request_id, "tenant": tenant})
-                    else:
-                        return JSONResponse(status_code=502, content={"error": "RecVue unreachable", "details": str(e), "request_id": request_id, "tenant": tenant})
-            except Exception as e:
-                log_msg = f"[{request_id}] Downstream error: {e}"
-                if tenant:
-                    log_msg += f" tenant={tenant}"
-                logger.error(log_msg)
-                if attempt == max_retries:
-                    return JSONResponse(status_code=500, content={"error": "Failed to reach RecVue API", "details": str(e), "request_id": request_id, "tenant": tenant})
+                orders = fastjson.loads(await request.body())
+            except ValueError as e:
+                return FastJSONResponse(status_code=400, content={"error": "Invalid JSON", "details": str(e), "request_id": batch_id})
+            if not isinstance(orders, list):
+                return FastJSONResponse(status_code=422, content={"error": "Invalid input", "details": "Batch body must be a JSON array of orders", "request_id": batch_id})
+            if len(orders) > settings.BATCH_MAX_ORDERS:
+                return FastJSONResponse(status_code=413, content={"error": f"Batch exceeds {settings.BATCH_MAX_ORDERS} orders", "request_id": batch_id})
+            records = _iter_list(orders)
+        process_record = None
+        source = request.headers.get(mapping.SOURCE_HEADER)
+        if source:
+            transform = mapping.get_mapping(source)
+            if transform is None:
+                logger.error("Unknown payload source: %s", source)
+                return FastJSONResponse(status_code=400, content={"error": f"Unknown {mapping.SOURCE_HEADER}", "details": source, "request_id": batch_id})
+            process_record = mapped(transform)
+
+        try:
+            results = await run_batch(records, okta_headers, batch_id, settings.BATCH_MAX_CONCURRENCY, settings.BATCH_MAX_ORDERS,
+                                      process_record=process_record)
+        except ValueError as e:
+            logger.error("Batch body error: %s", e)
+            return FastJSONResponse(status_code=400, content={"error": "Invalid batch body", "details": str(e), "request_id": batch_id})
+
+        succeeded = sum(1 for r in results if 200 <= r["status_code"] < 300)
+        logger.info("Batch processed: %d/%d succeeded", succeeded, len(results))
+        # 207 signals partial (or total) failure; inspect per-order status_code
+        return FastJSONResponse(
+            status_code=200 if succeeded == len(results) else 207,
+            content={"request_id": batch_id, "tenant": tenant, "total": len(results), "succeeded": succeeded,
+                     "failed": len(results) - succeeded, "results": results},
+        )
+    except Exception as e:
+        logger.critical("Unhandled error: %s", e, exc_info=True)
+        return FastJSONResponse(status_code=500, content={"error": "Internal server error", "details": str(e), "request_id": batch_id})
+
+async def _iter_list(items) -> AsyncIterator[Any]:
+    # Pops as it goes so dispatched orders can be garbage collected
+    items.reverse()
+    while items:
+        yield items.pop()
+
+@router.post("/invoke_order_creation/stream")
+async def invoke_order_creation_stream(request: Request):
+    # Reads the body incrementally and validates every order line as it arrives, so peak memory is bounded
+    # by one order. NDJSON bodies carry one order per line; a JSON body is a single (large) order.
+    request_id = str(uuid.uuid4())
+    log.bind(request_id=request_id)
+    deadline.start(deadline.from_headers(request.headers))
+    try:
+        access_token, host_name, error = _check_auth_headers(request, request_id)
+        if error:
+            return error
+
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type in NDJSON_CONTENT_TYPES:
+            okta_headers, error = await _authorize(access_token, host_name, request_id)
+            if error:
+                return error
+            tenant = okta_headers.get("tenantIdentifier")
+            records = iter_ndjson_lines(request.stream(), settings.NDJSON_MAX_RECORD_BYTES)
+            try:
+                # Each record is validated and forwarded exactly as a /batch NDJSON record is
+                results = await run_batch(records, okta_headers, request_id, settings.BATCH_MAX_CONCURRENCY,
+                                          settings.BATCH_MAX_ORDERS)
+            except ValueError as e:
+                logger.error("Stream body error: %s", e)
+                return FastJSONResponse(status_code=400, content={"error": "Invalid stream body", "details": str(e), "request_id": request_id})
+            succeeded = sum(1 for r in results if 200 <= r["status_code"] < 300)
+            logger.info("Stream processed: %d/%d succeeded", succeeded, len(results))
+            return FastJSONResponse(
+                status_code=200 if succeeded == len(results) else 207,
+                content={"request_id": request_id, "tenant": tenant, "total": len(results), "succeeded": succeeded,
+                         "failed": len(results) - succeeded, "results": results},
+            )
+
+        try:
+            header, lines = await parse_streamed_order(request.stream(), settings.NDJSON_MAX_RECORD_BYTES)
+        except ValueError as e:
+            logger.error("Stream body error: %s", e)
+            return FastJSONResponse(status_code=400, content={"error": "Invalid JSON", "details": str(e), "request_id": request_id})
+        header_errors = validate_header(header, lines)
+        if header_errors or lines.error_count:
+            logger.error("Validation failed: %d header, %d line errors", len(header_errors), lines.error_count)
+            return FastJSONResponse(status_code=422, content={"error": "Invalid input", "details": validation_details(header_errors, lines), "request_id": request_id})
+
+        okta_headers, error = await _authorize(access_token, host_name, request_id)
+        if error:
+            return error
+        # Header fields only: the lines were kept as raw text while streaming
+        error = _check_reference_data(okta_headers, header, request_id)
+        if error:
+            return error
+        try:
+            async with admission.admit(okta_headers.get("tenantIdentifier"), lines.count):
+                status_code, content = await send_order(streamed_order_body(header, lines), okta_headers, request_id)
+        except admission.Rejected as e:
+            return _shed(e, request_id)
+        return FastJSONResponse(status_code=status_code, content=content)
     except Exception as e:
-        logger.critical(f"[{request_id}] Unhandled error: {e}")
-        return JSONResponse(status_code=500, content={"error": "Internal server error", "details": str(e), "request_id": request_id})
\ No newline at end of file
+        logger.critical("Unhandled error: %s", e, exc_info=True)
+        return FastJSONResponse(status_code=500, content={"error": "Internal server error", "details": str(e), "request_id": request_id})
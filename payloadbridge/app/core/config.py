@@ -1,4 +1,5 @@
-from pydantic import BaseSettings
+from typing import Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     AUTHORIZE_URL_BASE: str
@@ -6,8 +7,206 @@ class Settings(BaseSettings):
     RECVUE_API_TOKEN: str
     TIMEOUT: int = 30
     LOG_LEVEL: str = "INFO"
+    # json or text; LOG_RATE_LIMIT records per message template per LOG_RATE_WINDOW seconds (0 = unlimited)
+    LOG_FORMAT: str = "json"
+    LOG_RATE_LIMIT: int = 20
+    LOG_RATE_WINDOW: float = 1.0
+    # Per-tenant RecVue order-lines endpoint; overridable to point at a staging or local stand-in
+    RECVUE_ORDERLINES_URL_TEMPLATE: str = "https://{tenant}.recvue.com/api/v2.0/order/orderlines"
 
-    class Config:
-        env_file = ".env"
+    # Shared outbound HTTP client pool (RecVue + /authorize)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP2_ENABLED: bool = False
 
-settings = Settings()
\ No newline at end of file
+    # /authorize result cache (seconds / entries); a TTL of 0 disables caching
+    AUTH_CACHE_TTL: float = 300.0
+    AUTH_CACHE_MAX_SIZE: int = 1024
+    AUTH_CACHE_NEGATIVE_TTL: float = 10.0
+
+    # Request bodies with Content-Encoding gzip, deflate or br (br needs the brotli package) are decompressed as
+    # they are read, up to REQUEST_MAX_DECOMPRESSED_BYTES; responses of at least RESPONSE_GZIP_MIN_BYTES are gzipped
+    # for clients that accept it (0 = never)
+    REQUEST_MAX_DECOMPRESSED_BYTES: int = 256 * 1024 * 1024
+    RESPONSE_GZIP_MIN_BYTES: int = 1024
+
+    # Outgoing RecVue bodies of at least RECVUE_GZIP_MIN_BYTES are gzipped for the tenants in RECVUE_GZIP_TENANTS
+    # (comma-separated, * for all); a tenant that answers 415 is sent uncompressed bodies from then on
+    RECVUE_GZIP_TENANTS: str = ""
+    RECVUE_GZIP_MIN_BYTES: int = 64 * 1024
+    RECVUE_GZIP_LEVEL: int = 5
+
+    # /invoke_order_creation/batch
+    BATCH_MAX_CONCURRENCY: int = 8
+    BATCH_MAX_ORDERS: int = 1000
+    NDJSON_MAX_RECORD_BYTES: int = 16 * 1024 * 1024
+
+    # Duplicate-submission suppression for /invoke_order_creation
+    IDEMPOTENCY_ENABLED: bool = True
+    IDEMPOTENCY_TTL: float = 600.0
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000
+    # With a shared cache, how long another worker waits on a submission that is still being processed
+    IDEMPOTENCY_LEASE: float = 120.0
+
+    # Per-tenant RecVue protection: circuit breaker, adaptive (AIMD) concurrency limit, retry backoff
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_RESET_TIMEOUT: float = 30.0
+    BREAKER_HALF_OPEN_MAX_CALLS: int = 1
+    LIMITER_INITIAL: int = 20
+    LIMITER_MIN: int = 1
+    LIMITER_MAX: int = 200
+    LIMITER_LATENCY_TARGET: float = 5.0
+    LIMITER_BACKOFF_RATIO: float = 0.7
+    LIMITER_MAX_WAIT: float = 10.0
+
+    # Admission control in front of the RecVue forwarding path. An order costs 1 + lines / ADMISSION_LINES_PER_UNIT
+    # units and at most ADMISSION_CAPACITY units are forwarded at once; the rest wait in a weighted fair queue across
+    # tenants (ADMISSION_TENANT_WEIGHTS, "tenant=weight,...", default 1) for up to ADMISSION_MAX_WAIT seconds, and are
+    # shed with 503 + Retry-After once ADMISSION_MAX_QUEUE are waiting or their estimated wait is longer. With
+    # ADMISSION_TENANT_RATE > 0 each tenant gets a token bucket of that many units/s (ADMISSION_TENANT_BURST); orders
+    # it can't cover within the wait get 429 + Retry-After
+    ADMISSION_ENABLED: bool = False
+    ADMISSION_CAPACITY: float = 50.0
+    ADMISSION_LINES_PER_UNIT: int = 100
+    ADMISSION_MAX_QUEUE: int = 1000
+    ADMISSION_MAX_WAIT: float = 5.0
+    ADMISSION_TENANT_RATE: float = 0.0
+    ADMISSION_TENANT_BURST: float = 100.0
+    ADMISSION_TENANT_WEIGHTS: str = ""
+    RETRY_BACKOFF_BASE: float = 0.2
+    RETRY_BACKOFF_MAX: float = 5.0
+
+    # End-to-end deadline for /invoke_order_creation(/async) in seconds (0 = none); an X-Request-Timeout header
+    # overrides it (and sets one for batch/stream requests). /authorize gets at most DEADLINE_AUTHORIZE_SHARE of what
+    # is left, RecVue attempts get what remains, and no attempt is started with less than DEADLINE_MIN_ATTEMPT left
+    REQUEST_DEADLINE: float = 60.0
+    REQUEST_DEADLINE_MAX: float = 300.0
+    DEADLINE_AUTHORIZE_SHARE: float = 0.25
+    DEADLINE_MIN_ATTEMPT: float = 0.2
+
+    # Hedged requests: idempotent calls (GET /authorize, chunk PUTs; POST only with HEDGE_POST) still running after
+    # the observed HEDGE_QUANTILE latency get a second attempt, and the slower one is cancelled
+    HEDGE_ENABLED: bool = False
+    HEDGE_POST: bool = False
+    HEDGE_QUANTILE: float = 0.95
+    HEDGE_MIN_SAMPLES: int = 20
+    HEDGE_MIN_DELAY: float = 0.05
+
+    # Multi-worker mode (python -m app.server or gunicorn -c gunicorn.conf.py). With SHARED_CACHE_PATH set, the
+    # /authorize cache, idempotency results and open circuit breakers live in that SQLite file and are shared by
+    # every worker on the host
+    SHARED_CACHE_PATH: Optional[str] = None
+    JOBS_RECOVER_ON_STARTUP: bool = True
+
+    # Orders of at least VALIDATION_OFFLOAD_BYTES are validated in a pool of VALIDATION_PROCESSES processes so the
+    # event loop stays responsive (0 = validate inline)
+    VALIDATION_PROCESSES: int = 0
+    VALIDATION_OFFLOAD_BYTES: int = 1024 * 1024
+
+    # Async job mode (/invoke_order_creation/async + /jobs/{id}), 404 unless JOBS_ENABLED. JOBS_DB_PATH defaults to
+    # payloadbridge/jobs.sqlite3 under $XDG_STATE_HOME (~/.local/state), in a directory private to the service user
+    JOBS_ENABLED: bool = False
+    JOBS_DB_PATH: Optional[str] = None
+    # Fernet key (needs the cryptography package) encrypting the caller's bearer token while a job is queued. Without
+    # one a key is generated per run, and jobs still queued across a restart fail with 401 for the caller to resubmit
+    JOBS_TOKEN_KEY: str = ""
+    JOBS_WORKERS: int = 4
+    JOBS_POLL_INTERVAL: float = 1.0
+    JOBS_RETENTION: float = 7 * 24 * 3600.0
+
+    # Orders with more than ORDER_CHUNK_LINES lines are created with the first chunk (POST) and extended with the
+    # remaining chunks (PUT); 0 disables chunking
+    ORDER_CHUNK_LINES: int = 0
+    ORDER_CHUNK_CONCURRENCY: int = 4
+    ORDER_CHUNK_RETRIES: int = 2
+
+    # core: only the core order fields; lazy: full RecVue schema, attribute families (hdrAttribute1V..) checked on demand;
+    # full: full schema with attribute families checked on every request
+    ORDER_SCHEMA_MODE: str = "lazy"
+
+    # Per-lineType rule table; defaults to app/rules/line_type_rules.json
+    LINE_TYPE_RULES_FILE: Optional[str] = None
+
+    # Payload mapping specs (YAML, or JSON without PyYAML), one per source; requests with an X-Payload-Source header
+    # are mapped from that source's shape to the RecVue order schema before validation. Defaults to app/mappings
+    MAPPINGS_DIR: Optional[str] = None
+
+    # Lookup-backed fields (orderType, businessUnit, customer accounts, priceList, ...) are checked against per-tenant
+    # reference data before the RecVue call. REFERENCE_DATA_SOURCE is a JSON file or an http(s) URL, with {tenant}
+    # replaced by the tenant (empty = off). Data older than REFERENCE_DATA_TTL seconds is reloaded in the background
+    # and served meanwhile for up to REFERENCE_DATA_MAX_STALE more; failed loads are retried after
+    # REFERENCE_DATA_RETRY. REFERENCE_DATA_TENANTS (comma-separated) are loaded at startup, others on first use
+    REFERENCE_DATA_SOURCE: str = ""
+    REFERENCE_DATA_TENANTS: str = ""
+    REFERENCE_DATA_TTL: float = 900.0
+    REFERENCE_DATA_MAX_STALE: float = 24 * 3600.0
+    REFERENCE_DATA_RETRY: float = 30.0
+
+    # Prometheus /metrics endpoint and request instrumentation
+    METRICS_ENABLED: bool = True
+
+    # OpenTelemetry tracing (needs opentelemetry-sdk). TRACE_EXPORTER: otlp, console or memory. TRACE_SAMPLE_RATIO
+    # is applied at the start of a trace, or with TRACE_TAIL_SAMPLING once it ends (failed traces and traces slower
+    # than TRACE_TAIL_LATENCY seconds are then always kept)
+    TRACING_ENABLED: bool = False
+    TRACE_EXPORTER: str = "otlp"
+    TRACE_SAMPLE_RATIO: float = 1.0
+    TRACE_TAIL_SAMPLING: bool = False
+    TRACE_TAIL_LATENCY: float = 1.0
+    TRACE_SERVICE_NAME: str = "payloadbridge"
+
+    # Operator debug endpoints (/debug/profile, /debug/loop, /debug/memory): 404 unless DEBUG_ENDPOINTS_ENABLED and
+    # DEBUG_TOKEN are set, and 401 without a matching X-Debug-Token header. While they are enabled an event-loop
+    # monitor records every time the loop is blocked for longer than LOOP_STALL_THRESHOLD seconds, with the stack
+    DEBUG_ENDPOINTS_ENABLED: bool = False
+    DEBUG_TOKEN: str = ""
+    DEBUG_PROFILE_MAX_SECONDS: float = 60.0
+    LOOP_STALL_THRESHOLD: float = 0.1
+
+    # Traffic capture for replay (benchmarks/replay.py). With CAPTURE_ENABLED, CAPTURE_SAMPLE_RATE of the orders sent
+    # to /invoke_order_creation are recorded with their outcome and downstream timings, sanitized (tokens dropped,
+    # callers, idempotency keys, customer identifiers and free text pseudonymized; CAPTURE_REDACT_FIELDS adds field
+    # names), into compressed CAPTURE_SEGMENT_BYTES segments in CAPTURE_DIR. Capture stops once this process has
+    # written CAPTURE_MAX_BYTES (0 = no limit)
+    CAPTURE_ENABLED: bool = False
+    CAPTURE_DIR: str = "capture"
+    CAPTURE_SAMPLE_RATE: float = 1.0
+    CAPTURE_SEGMENT_BYTES: int = 64 * 1024 * 1024
+    CAPTURE_MAX_BYTES: int = 1024 * 1024 * 1024
+    CAPTURE_REDACT_FIELDS: str = ""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+
+_settings: Optional[Settings] = None
+
+
+def get_settings() -> Settings:
+    # Built on first use rather than on import, so importing the app needs no environment
+    global _settings
+    if _settings is None:
+        _settings = Settings()
+    return _settings
+
+
+def use_settings(new: Optional[Settings]) -> None:
+    # Replaces the process-wide settings (create_app(settings=...), tests); None re-reads the environment on next use
+    global _settings
+    _settings = new
+
+
+class _SettingsProxy:
+    """`settings.X` reads and writes the current Settings instance."""
+
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(get_settings(), name, value)
+
+    def __delattr__(self, name: str) -> None:
+        delattr(get_settings(), name)
+
+
+settings = _SettingsProxy()
@@ -0,0 +1,39 @@
+import time
+from contextvars import ContextVar
+from typing import Mapping, Optional
+from app.core.config import settings
+
+# End-to-end request deadline. It is set once per request and read by every outbound call (authorize, each RecVue
+# attempt), so retries share one budget instead of each getting a fresh settings.TIMEOUT.
+
+DEADLINE_HEADER = "x-request-timeout"
+
+_deadline: ContextVar[Optional[float]] = ContextVar("payloadbridge_deadline", default=None)
+
+
+def from_headers(headers: Mapping[str, str], default: Optional[float] = None) -> Optional[float]:
+    # X-Request-Timeout is the caller's remaining budget in seconds, capped at REQUEST_DEADLINE_MAX
+    value = headers.get(DEADLINE_HEADER)
+    if value is not None:
+        try:
+            timeout = float(value)
+        except ValueError:
+            timeout = 0.0
+        if timeout > 0:
+            return min(timeout, settings.REQUEST_DEADLINE_MAX)
+    return default or None
+
+
+def start(timeout: Optional[float]) -> None:
+    _deadline.set(time.monotonic() + timeout if timeout else None)
+
+
+def remaining() -> Optional[float]:
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def budget(limit: float, share: float = 1.0) -> float:
+    # Timeout for the next call: `limit`, or `share` of what is left of the deadline if that is less
+    left = remaining()
+    return limit if left is None else min(limit, left * share)
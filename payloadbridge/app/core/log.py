@@ -0,0 +1,172 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+from app.utils import fastjson
+
+# Structured, non-blocking logging for the request path.
+#
+# - Request id / tenant / batch id live in a ContextVar and are attached to every record, so call sites log a
+#   constant %-style template plus arguments instead of building f-strings.
+# - The event loop only enqueues records; formatting (including `msg % args`) and stream I/O happen on a
+#   QueueListener thread.
+# - Each template is rate limited per window; the next record that gets through reports how many were dropped.
+
+LOGGER_NAME = "payloadbridge"
+
+_context: ContextVar[Dict[str, Any]] = ContextVar("payloadbridge_log_context", default={})
+
+_RESERVED = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "context", "suppressed"}
+
+
+def bind(**fields: Any) -> None:
+    # Adds fields to the current context; asyncio tasks started afterwards inherit them
+    _context.set({**_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+
+
+@contextmanager
+def log_context(**fields: Any) -> Iterator[None]:
+    token = _context.set({**_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def current_context() -> Dict[str, Any]:
+    return _context.get()
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets at most `limit` records per (logger, level, template) through every `window` seconds."""
+
+    def __init__(self, limit: int, window: float, timer=time.monotonic):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._timer = timer
+        # key -> [window start, passed in window, suppressed since last emitted]
+        self._counters: Dict[Tuple[str, int, Any], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0:
+            return True
+        key = (record.name, record.levelno, record.msg)
+        now = self._timer()
+        counter = self._counters.get(key)
+        if counter is None:
+            if len(self._counters) > 10000:
+                self._counters.clear()
+            counter = self._counters[key] = [now, 0, 0]
+        elif now - counter[0] >= self.window:
+            counter[0], counter[1] = now, 0
+        if counter[1] >= self.limit:
+            counter[2] += 1
+            return False
+        counter[1] += 1
+        if counter[2]:
+            record.suppressed = counter[2]
+            counter[2] = 0
+        return True
+
+
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Capture the context now (it belongs to the calling task) but leave formatting to the listener thread
+        record.context = _context.get()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def _fields(record: logging.LogRecord) -> Dict[str, Any]:
+    # Context captured when the record was queued, overridden by per-call `extra=`
+    fields = dict(getattr(record, "context", None) or {})
+    for key, value in record.__dict__.items():
+        if key not in _RESERVED and not key.startswith("_"):
+            fields[key] = value
+    return fields
+
+
+class JsonFormatter(logging.Formatter):
+    converter = time.gmtime
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(_fields(record))
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return fastjson.dumps(entry, default=str).decode("utf-8")
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if getattr(record, "suppressed", 0):
+            line += f" (suppressed {record.suppressed} similar)"
+        return line
+
+
+class _StderrHandler(logging.StreamHandler):
+    # Resolves sys.stderr on every write so replaced streams (test capture, reloaders) are honoured
+    @property
+    def stream(self):
+        return sys.stderr
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(level: str = "INFO", fmt: str = "json", rate_limit: int = 20, rate_window: float = 1.0) -> logging.Logger:
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(getattr(logging, level.upper(), logging.INFO))
+    if _listener is not None:
+        return logger
+
+    output = _StderrHandler()
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = _ContextQueueHandler(records)
+    handler.addFilter(RateLimitFilter(rate_limit, rate_window))
+    logger.addHandler(handler)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=False)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return logger
+
+
+def shutdown_logging() -> None:
+    # Flushes everything still queued
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        logger = logging.getLogger(LOGGER_NAME)
+        for handler in [h for h in logger.handlers if isinstance(h, _ContextQueueHandler)]:
+            logger.removeHandler(handler)
+        _listener = None
@@ -0,0 +1,328 @@
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Minimal Prometheus-compatible instrumentation. Children are cached per label tuple so the hot path is a
+# dict lookup plus a couple of integer updates; everything is rendered to text only when /metrics is scraped.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = (1024, 10240, 102400, 1048576, 10485760, 104857600)
+LINES_BUCKETS = (1, 10, 100, 1000, 10000, 100000)
+
+
+# Tenants beyond the first MAX_TENANT_LABELS seen are labelled OTHER_TENANT, so the per-tenant series stay bounded
+MAX_TENANT_LABELS = 500
+OTHER_TENANT = "other"
+_tenant_labels = set()
+
+
+def tenant_label(tenant: Optional[str]) -> str:
+    if not tenant or tenant in _tenant_labels:
+        return tenant or ""
+    if len(_tenant_labels) >= MAX_TENANT_LABELS:
+        return OTHER_TENANT
+    _tenant_labels.add(tenant)
+    return tenant
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric(ABC):
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._tenant_index = self.labelnames.index("tenant") if "tenant" in self.labelnames else -1
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            i = self._tenant_index
+            if i >= 0:
+                values = values[:i] + (tenant_label(values[i]),) + values[i + 1:]
+                child = self._children.get(values)
+            if child is None:
+                child = self._children[values] = self._new_child()
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        ...
+
+    def clear(self) -> None:
+        self._children.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for values, child in self._children.items():
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, values, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _format_value(bound)
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, 'le=' + chr(34) + le + chr(34))} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], List[str]]) -> None:
+        # Collectors produce exposition lines for state that is cheaper to read at scrape time
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        for metric in self._metrics:
+            metric.clear()
+        _tenant_labels.clear()
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter("payloadbridge_http_requests_total", "Responses sent by the bridge.", ("endpoint", "method", "status")))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge("payloadbridge_http_in_flight_requests", "Requests currently being handled.", ("method", "tenant")))
+REQUEST_DURATION = REGISTRY.register(Histogram("payloadbridge_request_duration_seconds", "End-to-end request latency.", ("endpoint", "tenant")))
+STAGE_DURATION = REGISTRY.register(Histogram("payloadbridge_stage_duration_seconds", "Latency of each request-path stage.", ("stage", "tenant")))
+PAYLOAD_BYTES = REGISTRY.register(Histogram("payloadbridge_payload_bytes", "Inbound order payload size.", ("endpoint", "tenant"), BYTES_BUCKETS))
+ORDER_LINES = REGISTRY.register(Histogram("payloadbridge_order_lines", "Order lines per inbound order.", ("endpoint", "tenant"), LINES_BUCKETS))
+RECVUE_RESPONSES = REGISTRY.register(Counter("payloadbridge_recvue_responses_total", "RecVue responses by status ('error' for transport failures).", ("tenant", "status")))
+RECVUE_RETRIES = REGISTRY.register(Counter("payloadbridge_recvue_retries_total", "RecVue POST retries.", ("tenant",)))
+RECVUE_HEDGES = REGISTRY.register(Counter("payloadbridge_recvue_hedged_requests_total", "Hedged RecVue requests by which attempt won.", ("tenant", "outcome")))
+RECVUE_IN_FLIGHT = REGISTRY.register(Gauge("payloadbridge_recvue_in_flight_requests", "RecVue POSTs currently in flight.", ("tenant",)))
+EVENT_LOOP_LAG = REGISTRY.register(Histogram("payloadbridge_event_loop_lag_seconds", "How late the event loop ran the lag monitor's heartbeat."))
+EVENT_LOOP_STALLS = REGISTRY.register(Counter("payloadbridge_event_loop_stalls_total", "Times the event loop was blocked for longer than LOOP_STALL_THRESHOLD."))
+ADMISSION_SHED = REGISTRY.register(Counter("payloadbridge_admission_shed_total", "Orders shed by admission control, by reason.", ("tenant", "reason")))
+CAPTURE_RECORDS = REGISTRY.register(Counter("payloadbridge_capture_records_total", "Captured requests written to or dropped from the capture log.", ("outcome",)))
+REFERENCE_REJECTIONS = REGISTRY.register(Counter("payloadbridge_reference_data_rejections_total", "Order fields rejected by reference-data lookups.", ("tenant", "field")))
+
+
+_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def _tenant_guard_lines() -> List[str]:
+    from app.services import resilience
+
+    states = resilience.tenant_states()
+    lines = ["# HELP payloadbridge_circuit_state Per-tenant breaker state (0 closed, 1 half-open, 2 open).",
+             "# TYPE payloadbridge_circuit_state gauge"]
+    lines += [f"payloadbridge_circuit_state{_format_labels(('tenant',), (t,))} {_STATE_VALUES.get(s['state'], 0)}" for t, s in states.items()]
+    lines += ["# HELP payloadbridge_concurrency_limit Per-tenant adaptive RecVue concurrency limit.",
+              "# TYPE payloadbridge_concurrency_limit gauge"]
+    lines += [f"payloadbridge_concurrency_limit{_format_labels(('tenant',), (t,))} {_format_value(s['limit'])}" for t, s in states.items()]
+    return lines
+
+
+REGISTRY.add_collector(_tenant_guard_lines)
+
+
+def _admission_lines() -> List[str]:
+    from app.services import admission
+
+    if not admission.enabled():
+        return []
+    state = admission.get_admission().snapshot()
+    lines = ["# HELP payloadbridge_admission_queue_depth Orders waiting for admission, per tenant.",
+             "# TYPE payloadbridge_admission_queue_depth gauge"]
+    lines += [f"payloadbridge_admission_queue_depth{_format_labels(('tenant',), (t,))} {d}" for t, d in state["queued"].items()]
+    lines += ["# HELP payloadbridge_admission_in_use Cost units currently admitted for forwarding.",
+              "# TYPE payloadbridge_admission_in_use gauge",
+              f"payloadbridge_admission_in_use {_format_value(state['in_use'])}"]
+    return lines
+
+
+REGISTRY.add_collector(_admission_lines)
+
+
+class RequestTimings:
+    __slots__ = ("stages", "payloads", "tenant", "method", "in_flight")
+
+    def __init__(self, method: str = ""):
+        self.stages: List[Tuple[str, float]] = []
+        self.payloads: List[Tuple[str, int, Optional[int]]] = []
+        self.tenant = ""
+        self.method = method
+        self.in_flight = None
+
+
+# Stage timings and payload sizes are buffered per request and flushed once the tenant is known (after /authorize);
+# the request is counted in flight without a tenant until then
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("payloadbridge_request_timings", default=None)
+
+
+@contextmanager
+def stage(name: str, tenant: Optional[str] = None) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        timings = _current.get()
+        if tenant is not None or timings is None:
+            STAGE_DURATION.labels(name, tenant or "").observe(elapsed)
+        else:
+            timings.stages.append((name, elapsed))
+
+
+def set_tenant(tenant: Optional[str]) -> None:
+    timings = _current.get()
+    if timings is not None and tenant and tenant != timings.tenant:
+        timings.tenant = tenant
+        if timings.in_flight is not None:
+            timings.in_flight.dec()
+            timings.in_flight = HTTP_IN_FLIGHT.labels(timings.method, tenant)
+            timings.in_flight.inc()
+
+
+def observe_payload(endpoint: str, size: int, line_count: Optional[int]) -> None:
+    timings = _current.get()
+    if timings is None:
+        _observe_payload(endpoint, "", size, line_count)
+    else:
+        timings.payloads.append((endpoint, size, line_count))
+
+
+def _observe_payload(endpoint: str, tenant: str, size: int, line_count: Optional[int]) -> None:
+    PAYLOAD_BYTES.labels(endpoint, tenant).observe(size)
+    if line_count is not None:
+        ORDER_LINES.labels(endpoint, tenant).observe(line_count)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: request counts, in-flight gauge, end-to-end latency and buffered stage timings."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings(scope["method"])
+        token = _current.set(timings)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        timings.in_flight = HTTP_IN_FLIGHT.labels(scope["method"], "")
+        timings.in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            timings.in_flight.dec()
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            # Label by route template (/jobs/{job_id}) so concrete ids do not explode cardinality
+            endpoint = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUESTS.labels(endpoint, scope["method"], str(status["code"])).inc()
+            REQUEST_DURATION.labels(endpoint, timings.tenant).observe(elapsed)
+            for name, seconds in timings.stages:
+                STAGE_DURATION.labels(name, timings.tenant).observe(seconds)
+            for path, size, line_count in timings.payloads:
+                _observe_payload(path, timings.tenant, size, line_count)
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from types import CodeType, FrameType
+from typing import Any, Deque, Dict, Iterable, List, Optional
+from app.core import metrics
+
+logger = logging.getLogger("payloadbridge")
+
+# A thread whose innermost Python frame is in one of these is blocked in C (the event loop idle in select, pool
+# threads and the log writer waiting for work), not running
+IDLE_MODULES = ("selectors.py", "threading.py", "queue.py")
+
+_labels: Dict[CodeType, str] = {}
+# Longest first, so site-packages wins over the stdlib directory that contains it
+_PREFIXES = sorted({path + os.sep for path in (sysconfig.get_paths()["purelib"], sysconfig.get_paths()["stdlib"], os.getcwd())},
+                   key=len, reverse=True)
+
+
+def _short_path(path: str) -> str:
+    for prefix in _PREFIXES:
+        if path.startswith(prefix):
+            return path[len(prefix):]
+    return path
+
+
+def _label(code: CodeType) -> str:
+    # "qualname (path:line)" with semicolons removed, as collapsed stacks use them as separators; cached per code object
+    label = _labels.get(code)
+    if label is None:
+        name = getattr(code, "co_qualname", code.co_name)
+        label = _labels[code] = f"{name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+    return label
+
+
+def frame_stack(frame: Optional[FrameType]) -> List[str]:
+    # Root first
+    stack = []
+    while frame is not None:
+        stack.append(_label(frame.f_code))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def sample_stacks(seconds: float, interval: float, thread_ids: Optional[Iterable[int]] = None,
+                  include_idle: bool = False) -> Counter:
+    """Samples the stacks of the given threads (all others than the caller when None) every `interval` seconds for
+    `seconds`, and counts them as collapsed stacks ("thread;root;...;leaf"). Runs on the calling thread, which should
+    not be the event loop's."""
+    me = threading.get_ident()
+    wanted = set(thread_ids) if thread_ids is not None else None
+    stacks: Counter = Counter()
+    stop_at = time.monotonic() + seconds
+    while True:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me or (wanted is not None and ident not in wanted):
+                continue
+            if not include_idle and frame.f_code.co_filename.endswith(IDLE_MODULES):
+                continue
+            stacks[";".join([names.get(ident, str(ident)), *frame_stack(frame)])] += 1
+        frame = None  # don't keep the last thread's frames alive while sleeping
+        if time.monotonic() >= stop_at:
+            return stacks
+        time.sleep(interval)
+
+
+def collapsed(stacks: Counter) -> str:
+    # The input format of flamegraph.pl, speedscope and inferno: one "stack count" line per distinct stack
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class LoopMonitor:
+    """Event-loop lag monitor. A heartbeat task measures how late the loop runs it (the lag every request sees); a
+    watchdog thread notices when the heartbeat is overdue by `threshold` and captures the loop thread's stack while
+    it is still blocked, so each recorded stall shows the callback responsible."""
+
+    def __init__(self, threshold: float, interval: Optional[float] = None, keep: int = 50):
+        self.threshold = threshold
+        self.interval = interval or min(0.05, threshold / 2)
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self.max_lag = 0.0
+        self._last_tick = time.monotonic()
+        self._stall: Optional[Dict[str, Any]] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._loop_thread = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="payloadbridge-loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _heartbeat(self) -> None:
+        lag_metric = metrics.EVENT_LOOP_LAG.labels()
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._last_tick = now
+            lag_metric.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            stall = self._stall
+            if stall is not None:
+                stall["blocked_seconds"] = round(lag, 4)
+                self._stall = None
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.threshold / 2):
+            overdue = time.monotonic() - self._last_tick - self.interval
+            if overdue < self.threshold or self._stall is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            stall = {"at": time.time(), "blocked_seconds": None, "stack": frame_stack(frame)}
+            del frame
+            self._stall = stall
+            self.stalls.append(stall)
+            metrics.EVENT_LOOP_STALLS.labels().inc()
+            logger.warning("Event loop blocked for over %.3fs in %s", self.threshold, stall["stack"][-1] if stall["stack"] else "?")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"threshold": self.threshold, "max_lag": round(self.max_lag, 4), "stalls": list(self.stalls)}
+
+
+class MemoryTracker:
+    """tracemalloc with a baseline: diff() reports where allocations grew since the baseline was taken. Calls come
+    from worker threads and the event loop, so they are serialized; diff() returns None once tracing has stopped."""
+
+    def __init__(self):
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._started_here = False
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return tracemalloc.is_tracing() and self._baseline is not None
+
+    def start(self, frames: int) -> None:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+                self._started_here = True
+            self._baseline = self._snapshot()
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._started_here and tracemalloc.is_tracing():
+                tracemalloc.stop()
+            self._started_here = False
+            self._baseline = None
+
+    def diff(self, top: int, group_by: str = "lineno", rebase: bool = False) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if not self.active:
+                return None
+            snapshot = self._snapshot()
+            stats = snapshot.compare_to(self._baseline, group_by)
+            if rebase:
+                self._baseline = snapshot
+            current, peak = tracemalloc.get_traced_memory()
+        return {
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "growth_bytes": sum(stat.size_diff for stat in stats),
+            "top": [{"size_diff": stat.size_diff, "size": stat.size, "count_diff": stat.count_diff,
+                     "traceback": [f"{_short_path(f.filename)}:{f.lineno}" for f in stat.traceback]}
+                    for stat in stats[:top]],
+        }
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+
+
+_loop_monitor: Optional[LoopMonitor] = None
+memory = MemoryTracker()
+
+
+def loop_monitor() -> Optional[LoopMonitor]:
+    return _loop_monitor
+
+
+def start_loop_monitor(threshold: float) -> None:
+    global _loop_monitor
+    if _loop_monitor is None:
+        _loop_monitor = LoopMonitor(threshold)
+        _loop_monitor.start()
+
+
+async def stop_loop_monitor() -> None:
+    global _loop_monitor
+    if _loop_monitor is not None:
+        await _loop_monitor.stop()
+        _loop_monitor = None
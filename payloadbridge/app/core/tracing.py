@@ -0,0 +1,195 @@
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, MutableMapping, Optional
+
+try:
+    from opentelemetry import context as otel_context, propagate, trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    from opentelemetry.sdk.trace.sampling import ALWAYS_ON, ParentBased, TraceIdRatioBased
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+except ImportError:  # tracing is optional: pip install opentelemetry-sdk
+    trace = None
+    SpanProcessor = object
+
+logger = logging.getLogger("payloadbridge")
+
+# OpenTelemetry tracing. Everything here is a no-op until setup_tracing() installs a provider, so the
+# request path only pays for a None check when tracing is off or the SDK is not installed.
+
+_tracer = None
+_provider = None
+_memory_exporter = None
+
+_TRACE_ID_MASK = (1 << 64) - 1
+
+
+class TailSamplingProcessor(SpanProcessor):
+    """Buffers the spans of each trace until its local root ends, then exports the whole trace if it
+    failed, was slower than `latency_threshold`, or falls in the `keep_ratio` share of the other traces."""
+
+    def __init__(self, delegate, latency_threshold: float, keep_ratio: float, max_traces: int = 10000):
+        self.delegate = delegate
+        self.latency_threshold_ns = int(latency_threshold * 1e9)
+        self.keep_bound = round(max(0.0, min(1.0, keep_ratio)) * (_TRACE_ID_MASK + 1))
+        self.max_traces = max_traces
+        self._pending: "OrderedDict[int, List[ReadableSpan]]" = OrderedDict()
+        # Spans that end after their root (e.g. background chunk sends) follow the decision already made
+        self._decided: "OrderedDict[int, bool]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def on_start(self, span, parent_context=None) -> None:
+        self.delegate.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: "ReadableSpan") -> None:
+        trace_id = span.context.trace_id
+        local_root = span.parent is None or span.parent.is_remote
+        with self._lock:
+            decision = self._decided.get(trace_id)
+            if decision is None:
+                spans = self._pending.setdefault(trace_id, [])
+                spans.append(span)
+                if not local_root:
+                    if len(self._pending) > self.max_traces:
+                        self._pending.popitem(last=False)
+                    return
+                del self._pending[trace_id]
+                decision = self._keep(span, spans)
+                self._decided[trace_id] = decision
+                if len(self._decided) > self.max_traces:
+                    self._decided.popitem(last=False)
+            else:
+                spans = [span]
+        if decision:
+            for ended in spans:
+                self.delegate.on_end(ended)
+
+    def _keep(self, root: "ReadableSpan", spans: List["ReadableSpan"]) -> bool:
+        if any(s.status.status_code is StatusCode.ERROR for s in spans):
+            return True
+        if root.end_time - root.start_time >= self.latency_threshold_ns:
+            return True
+        return (root.context.trace_id & _TRACE_ID_MASK) < self.keep_bound
+
+    def shutdown(self) -> None:
+        self.delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.delegate.force_flush(timeout_millis)
+
+
+def _exporter(name: str):
+    global _memory_exporter
+    if name == "memory":
+        _memory_exporter = InMemorySpanExporter()
+        return SimpleSpanProcessor(_memory_exporter)
+    if name == "console":
+        return BatchSpanProcessor(ConsoleSpanExporter())
+    if name == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("TRACE_EXPORTER=otlp needs opentelemetry-exporter-otlp-proto-http; spans are not exported")
+            return None
+        return BatchSpanProcessor(OTLPSpanExporter())  # endpoint from OTEL_EXPORTER_OTLP_ENDPOINT
+    raise ValueError(f"Unknown TRACE_EXPORTER {name!r} (expected otlp, console or memory)")
+
+
+def setup_tracing(enabled: bool, exporter: str = "otlp", sample_ratio: float = 1.0, tail_sampling: bool = False,
+                  tail_latency: float = 1.0, service_name: str = "payloadbridge") -> bool:
+    global _tracer, _provider
+    shutdown_tracing()
+    if not enabled:
+        return False
+    if trace is None:
+        logger.warning("TRACING_ENABLED is set but opentelemetry-sdk is not installed; tracing is off")
+        return False
+    processor = _exporter(exporter)
+    if processor is None:
+        return False
+    # Head sampling drops unsampled traces before any span is recorded. With tail sampling every trace is
+    # recorded and the ratio is applied once the outcome is known; failed and slow traces are always kept.
+    # Either way an upstream traceparent's sampled flag is honoured.
+    if tail_sampling:
+        sampler = ParentBased(ALWAYS_ON)
+        processor = TailSamplingProcessor(processor, tail_latency, sample_ratio)
+    else:
+        sampler = ParentBased(TraceIdRatioBased(sample_ratio))
+    _provider = TracerProvider(sampler=sampler, resource=Resource.create({"service.name": service_name}))
+    _provider.add_span_processor(processor)
+    _tracer = _provider.get_tracer("payloadbridge")
+    return True
+
+
+def shutdown_tracing() -> None:
+    global _tracer, _provider, _memory_exporter
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = _provider = _memory_exporter = None
+
+
+def memory_exporter():
+    # The InMemorySpanExporter installed by TRACE_EXPORTER=memory (tests, benchmarks)
+    return _memory_exporter
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Any]]:
+    # Exceptions are recorded on the span and mark it as failed
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+def inject(headers: MutableMapping[str, str]) -> MutableMapping[str, str]:
+    # Adds traceparent/tracestate for the current span to outbound request headers
+    if _tracer is not None:
+        propagate.inject(headers)
+    return headers
+
+
+def set_status(current: Optional[Any], status_code: int) -> None:
+    if current is None:
+        return
+    current.set_attribute("http.response.status_code", status_code)
+    if status_code >= 500:
+        current.set_status(Status(StatusCode.ERROR))
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware: one server span per request, continuing the caller's W3C trace context."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _tracer is None:
+            await self.app(scope, receive, send)
+            return
+        carrier: Dict[str, str] = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        parent = propagate.extract(carrier)
+        method = scope["method"]
+        token = otel_context.attach(parent)
+        try:
+            with _tracer.start_as_current_span(method, kind=SpanKind.SERVER,
+                                               attributes={"http.request.method": method, "url.path": scope["path"]}) as server_span:
+                async def send_wrapper(message):
+                    if message["type"] == "http.response.start":
+                        set_status(server_span, message["status"])
+                    await send(message)
+
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    route = getattr(scope.get("route"), "path", None)
+                    if route:
+                        server_span.update_name(f"{method} {route}")
+                        server_span.set_attribute("http.route", route)
+        finally:
+            otel_context.detach(token)
@@ -1,19 +1,95 @@
+from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from app.api import debug
 from app.api.routes import router as api_router
+from app.core.config import Settings, settings, use_settings
+from app.core.log import setup_logging
+from app.core import profiling
+from app.core.metrics import MetricsMiddleware
+from app.core.tracing import TracingMiddleware, setup_tracing
+from app.models import order_schema
+from app.services import capture, http_client, jobs, mapping, reference_data, validation_pool
+from app.services.line_rules import get_rule_engine
+from app.utils.compression import DecompressionMiddleware
+from app.utils.fastjson import FastJSONResponse
 
-app = FastAPI()
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
-app.include_router(api_router)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_client.startup()
+    get_rule_engine()  # compile the lineType rule table before the first request
+    mapping.get_mappings()
+    order_schema.warm_up()
+    await jobs.startup()
+    validation_pool.startup()
+    await reference_data.startup()
+    capture.startup()
+    if debug.enabled():
+        profiling.start_loop_monitor(settings.LOOP_STALL_THRESHOLD)
+    try:
+        yield
+    finally:
+        await profiling.stop_loop_monitor()
+        profiling.memory.stop()
+        capture.shutdown()
+        await reference_data.shutdown()
+        validation_pool.shutdown()
+        await jobs.shutdown()
+        await http_client.shutdown()
 
-@app.get("/")
-def read_root():
-    return {"message": "Welcome to the PayloadBridge microservice!"}
\ No newline at end of file
+
+def create_app(app_settings: Optional[Settings] = None) -> FastAPI:
+    """Builds the service. Settings are read here, not on import; `app_settings` replaces the environment's."""
+    if app_settings is not None:
+        use_settings(app_settings)
+    setup_logging(settings.LOG_LEVEL, settings.LOG_FORMAT, settings.LOG_RATE_LIMIT, settings.LOG_RATE_WINDOW)
+    setup_tracing(settings.TRACING_ENABLED, settings.TRACE_EXPORTER, settings.TRACE_SAMPLE_RATIO,
+                  settings.TRACE_TAIL_SAMPLING, settings.TRACE_TAIL_LATENCY, settings.TRACE_SERVICE_NAME)
+
+    app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    if settings.RESPONSE_GZIP_MIN_BYTES > 0:
+        app.add_middleware(GZipMiddleware, minimum_size=settings.RESPONSE_GZIP_MIN_BYTES)
+
+    # Request bodies are decoded inside the metrics middleware, so payload sizes are recorded uncompressed
+    app.add_middleware(DecompressionMiddleware, max_size=settings.REQUEST_MAX_DECOMPRESSED_BYTES)
+
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
+    # Outermost, so the server span covers the metrics middleware and every stage span is its child
+    app.add_middleware(TracingMiddleware)
+
+    app.include_router(api_router)
+    app.include_router(debug.router)
+
+    @app.get("/")
+    def read_root():
+        return {"message": "Welcome to the PayloadBridge microservice!"}
+
+    return app
+
+
+_app: Optional[FastAPI] = None
+
+
+def __getattr__(name: str):
+    # `app.main:app` (uvicorn, gunicorn, tests) builds the app on first access instead of at import time
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,85 @@
+"""Regenerates app/models/recvue_order_schema.json from RecVue's sample order.
+
+    python -m app.models.generate_schema ../docs/OrderLines_API.json
+"""
+import argparse
+import json
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.models.order_header import OrderHeader
+from app.models.order_line import OrderPayload
+
+SCHEMA_FILE = Path(__file__).resolve().parent / "recvue_order_schema.json"
+
+FAMILY_PATTERN = re.compile(r"^(?P<prefix>[A-Za-z]+?Attribute)(?P<index>\d+)(?P<kind>[VND])$")
+FAMILY_TYPES = {"V": "str", "N": "number", "D": "date"}
+DATE_VALUE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+DATE_NAME = re.compile(r"(Date|Dt|DateD)$")
+
+
+def load_sample(path: Path) -> Dict[str, Any]:
+    text = path.read_text(encoding="utf-8")
+    return json.loads(text[text.index("{", text.index("Sample payload:")):])
+
+
+def _field_type(name: str, value: Any) -> str:
+    if (isinstance(value, str) and DATE_VALUE.match(value)) or (value is None and DATE_NAME.search(name)):
+        return "date"
+    return "str"
+
+
+def describe(record: Dict[str, Any], core_fields) -> Dict[str, Any]:
+    # Numbered attribute families are stored as (prefix, kind, count); everything else is a named field
+    members = defaultdict(list)
+    for name in record:
+        match = FAMILY_PATTERN.match(name)
+        if match:
+            members[(match["prefix"], match["kind"])].append(int(match["index"]))
+    families = []
+    family_fields = set()
+    for (prefix, kind), indexes in sorted(members.items()):
+        if len(indexes) < 2:
+            continue  # a lone numbered field (e.g. the sample's hdrAattribute11V) is just a named field
+        families.append({"prefix": prefix, "kind": kind, "type": FAMILY_TYPES[kind], "count": max(indexes)})
+        family_fields.update(f"{prefix}{i}{kind}" for i in indexes)
+    fields = {name: _field_type(name, value) for name, value in record.items()
+              if name not in family_fields and name not in core_fields and name != "orderLines"}
+    return {"fields": fields, "attributeFamilies": families}
+
+
+def generate(sample: Dict[str, Any]) -> Dict[str, Any]:
+    line_core = set(OrderPayload.model_fields["orderLines"].annotation.__args__[0].model_fields)
+    return {
+        "_comment": "Generated by app/models/generate_schema.py from docs/OrderLines_API.json. Core fields are declared on "
+                    "OrderHeader/OrderLine; 'fields' are the remaining named fields; numbered attribute families expand to "
+                    "<prefix><1..count><kind>.",
+        "header": describe({k: v for k, v in sample.items() if k != "orderLines"}, set(OrderHeader.model_fields)),
+        "line": describe(_merge_lines(sample["orderLines"]), line_core),
+    }
+
+
+def _merge_lines(lines: List[Dict[str, Any]]) -> Dict[str, Any]:
+    merged: Dict[str, Any] = {}
+    for line in lines:
+        for name, value in line.items():
+            if merged.get(name) is None:
+                merged[name] = value
+    return merged
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sample", type=Path)
+    parser.add_argument("--output", type=Path, default=SCHEMA_FILE)
+    args = parser.parse_args()
+    schema = generate(load_sample(args.sample))
+    args.output.write_text(json.dumps(schema, indent=2) + "\n", encoding="utf-8")
+    print(f"Wrote {len(schema['header']['fields'])} header fields, {len(schema['header']['attributeFamilies'])} header families, "
+          f"{len(schema['line']['fields'])} line fields, {len(schema['line']['attributeFamilies'])} line families to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from typing import Optional
-from pydantic import BaseModel, Field, constr
+from typing_extensions import Annotated
+from pydantic import BaseModel, ConfigDict, StringConstraints, model_validator
 from datetime import date
 from enum import Enum
 
@@ -7,13 +8,26 @@ class EvergreenFlag(str, Enum):
     Y = 'Y'
     N = 'N'
 
+# Stripping and the length check run inside pydantic-core rather than in Python validators
+RequiredStr = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
+
 class OrderHeader(BaseModel):
-    orderNumber: Optional[str]
-    orderType: str = Field(..., min_length=1, strip_whitespace=True)
-    orderCategory: str = Field(..., min_length=1, strip_whitespace=True)
-    businessUnit: str = Field(..., min_length=1, strip_whitespace=True)
+    # Numeric order and account numbers are accepted as strings, as they were under pydantic v1
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+    orderNumber: Optional[str] = None
+    orderType: RequiredStr
+    orderCategory: RequiredStr
+    businessUnit: RequiredStr
     hdrEffectiveStartDate: date
-    hdrEffectiveEndDate: Optional[date]
-    hdrBillToCustAccountNum: str = Field(..., min_length=1, strip_whitespace=True)
-    hdrEvergreenFlag: Optional[EvergreenFlag]
+    hdrEffectiveEndDate: Optional[date] = None
+    hdrBillToCustAccountNum: RequiredStr
+    hdrEvergreenFlag: Optional[EvergreenFlag] = None
+    hdrIntent: Optional[str] = None
     # ... add other header fields as needed ...
+
+    @model_validator(mode='after')
+    def validate_header_fields(self):
+        if self.hdrEvergreenFlag == EvergreenFlag.N and self.hdrEffectiveEndDate is None:
+            raise ValueError('hdrEffectiveEndDate is required for non-evergreen orders')
+        return self
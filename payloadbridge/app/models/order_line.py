@@ -2,60 +2,41 @@
 
 
 from typing import List, Optional
-from pydantic import BaseModel, Field, root_validator
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 from datetime import date
-from enum import Enum
+from app.models.order_header import EvergreenFlag, OrderHeader, RequiredStr
 from app.utils.validators import validate_evergreen_and_end_date
 
 
-
-class EvergreenFlag(str, Enum):
-    Y = 'Y'
-    N = 'N'
-
-
 class OrderLine(BaseModel):
-    lineNumber: str = Field(..., min_length=1, strip_whitespace=True)
-    lineType: str = Field(..., min_length=1, strip_whitespace=True)
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+    lineNumber: RequiredStr
+    lineType: RequiredStr
     lineEffectiveStartDate: date
-    lineEffectiveEndDate: Optional[date]
-    lineEvergreenFlag: Optional[EvergreenFlag]
-    itemName: Optional[str]
-    itemDescription: Optional[str]
-    uom: Optional[str]
+    lineEffectiveEndDate: Optional[date] = None
+    lineEvergreenFlag: Optional[EvergreenFlag] = None
+    itemName: Optional[str] = None
+    itemDescription: Optional[str] = None
+    uom: Optional[str] = None
     quantity: Optional[float] = Field(None, ge=0)
     unitPrice: Optional[float] = Field(None, ge=0)
-    lineStatus: Optional[str]
-    trackingOptions: Optional[str]
-    lineBillingCycle: Optional[str]
-    lineBillingFrequency: Optional[str]
-    lineInvoicingRule: Optional[str]
-    lineBillingChannel: Optional[str]
-    lineDeliveryChannel: Optional[str]
+    lineStatus: Optional[str] = None
+    trackingOptions: Optional[str] = None
+    lineBillingCycle: Optional[str] = None
+    lineBillingFrequency: Optional[str] = None
+    lineInvoicingRule: Optional[str] = None
+    lineBillingChannel: Optional[str] = None
+    lineDeliveryChannel: Optional[str] = None
     # ... add all other fields as needed ...
 
-    @root_validator
-    def validate_evergreen_and_end_date(cls, values):
-        validate_evergreen_and_end_date(values.get('lineEvergreenFlag'), values.get('lineEffectiveEndDate'))
-        return values
-
-
-class OrderPayload(BaseModel):
-    orderNumber: Optional[str]
-    orderType: str = Field(..., min_length=1, strip_whitespace=True)
-    orderCategory: str = Field(..., min_length=1, strip_whitespace=True)
-    businessUnit: str = Field(..., min_length=1, strip_whitespace=True)
-    hdrEffectiveStartDate: date
-    hdrEffectiveEndDate: Optional[date]
-    hdrBillToCustAccountNum: str = Field(..., min_length=1, strip_whitespace=True)
-    hdrEvergreenFlag: Optional[EvergreenFlag]
-    orderLines: List[OrderLine]
-    # ... add all other header fields as needed ...
-
-    @root_validator
-    def validate_header_fields(cls, values):
-        if values.get('hdrEvergreenFlag') == EvergreenFlag.N and not values.get('hdrEffectiveEndDate'):
-            raise ValueError('hdrEffectiveEndDate is required for non-evergreen orders')
-        if not values.get('orderLines') or not isinstance(values['orderLines'], list) or len(values['orderLines']) == 0:
-            raise ValueError('At least one order line is required')
-        return values
+    # after-mode: runs once per line on the already-validated model instead of on a dict of raw values
+    @model_validator(mode='after')
+    def validate_evergreen_and_end_date(self):
+        validate_evergreen_and_end_date(self.lineEvergreenFlag, self.lineEffectiveEndDate)
+        return self
+
+
+# Header fields and header rules live on OrderHeader so streamed orders can validate the header without the lines
+class OrderPayload(OrderHeader):
+    orderLines: List[OrderLine] = Field(..., min_length=1)
@@ -0,0 +1,152 @@
+# Full RecVue order schema built from recvue_order_schema.json (see generate_schema.py).
+#
+# Named fields are validated eagerly with the core ones. The numbered attribute families (hdrAttribute1V..25V,
+# lineRevAttribute1N..10N, ...) are roughly half of every record; the order models ignore them and they are only
+# type-checked, straight from the original body, when `.attributes` or `attribute_errors()` is used.
+
+import json
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Type, Union
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, ValidationError, create_model
+from app.core.config import settings
+from app.models.order_header import OrderHeader
+from app.models.order_line import OrderLine, OrderPayload
+from app.utils.validators import validation_message
+
+SCHEMA_FILE = Path(__file__).resolve().parent / "recvue_order_schema.json"
+
+_TYPES = {"str": str, "number": float, "date": date}
+
+# RecVue accepts numbers wherever it documents strings. Validators are built on first use (see warm_up): core mode
+# never needs these models, and lazy mode only needs the attribute-family ones when an order's attributes are read
+_CONFIG = ConfigDict(extra="ignore", coerce_numbers_to_str=True, defer_build=True)
+
+
+def _load_schema() -> Dict[str, Any]:
+    with open(SCHEMA_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def family_fields(spec: Dict[str, Any]) -> Dict[str, type]:
+    return {f"{fam['prefix']}{i}{fam['kind']}": _TYPES[fam["type"]]
+            for fam in spec["attributeFamilies"] for i in range(1, fam["count"] + 1)}
+
+
+def _optional(fields: Dict[str, type]) -> Dict[str, Any]:
+    return {name: (Optional[t], None) for name, t in fields.items()}
+
+
+_SCHEMA = _load_schema()
+
+HeaderAttributes = create_model("HeaderAttributes", __config__=_CONFIG, **_optional(family_fields(_SCHEMA["header"])))
+LineAttributes = create_model("LineAttributes", __config__=_CONFIG, **_optional(family_fields(_SCHEMA["line"])))
+OrderAttributes = create_model("OrderAttributes", __base__=HeaderAttributes, orderLines=(List[LineAttributes], []))
+
+_NAMED_LINE_FIELDS = {name: _TYPES[t] for name, t in _SCHEMA["line"]["fields"].items()}
+_NAMED_HEADER_FIELDS = {name: _TYPES[t] for name, t in _SCHEMA["header"]["fields"].items()}
+
+
+class _FullModel(BaseModel):
+    model_config = _CONFIG
+
+
+FullOrderLine = create_model("FullOrderLine", __base__=(OrderLine, _FullModel), **_optional(_NAMED_LINE_FIELDS))
+FullOrderHeader = create_model("FullOrderHeader", __base__=(OrderHeader, _FullModel), **_optional(_NAMED_HEADER_FIELDS))
+
+
+class FullOrderPayload(FullOrderHeader):
+    orderLines: List[FullOrderLine] = Field(..., min_length=1)
+    _source: Any = PrivateAttr(None)
+    _attributes: Optional[BaseModel] = PrivateAttr(None)
+
+    @classmethod
+    def from_body(cls, body: Union[Dict[str, Any], bytes, str]) -> "FullOrderPayload":
+        order = cls.model_validate_json(body) if isinstance(body, (bytes, str)) else cls.model_validate(body)
+        order._source = body
+        return order
+
+    @property
+    def attributes(self) -> BaseModel:
+        if self._attributes is None:
+            if self._source is None:
+                raise ValueError("Attribute families are only available on orders built with from_body()")
+            source = self._source
+            self._attributes = (OrderAttributes.model_validate_json(source) if isinstance(source, (bytes, str))
+                                else OrderAttributes.model_validate(source))
+        return self._attributes
+
+    def attribute_errors(self) -> List[str]:
+        try:
+            self.attributes
+        except ValidationError as e:
+            return validation_message(e).split("; ")
+        return []
+
+
+class AttributeValidationError(ValueError):
+    pass
+
+
+# ORDER_SCHEMA_MODE -> (order, header, line) models
+#   core: only the core fields (everything else is ignored)
+#   lazy: full schema; attribute families type-checked on demand
+#   full: full schema; attribute families type-checked on every request
+_MODELS = {
+    "core": (OrderPayload, OrderHeader, OrderLine),
+    "lazy": (FullOrderPayload, FullOrderHeader, FullOrderLine),
+    "full": (FullOrderPayload, FullOrderHeader, FullOrderLine),
+}
+
+
+def _mode(mode: Optional[str]) -> str:
+    mode = mode or settings.ORDER_SCHEMA_MODE
+    if mode not in _MODELS:
+        raise ValueError(f"ORDER_SCHEMA_MODE must be one of {tuple(_MODELS)}, got {mode!r}")
+    return mode
+
+
+def warm_up(mode: Optional[str] = None) -> None:
+    # Builds the validators `mode` uses on every request, so the first order doesn't pay for it
+    mode = _mode(mode)
+    models = [] if mode == "core" else [FullOrderLine, FullOrderHeader, FullOrderPayload]
+    if mode == "full":
+        models += [HeaderAttributes, LineAttributes, OrderAttributes]
+    for model in models:
+        model.model_rebuild(force=True)
+
+
+def _check(attributes_model: Type[BaseModel], record: Dict[str, Any]) -> None:
+    try:
+        attributes_model.model_validate(record)
+    except ValidationError as e:
+        raise AttributeValidationError(validation_message(e))
+
+
+def validate_order(body: Union[Dict[str, Any], bytes, str], mode: Optional[str] = None) -> BaseModel:
+    # Raw bytes are parsed and validated in one pass by pydantic-core
+    mode = _mode(mode)
+    if mode == "core":
+        return OrderPayload.model_validate_json(body) if isinstance(body, (bytes, str)) else OrderPayload.model_validate(body)
+    order = FullOrderPayload.from_body(body)
+    if mode == "full":
+        errors = order.attribute_errors()
+        if errors:
+            raise AttributeValidationError("; ".join(errors))
+    return order
+
+
+def validate_header(header: Dict[str, Any], mode: Optional[str] = None) -> BaseModel:
+    mode = _mode(mode)
+    validated = _MODELS[mode][1].model_validate(header)
+    if mode == "full":
+        _check(HeaderAttributes, header)
+    return validated
+
+
+def validate_line(line: Dict[str, Any], mode: Optional[str] = None) -> BaseModel:
+    mode = _mode(mode)
+    validated = _MODELS[mode][2].model_validate(line)
+    if mode == "full":
+        _check(LineAttributes, line)
+    return validated
@@ -0,0 +1,60 @@
+import argparse
+import os
+import tempfile
+import uvicorn
+
+# Multi-worker entry point: python -m app.server [--workers N] [--host H] [--port P]
+# Workers default to WEB_CONCURRENCY, or one per CPU. Settings are passed to the worker processes through the
+# environment, so anything decided here (shared cache file, job recovery) must be set before they start.
+
+
+def worker_count(requested: int = 0) -> int:
+    requested = requested or int(os.environ.get("WEB_CONCURRENCY", "0") or 0)
+    return requested if requested > 0 else (os.cpu_count() or 1)
+
+
+def private_cache_path() -> str:
+    # A fresh 0700 directory (mkdtemp) holding a 0600 file: caller identities are never readable by other users of
+    # the shared temp directory, and nobody else can plant the file first. SQLite gives its -wal/-shm files the
+    # database file's permissions
+    path = os.path.join(tempfile.mkdtemp(prefix="payloadbridge-"), "shared_cache.sqlite3")
+    os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600))
+    return path
+
+
+def prepare_workers(workers: int) -> None:
+    if workers <= 1:
+        return
+    # One authorize result / idempotency record / open breaker serves every worker
+    if not os.environ.get("SHARED_CACHE_PATH"):
+        os.environ["SHARED_CACHE_PATH"] = private_cache_path()
+    from app.core.config import settings
+    from app.services.jobs import JobStore, db_path
+    if not settings.JOBS_ENABLED:
+        return
+    # Any worker may run a job another one queued, so they all need the same token key
+    if not settings.JOBS_TOKEN_KEY:
+        from cryptography.fernet import Fernet
+        os.environ["JOBS_TOKEN_KEY"] = Fernet.generate_key().decode("ascii")
+    # Requeue jobs interrupted by a previous run here, once, rather than in each worker while others are running jobs
+    store = JobStore(db_path())
+    try:
+        store.requeue_running()
+    finally:
+        store.close()
+    os.environ["JOBS_RECOVER_ON_STARTUP"] = "false"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run PayloadBridge with one or more worker processes")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (default: WEB_CONCURRENCY or CPU count)")
+    args = parser.parse_args()
+    workers = worker_count(args.workers)
+    prepare_workers(workers)
+    uvicorn.run("app.main:app", host=args.host, port=args.port, workers=workers, proxy_headers=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from app.core import deadline, metrics, tracing
+from app.core.config import settings
+
+logger = logging.getLogger("payloadbridge")
+
+# Why an order was shed (the `reason` label of payloadbridge_admission_shed_total)
+RATE, QUEUE_FULL, QUEUE_TIME, TIMEOUT = "rate", "queue_full", "queue_time", "timeout"
+MIN_BUCKET_SWEEP = 1024
+
+
+class Rejected(Exception):
+    """An order shed before forwarding: 429 when its tenant is over its rate, 503 when the bridge is saturated."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(f"{reason}: retry after {retry_after:.1f}s")
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+    def content(self, request_id: Optional[str]) -> Dict[str, object]:
+        error = "Tenant rate limit exceeded" if self.status_code == 429 else "Bridge overloaded"
+        return {"error": error, "details": str(self), "retry_after": round(self.retry_after, 1), "request_id": request_id}
+
+
+def order_cost(line_count: Optional[int]) -> float:
+    # A one-line order costs 1 unit; ADMISSION_LINES_PER_UNIT more lines cost one more
+    return 1.0 + (line_count or 0) / max(1, settings.ADMISSION_LINES_PER_UNIT)
+
+
+class TokenBucket:
+    """Per-tenant rate: `rate` units/s up to `burst`. Tokens are reserved, so a caller told to wait `n` seconds is
+    guaranteed its tokens after that wait."""
+
+    def __init__(self, rate: float, burst: float, timer: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._timer = timer
+        self.tokens = burst
+        self._updated = timer()
+
+    def reserve(self, cost: float, max_wait: float) -> float:
+        # Returns the seconds to wait before the reserved tokens are available, or raises Rejected(429)
+        now = self._timer()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        cost = min(cost, self.burst)
+        wait = max(0.0, (cost - self.tokens) / self.rate)
+        if wait > max_wait:
+            raise Rejected(429, RATE, wait)
+        self.tokens -= cost
+        return wait
+
+    def refund(self, cost: float) -> None:
+        self.tokens = min(self.burst, self.tokens + min(cost, self.burst))
+
+    def full(self) -> bool:
+        # Refilled to the burst since its last use: no different from a new bucket, so it can be dropped
+        return self.tokens + (self._timer() - self._updated) * self.rate >= self.burst
+
+
+class _Entry:
+    __slots__ = ("tenant", "cost", "finish", "future")
+
+    def __init__(self, tenant: str, cost: float, finish: float, future: "asyncio.Future[None]"):
+        self.tenant = tenant
+        self.cost = cost
+        self.finish = finish
+        self.future = future
+
+
+class FairQueue:
+    """At most `capacity` cost units forwarding at once; the rest wait in a weighted fair queue ordered by virtual
+    finish tag (start + cost / tenant weight), so a tenant with a deep backlog mostly delays its own orders and small
+    orders overtake large ones. Entries whose estimated wait already exceeds their budget are shed up front."""
+
+    def __init__(self, capacity: float, max_queue: int, weights: Dict[str, float],
+                 timer: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.weights = weights
+        self._timer = timer
+        self.in_use = 0.0
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._virtual = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self.depth: Dict[str, int] = {}
+        # Cost units waiting per tenant, kept up to date so estimate() doesn't walk the heap
+        self.queued_cost: Dict[str, float] = {}
+        # Observed seconds of forwarding per cost unit (EWMA), for the wait estimate
+        self.unit_time: Optional[float] = None
+
+    async def acquire(self, tenant: str, cost: float, max_wait: float) -> float:
+        # Returns the cost actually held (an order larger than the whole capacity holds all of it)
+        cost = min(cost, self.capacity)
+        if not self._heap and self.in_use + cost <= self.capacity:
+            self.in_use += cost
+            return cost
+        if self.queued() >= self.max_queue:
+            raise Rejected(503, QUEUE_FULL, self.estimate(math.inf) or max_wait)
+        finish = max(self._virtual, self._last_finish.get(tenant, 0.0)) + cost / self.weights.get(tenant, 1.0)
+        estimate = self.estimate(finish, cost)
+        if estimate is not None and estimate > max_wait:
+            raise Rejected(503, QUEUE_TIME, estimate)
+        self._last_finish[tenant] = finish
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (finish, next(self._seq), _Entry(tenant, cost, finish, future)))
+        self.depth[tenant] = self.depth.get(tenant, 0) + 1
+        self.queued_cost[tenant] = self.queued_cost.get(tenant, 0.0) + cost
+        try:
+            await asyncio.wait_for(future, timeout=max_wait)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # Granted just as the wait ended: hand the slot on
+                self.release(cost)
+            else:
+                # Still in the heap; _wake drops it
+                self._dequeued(tenant, cost)
+            if isinstance(e, asyncio.TimeoutError):
+                raise Rejected(503, TIMEOUT, self.estimate(finish) or max_wait) from None
+            raise
+        # The slot was handed over by _wake (which already counted it)
+        return cost
+
+    def queued(self) -> int:
+        return sum(self.depth.values())
+
+    def release(self, cost: float, elapsed: Optional[float] = None) -> None:
+        self.in_use -= cost
+        if elapsed is not None:
+            sample = elapsed / cost
+            self.unit_time = sample if self.unit_time is None else 0.8 * self.unit_time + 0.2 * sample
+        self._wake()
+
+    def estimate(self, finish: float, cost: float = 0.0) -> Optional[float]:
+        # Seconds until an entry with this finish tag would start: the queued work ahead of it, drained at capacity.
+        # A tenant's tags advance by cost / weight from the current virtual time, so about weight * (finish - virtual)
+        # of its queued units have a tag up to `finish`
+        if self.unit_time is None:
+            return None
+        span = max(0.0, finish - self._virtual)
+        ahead = cost + sum(min(queued, span * self.weights.get(tenant, 1.0)) for tenant, queued in self.queued_cost.items())
+        return ahead * self.unit_time / self.capacity
+
+    def _dequeued(self, tenant: str, cost: float) -> None:
+        self.depth[tenant] -= 1
+        if self.depth[tenant]:
+            self.queued_cost[tenant] -= cost
+        else:
+            # Rather than leave float residue, or an entry for every tenant ever seen, behind
+            del self.depth[tenant], self.queued_cost[tenant]
+
+    def _wake(self) -> None:
+        while self._heap:
+            _, _, entry = self._heap[0]
+            if entry.future.done():
+                heapq.heappop(self._heap)
+                continue
+            if self.in_use + entry.cost > self.capacity:
+                return
+            heapq.heappop(self._heap)
+            self.in_use += entry.cost
+            self._virtual = max(self._virtual, entry.finish - entry.cost / self.weights.get(entry.tenant, 1.0))
+            self._dequeued(entry.tenant, entry.cost)
+            entry.future.set_result(None)
+        # Only once nothing is waiting: a tenant's next order then starts from the current virtual time, not behind
+        # its own earlier backlog. Clearing it while entries are queued would let a backlogged tenant jump the queue
+        if not self._heap:
+            self._last_finish.clear()
+
+
+def parse_weights(text: str) -> Dict[str, float]:
+    # "tenant1=2,tenant2=0.5"
+    weights = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        tenant, _, weight = item.partition("=")
+        weights[tenant.strip()] = max(0.01, float(weight))
+    return weights
+
+
+class AdmissionController:
+    def __init__(self, timer: Callable[[], float] = time.monotonic):
+        self._timer = timer
+        self.queue = FairQueue(settings.ADMISSION_CAPACITY, settings.ADMISSION_MAX_QUEUE,
+                               parse_weights(settings.ADMISSION_TENANT_WEIGHTS), timer)
+        self._buckets: Dict[str, TokenBucket] = {}
+        # Full buckets are dropped whenever the dict doubles past this, so it tracks recently active tenants only
+        self._sweep_at = MIN_BUCKET_SWEEP
+
+    def bucket(self, tenant: str) -> Optional[TokenBucket]:
+        if settings.ADMISSION_TENANT_RATE <= 0:
+            return None
+        bucket = self._buckets.get(tenant)
+        if bucket is None:
+            if len(self._buckets) >= self._sweep_at:
+                self._buckets = {name: b for name, b in self._buckets.items() if not b.full()}
+                self._sweep_at = max(MIN_BUCKET_SWEEP, 2 * len(self._buckets))
+            bucket = self._buckets[tenant] = TokenBucket(settings.ADMISSION_TENANT_RATE, settings.ADMISSION_TENANT_BURST,
+                                                         self._timer)
+        return bucket
+
+    @asynccontextmanager
+    async def admit(self, tenant: str, line_count: Optional[int]) -> AsyncIterator[None]:
+        cost = order_cost(line_count)
+        max_wait = deadline.budget(settings.ADMISSION_MAX_WAIT)
+        try:
+            with metrics.stage("admission"), tracing.span("admission", tenant=tenant, cost=cost):
+                started = self._timer()
+                bucket = self.bucket(tenant)
+                wait = bucket.reserve(cost, max_wait) if bucket is not None else 0.0
+                try:
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    held = await self.queue.acquire(tenant, cost, max(0.0, max_wait - (self._timer() - started)))
+                except BaseException:
+                    # Shed by the queue or cancelled while waiting: the tenant's reserved tokens were never used
+                    if bucket is not None:
+                        bucket.refund(cost)
+                    raise
+        except Rejected as e:
+            metrics.ADMISSION_SHED.labels(tenant, e.reason).inc()
+            logger.warning("Order shed (%s, cost %.1f), retry after %.1fs", e.reason, cost, e.retry_after)
+            raise
+        started = self._timer()
+        try:
+            yield
+        finally:
+            self.queue.release(held, self._timer() - started)
+
+    def snapshot(self) -> Dict[str, object]:
+        queue = self.queue
+        return {"capacity": queue.capacity, "in_use": round(queue.in_use, 2),
+                "queued": {tenant: depth for tenant, depth in queue.depth.items() if depth},
+                "unit_time": None if queue.unit_time is None else round(queue.unit_time, 4),
+                "tokens": {tenant: round(bucket.tokens, 2) for tenant, bucket in self._buckets.items()}}
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
+
+
+def enabled() -> bool:
+    return settings.ADMISSION_ENABLED
+
+
+@asynccontextmanager
+async def admit(tenant: Optional[str], line_count: Optional[int]) -> AsyncIterator[None]:
+    # Raises Rejected when the order is shed; a no-op unless ADMISSION_ENABLED
+    if not enabled():
+        yield
+        return
+    async with get_admission().admit(tenant or "", line_count):
+        yield
+
+
+def reset() -> None:
+    global _controller
+    _controller = None
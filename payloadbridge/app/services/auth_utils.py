@@ -1,31 +1,106 @@
-import httpx
+import asyncio
+import hashlib
+import time
 from fastapi import HTTPException
+from app.core import deadline, tracing
 from app.core.config import settings
-from typing import Dict
+from app.services import capture
+from app.services.http_client import get_client
+from app.services.resilience import hedged, new_latency_tracker
+from app.utils.cache import SingleFlight, new_cache
+from typing import Dict, Tuple
+
+# Successful results are cached for AUTH_CACHE_TTL; 401/403 are cached as (status, detail) for
+# AUTH_CACHE_NEGATIVE_TTL so a client retrying with a bad token doesn't hammer /authorize. Only the caller's
+# identity is cached (never the token, which may end up in the shared cache file); Authorization is added per request.
+_auth_cache = None
+_auth_inflight = SingleFlight()
+
+NEGATIVE_CACHE_STATUSES = (401, 403)
+
+AUTHORIZE_TIMEOUT = 15.0
+
+_authorize_latency = None
+
+
+def caller_key(access_token: str, host_name: str) -> Tuple[str, str]:
+    # Never keep raw tokens as cache keys
+    return hashlib.sha256(access_token.encode("utf-8")).hexdigest(), host_name.lower()
+
+
+def _cache():
+    global _auth_cache
+    if _auth_cache is None:
+        _auth_cache = new_cache(settings.AUTH_CACHE_MAX_SIZE, settings.AUTH_CACHE_TTL, settings.SHARED_CACHE_PATH, "auth")
+    return _auth_cache
+
+
+def clear_auth_cache() -> None:
+    if _auth_cache is not None:
+        _auth_cache.clear()
+
 
 async def get_okta_headers(access_token: str, host_name: str) -> Dict[str, str]:
+    key = caller_key(access_token, host_name)
+    cached = _cache().get(key)
+    if cached is None:
+        cached = await _auth_inflight.do(key, lambda: _authorize_and_cache(key, access_token, host_name))
+    if isinstance(cached, tuple):
+        status_code, detail = cached
+        raise HTTPException(status_code=status_code, detail=detail)
+    return {**cached, "Authorization": f"Bearer {access_token}"}
+
+
+async def _authorize_and_cache(key: Tuple[str, str], access_token: str, host_name: str):
+    try:
+        headers = await _authorize(access_token, host_name)
+    except HTTPException as e:
+        if e.status_code in NEGATIVE_CACHE_STATUSES:
+            _cache().set(key, (e.status_code, e.detail), ttl=settings.AUTH_CACHE_NEGATIVE_TTL)
+        raise
+    _cache().set(key, headers)
+    return headers
+
+
+async def _authorize(access_token: str, host_name: str) -> Dict[str, str]:
     url = f"{settings.AUTHORIZE_URL_BASE}/api/v2.0/authorize"
     headers = {
         "access_token": access_token,
         "hostName": host_name
     }
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url, headers=headers, timeout=15)
-        if resp.status_code == 401:
-            raise HTTPException(status_code=401, detail="Unauthorized: Invalid access_token")
-        if resp.status_code == 403:
-            raise HTTPException(status_code=403, detail="Forbidden: Access denied")
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail="Auth service error")
-        data = resp.json()
-        # Only return minimal required headers
-        required = ["x-forwarded-user", "tenantIdentifier", "hostName"]
-        missing = [k for k in required if k not in data]
-        if missing:
-            raise HTTPException(status_code=500, detail=f"Missing headers in auth response: {missing}")
-        return {
-            "x-forwarded-user": data["x-forwarded-user"],
-            "tenantIdentifier": data["tenantIdentifier"],
-            "hostName": data["hostName"],
-            "Authorization": f"Bearer {access_token}"
-        }
+    # /authorize only gets its share of the request deadline so the RecVue POST keeps the rest
+    timeout = deadline.budget(AUTHORIZE_TIMEOUT, settings.DEADLINE_AUTHORIZE_SHARE)
+    if timeout < settings.DEADLINE_MIN_ATTEMPT:
+        raise HTTPException(status_code=504, detail="Deadline exceeded before authorization")
+    global _authorize_latency
+    if _authorize_latency is None:
+        _authorize_latency = new_latency_tracker()
+    client = get_client()
+    started = time.monotonic()
+    try:
+        resp, _ = await asyncio.wait_for(
+            hedged(lambda: client.get(url, headers=tracing.inject(dict(headers)), timeout=timeout),
+                   _authorize_latency.hedge_delay() if settings.HEDGE_ENABLED else None),
+            timeout)
+    except asyncio.TimeoutError:
+        capture.note_call("authorize", time.monotonic() - started, 0)
+        raise HTTPException(status_code=504, detail="Auth service timed out") from None
+    _authorize_latency.observe(time.monotonic() - started)
+    capture.note_call("authorize", time.monotonic() - started, resp.status_code)
+    if resp.status_code == 401:
+        raise HTTPException(status_code=401, detail="Unauthorized: Invalid access_token")
+    if resp.status_code == 403:
+        raise HTTPException(status_code=403, detail="Forbidden: Access denied")
+    if resp.status_code != 200:
+        raise HTTPException(status_code=resp.status_code, detail="Auth service error")
+    data = resp.json()
+    # Only return minimal required headers
+    required = ["x-forwarded-user", "tenantIdentifier", "hostName"]
+    missing = [k for k in required if k not in data]
+    if missing:
+        raise HTTPException(status_code=500, detail=f"Missing headers in auth response: {missing}")
+    return {
+        "x-forwarded-user": data["x-forwarded-user"],
+        "tenantIdentifier": data["tenantIdentifier"],
+        "hostName": data["hostName"],
+    }
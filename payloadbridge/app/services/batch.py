@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
+from app.core import log
+from app.models.order_schema import validate_order
+from app.services import admission, reference_data
+from app.services.mapping import MappingError
+from app.services.bridge import send_order
+from app.services.line_rules import get_rule_engine, recvue_failure
+from app.utils import fastjson
+from app.utils.validators import is_json_error, validation_message
+
+logger = logging.getLogger("payloadbridge")
+
+
+ProcessRecord = Callable[[int, Any, Dict[str, str], str], Awaitable[Dict[str, Any]]]
+
+
+async def run_batch(records: AsyncIterator[Any], okta_headers: Dict[str, str], batch_id: str,
+                    concurrency: int, max_orders: int, process_record: ProcessRecord = None) -> List[Dict[str, Any]]:
+    # Records are pulled only as workers free up, so a streamed (NDJSON) batch never holds more than
+    # `concurrency` undispatched orders in memory. Records may be raw NDJSON lines or decoded JSON values.
+    process_record = process_record or _process_record
+    queue: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=concurrency)
+    results: List[Dict[str, Any]] = []
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            index, record = item
+            results.append(await process_record(index, record, okta_headers, batch_id))
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    try:
+        index = 0
+        async for record in records:
+            if index >= max_orders:
+                # One entry for the whole overflow, and the rest of the body is not read
+                results.append({"index": index, "status_code": 413, "error": f"Batch exceeds {max_orders} orders",
+                                "details": f"Orders from index {index} on were not processed", "request_id": None})
+                break
+            await queue.put((index, record))
+            index += 1
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    except BaseException:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        raise
+
+    results.sort(key=lambda r: r["index"])
+    return results
+
+
+async def _process_record(index: int, record: Any, okta_headers: Dict[str, str], batch_id: str) -> Dict[str, Any]:
+    request_id = str(uuid.uuid4())
+    log.bind(request_id=request_id, index=index)
+    # NDJSON lines go straight from bytes to the model; JSON-array items arrive already decoded
+    try:
+        order = validate_order(record)
+    except Exception as e:
+        details = validation_message(e)
+        if is_json_error(e):
+            logger.error("Order %d is not valid JSON: %s", index, details)
+            return {"index": index, "status_code": 400, "error": "Invalid JSON", "details": details, "request_id": request_id}
+        logger.error("Validation error: %s", details)
+        return {"index": index, "status_code": 422, "error": "Invalid input", "details": details, "request_id": request_id}
+    violations = (get_rule_engine().check_order(order, order.hdrIntent)
+                  or reference_data.check_order(okta_headers.get("tenantIdentifier"), order))
+    if violations:
+        return {"index": index, "status_code": 422, **recvue_failure(violations), "request_id": request_id}
+    # NDJSON records are forwarded as the bytes we received instead of being re-encoded
+    try:
+        async with admission.admit(okta_headers.get("tenantIdentifier"), len(order.orderLines)):
+            status_code, content = await send_order(record.encode("utf-8") if isinstance(record, str) else record, okta_headers, request_id)
+    except admission.Rejected as e:
+        return {"index": index, "status_code": e.status_code, **e.content(request_id)}
+    return {"index": index, "status_code": status_code, **content}
+
+
+def mapped(transform: Callable[[Dict[str, Any]], Dict[str, Any]], process_record: ProcessRecord = None) -> ProcessRecord:
+    # Records in another source's shape (X-Payload-Source) are mapped to the RecVue schema before the usual processing
+    process_record = process_record or _process_record
+
+    async def process(index: int, record: Any, okta_headers: Dict[str, str], batch_id: str) -> Dict[str, Any]:
+        try:
+            if isinstance(record, (bytes, str)):
+                record = fastjson.loads(record)
+        except ValueError as e:
+            logger.error("Order %d is not valid JSON: %s", index, e)
+            return {"index": index, "status_code": 400, "error": "Invalid JSON", "details": str(e), "request_id": None}
+        try:
+            record = transform(record)
+        except MappingError as e:
+            logger.error("Mapping error for order %d: %s", index, e)
+            return {"index": index, "status_code": 422, "error": "Mapping error", "details": str(e), "request_id": None}
+        return await process_record(index, record, okta_headers, batch_id)
+
+    return process
@@ -1,6 +1,25 @@
-from typing import Any, Dict
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple, Union
 import httpx
+from app.core import deadline, metrics, tracing
 from app.core.config import settings
+from app.services import capture
+from app.services.http_client import get_client
+from app.services.resilience import CircuitOpenError, ConcurrencyLimitError, backoff_delay, get_tenant_guard, hedged
+from app.utils import fastjson
+from app.utils.compression import gzip_compress
+
+logger = logging.getLogger("payloadbridge")
+
+RECVUE_MAX_RETRIES = 2
+
+# Backoff waits go through this hook, shared by send_order and chunked sends, so tests can replace it in one place
+sleep = asyncio.sleep
+
+# Tenants whose RecVue answered 415 to a gzip body
+_gzip_rejected: Set[str] = set()
 
 async def get_headers() -> Dict[str, str]:
     return {
@@ -11,8 +30,132 @@ async def get_headers() -> Dict[str, str]:
 async def forward_payload(payload: Dict[str, Any]) -> Any:
     url = f"{settings.RECVUE_API_BASE_URL}/invoke_order_creation"
     headers = await get_headers()
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, json=payload, headers=headers)
-        response.raise_for_status()  # Raise an error for bad responses
-        return response.json()
\ No newline at end of file
+
+    client = get_client()
+    response = await client.post(url, json=payload, headers=headers)
+    response.raise_for_status()  # Raise an error for bad responses
+    return response.json()
+
+async def _request(call: Callable[[], Awaitable[httpx.Response]], timeout: float,
+                   hedge_delay: Optional[float]) -> Tuple[httpx.Response, str]:
+    # httpx timeouts apply per phase (connect, read, ...); wait_for bounds the whole attempt, hedge included
+    try:
+        return await asyncio.wait_for(hedged(call, hedge_delay), timeout)
+    except asyncio.TimeoutError:
+        raise httpx.TimeoutException(f"no response within {timeout:.2f}s") from None
+
+def _gzip_enabled(tenant: Optional[str], size: int) -> bool:
+    tenants = settings.RECVUE_GZIP_TENANTS
+    if not tenants or size < settings.RECVUE_GZIP_MIN_BYTES or tenant in _gzip_rejected:
+        return False
+    return tenants.strip() == "*" or (tenant or "") in {t.strip() for t in tenants.split(",")}
+
+def recvue_orderlines_url(tenant: str) -> str:
+    return settings.RECVUE_ORDERLINES_URL_TEMPLATE.format(tenant=tenant)
+
+async def send_order(body: Union[Dict[str, Any], bytes], okta_headers: Dict[str, str], request_id: str,
+                     method: str = "POST") -> Tuple[int, Dict[str, Any]]:
+    # Returns (status_code, response body) so callers can wrap it in their own response.
+    # `body` may be an already-encoded JSON document; either way it is encoded at most once, not per attempt.
+    # PUT updates an existing order (used to add line chunks after the initial POST).
+    tenant = okta_headers.get("tenantIdentifier")
+    recvue_url = recvue_orderlines_url(tenant)
+    content_bytes = body if isinstance(body, bytes) else fastjson.dumps(body)
+    request_headers = {**okta_headers, "Content-Type": "application/json"}
+    # Compressed once (off the event loop) and reused by every attempt
+    send_bytes = content_bytes
+    if _gzip_enabled(tenant, len(content_bytes)):
+        send_bytes = await asyncio.to_thread(gzip_compress, content_bytes, settings.RECVUE_GZIP_LEVEL)
+        request_headers["Content-Encoding"] = "gzip"
+    guard = get_tenant_guard(tenant)
+    # Passed per call rather than bound: chunked sends share one request context
+    log_extra = {"request_id": request_id, "tenant": tenant}
+    # A cancelled loser may still have been applied by RecVue, so POSTs (order creation) are only hedged on request
+    hedge = settings.HEDGE_ENABLED and (method != "POST" or settings.HEDGE_POST)
+    latency = guard.latency(method)
+    max_retries = RECVUE_MAX_RETRIES
+    last_error: Optional[Exception] = None
+    for attempt in range(max_retries + 1):
+        # Every attempt (and the backoff before it) comes out of the request's remaining deadline
+        delay = backoff_delay(attempt - 1) if attempt else 0.0
+        left = deadline.remaining()
+        if left is not None and left - delay < settings.DEADLINE_MIN_ATTEMPT:
+            logger.warning("RecVue deadline exceeded after %d attempts", attempt, extra=log_extra)
+            details = str(last_error) if last_error else "No time left for the RecVue request"
+            return 504, {"error": "Deadline exceeded", "details": details, "request_id": request_id, "tenant": tenant}
+        if attempt:
+            metrics.RECVUE_RETRIES.labels(tenant or "").inc()
+            await sleep(delay)
+        # A tenant whose RecVue keeps failing fails fast instead of tying up connections and coroutines
+        try:
+            guard.sync()
+            guard.breaker.before_call()
+        except CircuitOpenError as e:
+            logger.warning("RecVue circuit open", extra=log_extra)
+            return 503, {"error": "RecVue circuit open", "details": str(e), "retry_after": round(e.retry_after, 1), "request_id": request_id, "tenant": tenant}
+        try:
+            client = get_client()
+            async with guard.limiter.slot(deadline.budget(settings.LIMITER_MAX_WAIT)):
+                started = time.monotonic()
+                in_flight = metrics.RECVUE_IN_FLIGHT.labels(tenant or "")
+                in_flight.inc()
+                try:
+                    with metrics.stage(f"recvue_{method.lower()}", tenant or ""), \
+                            tracing.span(f"RecVue {method}", attempt=attempt + 1, tenant=tenant or "", request_id=request_id) as span:
+                        timeout = deadline.budget(settings.TIMEOUT)
+                        resp, hedge_outcome = await _request(
+                            lambda: client.request(method, recvue_url, content=send_bytes,
+                                                   headers=tracing.inject(dict(request_headers)), timeout=timeout),
+                            timeout, latency.hedge_delay() if hedge else None)
+                        tracing.set_status(span, resp.status_code)
+                finally:
+                    in_flight.dec()
+            latency.observe(time.monotonic() - started)
+            capture.note_call("recvue", time.monotonic() - started, resp.status_code, method)
+            if hedge_outcome:
+                metrics.RECVUE_HEDGES.labels(tenant or "", hedge_outcome).inc()
+            metrics.RECVUE_RESPONSES.labels(tenant or "", str(resp.status_code)).inc()
+            if resp.status_code >= 500:
+                guard.breaker.record_failure()
+                guard.limiter.on_failure()
+            else:
+                guard.breaker.record_success()
+                guard.limiter.on_success(time.monotonic() - started)
+            if resp.status_code == 415 and send_bytes is not content_bytes and attempt < max_retries:
+                logger.warning("RecVue rejected a gzip body; sending uncompressed from now on", extra=log_extra)
+                _gzip_rejected.add(tenant)
+                send_bytes = content_bytes
+                del request_headers["Content-Encoding"]
+                continue
+            logger.info("RecVue response: %s", resp.status_code, extra=log_extra)
+            try:
+                content = fastjson.loads(resp.content)
+            except Exception:
+                content = {"error": "RecVue returned non-JSON response", "raw": resp.text}
+            return resp.status_code, {"recvue": content, "request_id": request_id, "tenant": tenant}
+        except ConcurrencyLimitError as e:
+            guard.breaker.cancel_call()
+            logger.warning("RecVue concurrency limit reached", extra=log_extra)
+            return 503, {"error": "RecVue concurrency limit reached", "details": str(e), "request_id": request_id, "tenant": tenant}
+        except (httpx.RequestError, httpx.HTTPStatusError) as e:
+            last_error = e
+            capture.note_call("recvue", time.monotonic() - started, 0, method)
+            metrics.RECVUE_RESPONSES.labels(tenant or "", "error").inc()
+            guard.breaker.record_failure()
+            guard.limiter.on_failure()
+            logger.warning("RecVue API attempt %d failed: %s", attempt + 1, e, extra=log_extra)
+            if attempt == max_retries:
+                if isinstance(e, httpx.HTTPStatusError):
+                    return e.response.status_code, {"error": "RecVue error", "details": str(e), "request_id": request_id, "tenant": tenant}
+                else:
+                    return 502, {"error": "RecVue unreachable", "details": str(e), "request_id": request_id, "tenant": tenant}
+        except Exception as e:
+            last_error = e
+            guard.breaker.cancel_call()
+            logger.error("Downstream error: %s", e, extra=log_extra)
+            if attempt == max_retries:
+                return 500, {"error": "Failed to reach RecVue API", "details": str(e), "request_id": request_id, "tenant": tenant}
+        except BaseException:
+            # Cancelled (client gone, hedge loser, shutdown): a half-open probe must not stay taken forever
+            guard.breaker.cancel_call()
+            raise
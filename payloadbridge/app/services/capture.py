@@ -0,0 +1,360 @@
+import hashlib
+import logging
+import mmap
+import os
+import queue
+import random
+import secrets
+import struct
+import threading
+import time
+import zlib
+from collections import Counter
+from contextvars import ContextVar, Token
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from app.core import metrics
+from app.core.config import settings
+from app.services.mapping import SOURCE_HEADER, get_mappings
+from app.utils import fastjson
+
+logger = logging.getLogger("payloadbridge")
+
+# A segment is MAGIC followed by blocks of [u32 length][u32 crc32][zlib data], each block holding newline-separated
+# JSON records. Blocks are only ever appended, so a crash leaves at worst a torn last block, which readers detect
+# (short, or failing its crc) and stop at
+MAGIC = b"PBCAP01\n"
+SEGMENT_SUFFIX = ".pbc"
+_BLOCK = struct.Struct("<II")
+BLOCK_BYTES = 256 * 1024
+FLUSH_INTERVAL = 1.0
+QUEUE_SIZE = 10000
+COMPRESSION_LEVEL = 3
+
+# Request headers kept verbatim; access_token and everything else not listed is never written
+KEPT_HEADERS = ("hostName", "content-type", "content-encoding", SOURCE_HEADER, "X-Request-Timeout")
+
+# Order fields naming people, customers, sites and free text. Their string values are replaced by same-length keyed
+# hashes, so payload sizes survive and the same customer still shows up on many orders
+REDACTED_FIELDS = frozenset({
+    "orderNumber", "description", "dealNumber", "poNumber", "linePoNumber", "salesrepName", "salesrepId",
+    "internalContact", "hdrPartnerName", "linePartnerName", "hdrPartnerBuyer", "linePartnerBuyer",
+})
+REDACTED_SUFFIXES = ("CustAccountNum", "CustOrigSysRef", "SiteNumber", "SiteOrigSysRef", "ContactNumber",
+                     "ConOrigSysRef", "Comments")
+
+
+class CaptureFormatError(ValueError):
+    pass
+
+
+class Sanitizer:
+    """Keyed pseudonyms for tokens and sensitive order fields. The key is random per process, so pseudonyms can't
+    be reversed or matched against another capture.
+
+    Bodies are captured before mapping, so the source fields each mapping spec reads into a sensitive RecVue field
+    (a legacy `customer_id` becoming hdrBillToCustAccountNum, say) are redacted too. `mappings` defaults to the
+    compiled specs in MAPPINGS_DIR."""
+
+    def __init__(self, extra_fields: Iterable[str] = (), key: Optional[bytes] = None,
+                 mappings: Optional[Dict[str, Any]] = None):
+        self.fields = REDACTED_FIELDS | set(extra_fields)
+        self.fields |= self.mapped_fields(get_mappings() if mappings is None else mappings)
+        self._key = key or secrets.token_bytes(16)
+        self._sensitive: Dict[Tuple[str, ...], List[str]] = {}
+        # The same customer, site and contact values repeat on every line of an order
+        self._pseudonyms: Dict[str, str] = {}
+
+    def mapped_fields(self, mappings: Dict[str, Any]) -> set:
+        # Last key of each source path mapped onto a sensitive field; matching is by key name, as for RecVue fields
+        return {path.rsplit(".", 1)[-1] for transform in mappings.values()
+                for target, path in getattr(transform, "paths", {}).items() if self.is_sensitive(target)}
+
+    def pseudonym(self, value: str, length: Optional[int] = None) -> str:
+        digest = hashlib.blake2b(value.encode("utf-8"), key=self._key, digest_size=16).hexdigest()
+        length = len(value) if length is None else length
+        return (digest * (length // len(digest) + 1))[:length]
+
+    def is_sensitive(self, field: str) -> bool:
+        return field in self.fields or field.endswith(REDACTED_SUFFIXES)
+
+    def order(self, value: Any) -> Any:
+        # Any shape (RecVue orders and mapped sources alike): sensitive string values anywhere are replaced. Orders
+        # are mostly flat dicts sharing one key set, so the sensitive keys are looked up once per key set and only
+        # dicts that hold containers are walked key by key
+        if isinstance(value, list):
+            return [self.order(v) for v in value]
+        if not isinstance(value, dict):
+            return value
+        out = dict(value)
+        keys = tuple(value)
+        sensitive = self._sensitive.get(keys)
+        if sensitive is None:
+            if len(self._sensitive) >= 1000:
+                self._sensitive.clear()
+            sensitive = self._sensitive[keys] = [k for k in keys if self.is_sensitive(k)]
+        for k in sensitive:
+            v = out[k]
+            if isinstance(v, str):
+                out[k] = self._memo(v)
+        types = set(map(type, value.values()))
+        if dict in types or list in types:
+            for k, v in value.items():
+                if isinstance(v, (dict, list)):
+                    out[k] = self.order(v)
+        return out
+
+    def _memo(self, value: str) -> str:
+        pseudonym = self._pseudonyms.get(value)
+        if pseudonym is None:
+            if len(self._pseudonyms) >= 100000:
+                self._pseudonyms.clear()
+            pseudonym = self._pseudonyms[value] = self.pseudonym(value)
+        return pseudonym
+
+
+class Recording:
+    __slots__ = ("ts", "started", "tenant", "calls", "body", "size", "token")
+
+    def __init__(self):
+        self.ts = time.time()
+        self.started = time.perf_counter()
+        self.tenant: Optional[str] = None
+        self.calls: List[Tuple[str, str, float, int]] = []
+        self.body: Any = None
+        self.size = 0
+        self.token: Optional[Token] = None
+
+
+_current: ContextVar[Optional[Recording]] = ContextVar("payloadbridge_capture", default=None)
+
+
+class CaptureWriter:
+    """Appends captured requests to segment files from a background thread. The event loop only enqueues
+    (headers, the already parsed body, timings); sanitizing, encoding, compression and I/O happen here. Requests are dropped, and
+    counted, while the queue is full."""
+
+    def __init__(self, directory: str, segment_bytes: int, max_bytes: int, sanitizer: Sanitizer):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.sanitizer = sanitizer
+        self.written_bytes = 0
+        self.stopped = False
+        self.segments: List[Path] = []
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(QUEUE_SIZE)
+        self._file = None
+        self._segment_size = 0
+        self._seq = 0
+        self._thread = threading.Thread(target=self._run, name="payloadbridge-capture", daemon=True)
+
+    def start(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._thread.start()
+
+    def submit(self, item: tuple) -> None:
+        if self.stopped:
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            metrics.CAPTURE_RECORDS.labels("dropped").inc()
+
+    def close(self, timeout: float = 10.0) -> None:
+        # Flushes whatever is queued
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        block: List[bytes] = []
+        size = 0
+        flush_at = 0.0
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, flush_at - time.monotonic()) if block else None)
+            except queue.Empty:
+                self._write_block(block)
+                block, size = [], 0
+                continue
+            if item is None:
+                break
+            try:
+                line = fastjson.dumps(self.record(*item)) + b"\n"
+            except Exception as e:
+                logger.warning("Could not capture request: %s", e)
+                continue
+            if not block:
+                flush_at = time.monotonic() + FLUSH_INTERVAL
+            block.append(line)
+            size += len(line)
+            if size >= BLOCK_BYTES:
+                self._write_block(block)
+                block, size = [], 0
+        if block:
+            self._write_block(block)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def record(self, ts: float, elapsed: float, path: str, headers: Any, body: Any, size: int, status: int,
+               tenant: Optional[str], calls: Sequence[Tuple[str, str, float, int]]) -> Dict[str, Any]:
+        # body is None when it wasn't valid JSON: kept for the shape of the traffic, skipped by replay
+        lines = body.get("orderLines") if isinstance(body, dict) else None
+        lines = lines if isinstance(lines, list) else []
+        token = headers.get("access_token")
+        idempotency_key = headers.get("Idempotency-Key")
+        kept = {name: headers[name] for name in KEPT_HEADERS if name in headers}
+        if idempotency_key:
+            kept["Idempotency-Key"] = self.sanitizer.pseudonym(idempotency_key)
+        return {
+            "ts": ts, "elapsed": round(elapsed, 6), "path": path, "status": status, "tenant": tenant,
+            "caller": self.sanitizer.pseudonym(token, 16) if token else None, "headers": kept,
+            "bytes": size, "lines": len(lines),
+            "line_types": Counter(str(line.get("lineType")) for line in lines if isinstance(line, dict)),
+            "calls": [{"call": call, "method": method, "seconds": seconds, "status": code} for call, method, seconds, code in calls],
+            "body": self.sanitizer.order(body),
+        }
+
+    def _write_block(self, lines: List[bytes]) -> None:
+        data = zlib.compress(b"".join(lines), COMPRESSION_LEVEL)
+        frame = _BLOCK.pack(len(data), zlib.crc32(data)) + data
+        if self.max_bytes and self.written_bytes + len(frame) > self.max_bytes:
+            self._stop("CAPTURE_MAX_BYTES (%d) reached" % self.max_bytes, len(lines))
+            return
+        try:
+            if self._file is None or (self._segment_size + len(frame) > self.segment_bytes and self._segment_size > len(MAGIC)):
+                self._rotate()
+            self._file.write(frame)
+            self._file.flush()
+        except OSError as e:
+            self._stop(str(e), len(lines))
+            return
+        self._segment_size += len(frame)
+        self.written_bytes += len(frame)
+        metrics.CAPTURE_RECORDS.labels("written").inc(len(lines))
+
+    def _rotate(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        # Never appends to another writer's segment: a restarted process can have the same pid (1 in a container)
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        while True:
+            path = self.directory / f"capture-{stamp}-{os.getpid()}-{self._seq:05d}{SEGMENT_SUFFIX}"
+            self._seq += 1
+            try:
+                self._file = open(path, "xb")
+                break
+            except FileExistsError:
+                continue
+        self._file.write(MAGIC)
+        self._segment_size = len(MAGIC)
+        self.written_bytes += len(MAGIC)
+        self.segments.append(path)
+
+    def _stop(self, reason: str, dropped: int) -> None:
+        if not self.stopped:
+            logger.warning("Traffic capture stopped: %s", reason)
+        self.stopped = True
+        metrics.CAPTURE_RECORDS.labels("dropped").inc(dropped)
+
+
+_writer: Optional[CaptureWriter] = None
+
+
+def enabled() -> bool:
+    return settings.CAPTURE_ENABLED
+
+
+def startup() -> None:
+    global _writer
+    if not enabled() or _writer is not None:
+        return
+    extra = [field.strip() for field in settings.CAPTURE_REDACT_FIELDS.split(",") if field.strip()]
+    _writer = CaptureWriter(settings.CAPTURE_DIR, settings.CAPTURE_SEGMENT_BYTES, settings.CAPTURE_MAX_BYTES, Sanitizer(extra))
+    _writer.start()
+    logger.info("Capturing %.0f%% of orders to %s", settings.CAPTURE_SAMPLE_RATE * 100, settings.CAPTURE_DIR)
+
+
+def shutdown() -> None:
+    global _writer
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+
+
+def begin() -> Optional[Recording]:
+    # None (and nothing recorded) unless capture is running and this request is sampled
+    writer = _writer
+    if writer is None or writer.stopped or random.random() >= settings.CAPTURE_SAMPLE_RATE:
+        return None
+    recording = Recording()
+    recording.token = _current.set(recording)
+    return recording
+
+
+def set_tenant(tenant: Optional[str]) -> None:
+    recording = _current.get()
+    if recording is not None:
+        recording.tenant = tenant
+
+
+def note_body(body: Any, size: int) -> None:
+    # The order as received (before mapping); it is only read from here on
+    recording = _current.get()
+    if recording is not None:
+        recording.body = body
+        recording.size = size
+
+
+def note_call(call: str, seconds: float, status: int, method: str = "") -> None:
+    # One downstream call of the current request (status 0: no response)
+    recording = _current.get()
+    if recording is not None:
+        recording.calls.append((call, method, round(seconds, 6), status))
+
+
+def finish(recording: Recording, path: str, headers: Any, status: int) -> None:
+    _current.reset(recording.token)
+    writer = _writer
+    if writer is not None:
+        writer.submit((recording.ts, time.perf_counter() - recording.started, path, headers, recording.body,
+                       recording.size, status, recording.tenant, list(recording.calls)))
+
+
+def read_segment(path: os.PathLike) -> Iterator[Dict[str, Any]]:
+    """Records of one segment, in write order. The file is memory-mapped, so only the block being decoded is
+    copied; a torn last block (a segment still being written, or a crash) ends the segment early."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < len(MAGIC):
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(MAGIC)] != MAGIC:
+                raise CaptureFormatError(f"{path} is not a capture segment")
+            pos = len(MAGIC)
+            while pos + _BLOCK.size <= size:
+                length, crc = _BLOCK.unpack_from(data, pos)
+                start, end = pos + _BLOCK.size, pos + _BLOCK.size + length
+                if end > size:
+                    break
+                with memoryview(data)[start:end] as block:
+                    if zlib.crc32(block) != crc:
+                        logger.warning("Corrupt block at offset %d of %s; skipping the rest of the segment", pos, path)
+                        break
+                    records = zlib.decompress(block)
+                for line in records.splitlines():
+                    yield fastjson.loads(line)
+                pos = end
+
+
+def segment_paths(paths: Iterable[os.PathLike]) -> List[Path]:
+    # Directories expand to the segments in them, in name (start time) order
+    found: List[Path] = []
+    for path in map(Path, paths):
+        found.extend(sorted(path.glob(f"*{SEGMENT_SUFFIX}")) if path.is_dir() else [path])
+    return found
+
+
+def read_capture(paths: Iterable[os.PathLike]) -> Iterator[Dict[str, Any]]:
+    for path in segment_paths(paths):
+        yield from read_segment(path)
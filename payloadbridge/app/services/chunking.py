@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from app.core import deadline
+from app.core.config import settings
+from app.services import bridge
+from app.services.bridge import send_order
+from app.services.resilience import backoff_delay
+from app.utils import fastjson
+
+logger = logging.getLogger("payloadbridge")
+
+# Reported as the status of chunks that were never sent (no deadline left for them), distinct from a failed attempt
+SKIPPED = "skipped"
+
+
+def _retryable(status_code: int) -> bool:
+    return status_code >= 500 or status_code == 429
+
+
+async def forward_order(raw_body: bytes, okta_headers: Dict[str, str], request_id: str,
+                        body: Optional[Dict[str, Any]] = None) -> Tuple[int, Dict[str, Any]]:
+    # Small orders (and everything when chunking is off) are forwarded as the received bytes in one POST
+    chunk_lines = settings.ORDER_CHUNK_LINES
+    if chunk_lines > 0:
+        if body is None:
+            body = fastjson.loads(raw_body)
+        lines = body.get("orderLines") if isinstance(body, dict) else None
+        if isinstance(lines, list) and len(lines) > chunk_lines:
+            return await send_order_chunked(body, okta_headers, request_id, chunk_lines,
+                                            settings.ORDER_CHUNK_CONCURRENCY, settings.ORDER_CHUNK_RETRIES)
+    return await send_order(raw_body, okta_headers, request_id)
+
+
+async def send_order_chunked(body: Dict[str, Any], okta_headers: Dict[str, str], request_id: str, chunk_lines: int,
+                             concurrency: int, retries: int) -> Tuple[int, Dict[str, Any]]:
+    # The header and first chunk create the order (POST); the other chunks are added to it with PUT, at most
+    # `concurrency` at a time. Only chunks that fail with a retryable status are sent again.
+    header = {k: v for k, v in body.items() if k != "orderLines"}
+    lines = body["orderLines"]
+    chunks = [lines[i:i + chunk_lines] for i in range(0, len(lines), chunk_lines)]
+    tenant = okta_headers.get("tenantIdentifier")
+    logger.info("Forwarding %d lines in %d chunks", len(lines), len(chunks))
+
+    status_code, content = await send_order({**header, "orderLines": chunks[0]}, okta_headers, f"{request_id}:0")
+    if not 200 <= status_code < 300:
+        # Nothing was created, so the order can simply be retried as a whole
+        return status_code, {**content, "request_id": request_id}
+
+    results: List[Tuple[int, Dict[str, Any]]] = [(status_code, content)] + [(0, {})] * (len(chunks) - 1)
+    attempts = [1] + [0] * (len(chunks) - 1)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send_chunk(index: int) -> None:
+        async with semaphore:
+            attempts[index] += 1
+            payload = fastjson.dumps({**header, "orderLines": chunks[index]})
+            results[index] = await send_order(payload, okta_headers, f"{request_id}:{index}", method="PUT")
+
+    pending = list(range(1, len(chunks)))
+    for attempt in range(retries + 1):
+        delay = backoff_delay(attempt - 1) if attempt else 0.0
+        left = deadline.remaining()
+        if left is not None and left - delay < settings.DEADLINE_MIN_ATTEMPT:
+            break
+        if attempt:
+            await bridge.sleep(delay)
+            logger.warning("Retrying %d failed chunks", len(pending))
+        await asyncio.gather(*(send_chunk(i) for i in pending))
+        pending = [i for i in pending if _retryable(results[i][0])]
+        if not pending:
+            break
+
+    chunk_reports = []
+    line_reports = []
+    for index, (chunk, (chunk_status, chunk_content)) in enumerate(zip(chunks, results)):
+        if not attempts[index]:
+            chunk_status = SKIPPED
+        report = {"chunk": index, "method": "POST" if index == 0 else "PUT", "lineCount": len(chunk),
+                  "firstLine": chunk[0].get("lineNumber"), "lastLine": chunk[-1].get("lineNumber"),
+                  "status_code": chunk_status, "attempts": attempts[index]}
+        if "recvue" in chunk_content:
+            report["recvue"] = chunk_content["recvue"]
+        elif chunk_status == SKIPPED:
+            report["error"] = "Not sent"
+            report["details"] = "No time left in the request deadline"
+        else:
+            report["error"] = chunk_content.get("error")
+            report["details"] = chunk_content.get("details")
+        chunk_reports.append(report)
+        line_reports.extend({"lineNumber": line.get("lineNumber"), "chunk": index, "status_code": chunk_status} for line in chunk)
+
+    failed = [r for r in chunk_reports if r["status_code"] == SKIPPED or not 200 <= r["status_code"] < 300]
+    if failed:
+        logger.error("%d/%d chunks failed", len(failed), len(chunks))
+    return (200 if not failed else 207), {
+        "recvue": content.get("recvue"), "request_id": request_id, "tenant": tenant,
+        "chunked": True, "chunkCount": len(chunks), "failedChunks": len(failed),
+        "chunks": chunk_reports, "lines": line_reports,
+    }
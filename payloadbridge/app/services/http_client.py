@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import threading
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger("payloadbridge")
+
+_client: Optional[httpx.AsyncClient] = None
+_lock = threading.Lock()
+_warming: Optional[asyncio.Future] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _build_client() -> httpx.AsyncClient:
+    http2 = settings.HTTP2_ENABLED
+    if http2 and not _http2_available():
+        logger.warning("HTTP2_ENABLED is set but the 'h2' package is not installed; falling back to HTTP/1.1")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(limits=limits, http2=http2, timeout=settings.TIMEOUT)
+
+
+def get_client() -> httpx.AsyncClient:
+    # Created lazily so call sites work even when the app lifespan has not run (e.g. plain TestClient usage)
+    global _client
+    with _lock:
+        if _client is None or _client.is_closed:
+            _client = _build_client()
+        return _client
+
+
+async def startup() -> None:
+    # Building the client loads the CA bundle (tens of ms); do it in a thread so it doesn't delay readiness.
+    # A request arriving first waits on the lock for that build rather than starting a second one
+    global _warming
+    _warming = asyncio.ensure_future(asyncio.to_thread(get_client))
+
+
+async def shutdown() -> None:
+    global _client, _warming
+    if _warming is not None:
+        await _warming
+        _warming = None
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Any, Awaitable, Callable, NamedTuple, Optional, Tuple
+from fastapi import Response
+from app.core.config import settings
+from app.services.auth_utils import caller_key
+from app.utils import fastjson
+from app.utils.cache import SingleFlight, SQLiteTTLCache, new_cache
+
+logger = logging.getLogger("payloadbridge")
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# Outcomes that depend on transient state (auth, throttling, upstream failures) are never replayed
+NON_CACHEABLE_STATUSES = frozenset({401, 403, 408, 429})
+# Set on local rejections that depend on refreshable data (reference data, the lineType rule table)
+_NOT_STORED = "_idempotency_not_stored"
+
+
+class StoredResponse(NamedTuple):
+    content_hash: str
+    status_code: int
+    body: bytes
+    # Only set on shed (429/503) responses, which are never stored
+    retry_after: Optional[str] = None
+
+
+_results: Optional[Any] = None
+_inflight = SingleFlight()
+
+# With a shared store, the worker processing a key holds a lease on it; other workers poll for its result
+_PENDING = "pending"
+LEASE_POLL_INTERVAL = 0.05
+
+
+def _store():
+    # Built on first use, from the settings in effect then
+    global _results
+    if _results is None:
+        _results = new_cache(settings.IDEMPOTENCY_MAX_ENTRIES, settings.IDEMPOTENCY_TTL, settings.SHARED_CACHE_PATH, "idempotency")
+    return _results
+
+
+def clear() -> None:
+    if _results is not None:
+        _results.clear()
+
+
+def content_hash(body: Any) -> str:
+    # Canonical form: key order and whitespace don't make two submissions different
+    return hashlib.sha256(fastjson.canonical_dumps(body)).hexdigest()
+
+
+def request_key(access_token: str, host_name: str, digest: str, idempotency_key: Optional[str]) -> Tuple[str, ...]:
+    # Scoped to the caller's token so one caller can never be served another caller's stored response
+    caller = caller_key(access_token, host_name)
+    if idempotency_key:
+        return (*caller, "key", idempotency_key)
+    return (*caller, "body", digest)
+
+
+def _is_cacheable(status_code: int) -> bool:
+    return status_code < 500 and status_code not in NON_CACHEABLE_STATUSES
+
+
+def not_stored(response: Response) -> Response:
+    # Marks a response as not to be replayed: a resubmission after the data is refreshed must be checked again
+    setattr(response, _NOT_STORED, True)
+    return response
+
+
+def _replay(stored: StoredResponse, replayed: bool) -> Response:
+    headers = {REPLAYED_HEADER: "true"} if replayed else {}
+    if stored.retry_after:
+        headers["Retry-After"] = stored.retry_after
+    return Response(content=stored.body, status_code=stored.status_code, media_type="application/json", headers=headers)
+
+
+def _conflict(request_id: str) -> Response:
+    content = {"error": "Idempotency-Key was already used with a different payload", "request_id": request_id}
+    return Response(content=fastjson.dumps(content), status_code=422, media_type="application/json")
+
+
+async def run_once(key: Tuple[str, ...], digest: str, request_id: str, handler: Callable[[], Awaitable[Response]]) -> Response:
+    # Serves a stored response for a repeated submission; concurrent duplicates wait for the first one's result
+    if not settings.IDEMPOTENCY_ENABLED:
+        return await handler()
+
+    stored = _store().get(key)
+    if not isinstance(stored, StoredResponse):
+        owner = key not in _inflight
+        stored, executed = await _inflight.do(key, lambda: _execute(key, digest, handler))
+        replayed = not (owner and executed)
+    else:
+        replayed = True
+    if stored.content_hash != digest:
+        logger.warning("Idempotency-Key reused with a different payload")
+        return _conflict(request_id)
+    if replayed:
+        logger.info("Duplicate submission served from idempotency store")
+    return _replay(stored, replayed)
+
+
+async def _execute(key: Tuple[str, ...], digest: str, handler: Callable[[], Awaitable[Response]]) -> Tuple[StoredResponse, bool]:
+    results = _store()
+    leased = isinstance(results, SQLiteTTLCache)
+    if leased:
+        stored = await _acquire_lease(key)
+        if stored is not None:
+            return stored, False
+    try:
+        response = await handler()
+    except BaseException:
+        if leased:
+            results.pop(key)
+        raise
+    stored = StoredResponse(digest, response.status_code, bytes(response.body), response.headers.get("retry-after"))
+    if _is_cacheable(response.status_code) and not getattr(response, _NOT_STORED, False):
+        if leased:
+            await _record(key, stored)
+        else:
+            results.set(key, stored)
+    elif leased:
+        results.pop(key)
+    return stored, True
+
+
+async def _record(key: Tuple[str, ...], stored: StoredResponse) -> None:
+    # The result replaces the lease. A write given up on a busy file is retried for as long as the lease would last:
+    # left pending, the lease would expire and let a retry of the same key submit the order again
+    results = _store()
+    give_up = time.monotonic() + settings.IDEMPOTENCY_LEASE
+    while not results.set(key, stored):
+        if time.monotonic() >= give_up:
+            logger.error("Could not record the idempotent result; a retry may resubmit the order")
+            return
+        await asyncio.sleep(LEASE_POLL_INTERVAL)
+
+
+async def _acquire_lease(key: Tuple[str, ...]) -> Optional[StoredResponse]:
+    # Returns None once this worker holds the lease, or the result another worker stored meanwhile
+    results = _store()
+    while not results.add(key, _PENDING, ttl=settings.IDEMPOTENCY_LEASE):
+        stored = results.get(key)
+        if isinstance(stored, StoredResponse):
+            return stored
+        await asyncio.sleep(LEASE_POLL_INTERVAL)
+    return None
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from app.core import log, tracing
+from app.core.config import settings
+from app.services.chunking import forward_order
+
+# The caller's bearer token is kept encrypted in the queue (pip install cryptography)
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # pragma: no cover - exercised only without cryptography
+    Fernet = None
+
+logger = logging.getLogger("payloadbridge")
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    caller TEXT NOT NULL,
+    tenant TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    payload BLOB,
+    headers TEXT,
+    token BLOB,
+    result_status INTEGER,
+    result BLOB
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class JobStore:
+    """SQLite-backed persistent job queue. Calls block, so the async API runs them in a worker thread.
+
+    Rows hold the non-secret forwarding headers; the Authorization header is stored encrypted with `key` (a Fernet
+    key, JOBS_TOKEN_KEY) and dropped when the job completes. A job whose token can't be decrypted with the current
+    key is claimed without an Authorization header."""
+
+    def __init__(self, path: str, key: Optional[str] = None):
+        self.path = path
+        self._fernet = Fernet(key) if key else None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        if "token" not in {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN token BLOB")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def enqueue(self, payload: bytes, headers: Dict[str, str], caller: str) -> str:
+        if self._fernet is None:
+            raise RuntimeError("JobStore opened without a token key")
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        headers = dict(headers)
+        authorization = headers.pop("Authorization", None)
+        token = self._fernet.encrypt(authorization.encode("utf-8")) if authorization else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, caller, tenant, created_at, updated_at, payload, headers, token) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, caller, headers.get("tenantIdentifier"), now, now, payload, json.dumps(headers), token),
+            )
+        return job_id
+
+    def claim(self) -> Optional[Tuple[str, bytes, Dict[str, str]]]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, payload, headers, token FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (RUNNING, time.time(), row[0]))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        headers = json.loads(row[2])
+        if row[3] is not None and self._fernet is not None:
+            try:
+                headers["Authorization"] = self._fernet.decrypt(row[3]).decode("utf-8")
+            except InvalidToken:
+                pass
+        return row[0], row[1], headers
+
+    def complete(self, job_id: str, status_code: int, result: bytes) -> None:
+        status = SUCCEEDED if 200 <= status_code < 300 else FAILED
+        # The payload, forwarded headers and encrypted token are dropped once done
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, result_status = ?, result = ?, payload = NULL, headers = NULL, "
+                "token = NULL WHERE id = ?",
+                (status, time.time(), status_code, result, job_id),
+            )
+
+    def get(self, job_id: str, caller: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, tenant, created_at, updated_at, result_status, result FROM jobs WHERE id = ? AND caller = ?",
+                (job_id, caller),
+            ).fetchone()
+        if row is None:
+            return None
+        job = {"job_id": row[0], "status": row[1], "tenant": row[2], "created_at": row[3], "updated_at": row[4]}
+        if row[5] is not None:
+            job["result"] = {"status_code": row[5], "body": json.loads(row[6])}
+        return job
+
+    def requeue_running(self) -> int:
+        # Jobs left "running" by a crashed process are picked up again
+        with self._lock:
+            return self._conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE status = ?", (QUEUED, time.time(), RUNNING)).rowcount
+
+    def purge_finished(self, older_than: float) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (SUCCEEDED, FAILED, time.time() - older_than)
+            ).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+class JobQueue:
+    """Drains the JobStore with a pool of asyncio workers that forward orders to RecVue."""
+
+    def __init__(self, store: JobStore, workers: int, poll_interval: float):
+        self.store = store
+        self.worker_count = max(1, workers)
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._tasks: List["asyncio.Task[None]"] = []
+
+    async def start(self) -> None:
+        # In multi-worker mode the server recovers once before forking, so no worker requeues another's running jobs
+        requeued = await asyncio.to_thread(self.store.requeue_running) if settings.JOBS_RECOVER_ON_STARTUP else 0
+        purged = await asyncio.to_thread(self.store.purge_finished, settings.JOBS_RETENTION)
+        if requeued or purged:
+            logger.info("Job queue recovered %d interrupted jobs, purged %d finished jobs", requeued, purged)
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, payload: bytes, headers: Dict[str, str], caller: str) -> str:
+        job_id = await asyncio.to_thread(self.store.enqueue, payload, headers, caller)
+        self._wakeup.set()
+        return job_id
+
+    async def get(self, job_id: str, caller: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.store.get, job_id, caller)
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            job = await asyncio.to_thread(self.store.claim)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            job_id, payload, headers = job
+            log.bind(request_id=job_id, job_id=job_id, tenant=headers.get("tenantIdentifier"))
+            if "Authorization" not in headers:
+                # Queued under another JOBS_TOKEN_KEY (a restart without a configured key); only the caller can resend it
+                logger.warning("Job token can't be decrypted with the current key")
+                result = {"error": "Job authorization expired", "details": "Resubmit the order", "request_id": job_id}
+                await asyncio.to_thread(self.store.complete, job_id, 401, json.dumps(result).encode("utf-8"))
+                continue
+            try:
+                with tracing.span("job", job_id=job_id, tenant=headers.get("tenantIdentifier") or "") as span:
+                    status_code, content = await forward_order(payload, headers, job_id)
+                    tracing.set_status(span, status_code)
+            except Exception as e:
+                logger.error("Job failed: %s", e, exc_info=True)
+                status_code, content = 500, {"error": "Job failed", "details": str(e), "request_id": job_id}
+            await asyncio.to_thread(self.store.complete, job_id, status_code, json.dumps(content).encode("utf-8"))
+            logger.info("Job finished with RecVue status %s", status_code)
+
+
+_queue: Optional[JobQueue] = None
+_token_key: Optional[str] = None
+
+
+def db_path() -> str:
+    # Not relative to the working directory; the queue holds order payloads, so its directory is private
+    if settings.JOBS_DB_PATH:
+        return settings.JOBS_DB_PATH
+    state = os.environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+    directory = os.path.join(state, "payloadbridge")
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    return os.path.join(directory, "jobs.sqlite3")
+
+
+def token_key() -> str:
+    # Without a configured key, one per run: tokens of jobs still queued at a restart can't be read afterwards
+    global _token_key
+    if settings.JOBS_TOKEN_KEY:
+        return settings.JOBS_TOKEN_KEY
+    if _token_key is None and Fernet is not None:
+        _token_key = Fernet.generate_key().decode("ascii")
+    return _token_key
+
+
+def get_job_queue() -> JobQueue:
+    global _queue
+    if _queue is None:
+        _queue = JobQueue(JobStore(db_path(), token_key()), settings.JOBS_WORKERS, settings.JOBS_POLL_INTERVAL)
+    return _queue
+
+
+async def startup() -> None:
+    # Without JOBS_ENABLED there is no queue file and no pollers
+    if settings.JOBS_ENABLED:
+        if Fernet is None:
+            raise RuntimeError("JOBS_ENABLED needs the cryptography package")
+        await get_job_queue().start()
+
+
+async def shutdown() -> None:
+    global _queue
+    if _queue is not None:
+        await _queue.stop()
+        _queue.store.close()
+        _queue = None
@@ -0,0 +1,124 @@
+import json
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger("payloadbridge")
+
+DEFAULT_RULES_FILE = Path(__file__).resolve().parent.parent / "rules" / "line_type_rules.json"
+
+FIELD_LABELS = {
+    "itemName": "Item Name",
+    "quantity": "Quantity",
+    "unitPrice": "Unit Price",
+    "uom": "UoM",
+    "lineBillingCycle": "Billing Cycle",
+    "lineBillingFrequency": "Billing Frequency",
+    "lineInvoicingRule": "Invoicing Rule",
+}
+# Allowed-value checks on these fields are skipped for "BUY" intent orders, as RecVue does
+BILLING_FIELDS = frozenset({"lineBillingCycle", "lineBillingFrequency", "lineInvoicingRule"})
+
+_CONDITIONS: Dict[str, Tuple[Callable[[Any], bool], str]] = {
+    "NULL": (lambda v: v is None or v == "", "Line Type {line_type} should have {label} as null"),
+    "NOTNULL": (lambda v: v is not None and v != "", "Line Type {line_type} can't have {label} as null"),
+    "ZERO": (lambda v: v is None or v == 0, "Line Type {line_type} should have {label} as zero"),
+    "NOTZERO": (lambda v: v is None or v != 0, "Line Type {line_type} can't have {label} as zero"),
+    "POSITIVE": (lambda v: v is None or v > 0, "Line Type {line_type} should have {label} greater than zero"),
+    "NEGATIVE": (lambda v: v is None or v < 0, "Line Type {line_type} should have {label} less than zero"),
+}
+
+# (field, check, message, is_billing_field)
+Check = Tuple[str, Callable[[Any], bool], str, bool]
+Violation = Tuple[str, str]
+
+
+class LineTypeRuleEngine:
+    """Per-lineType checkers compiled once from the rule table."""
+
+    def __init__(self, table: Dict[str, Dict[str, Any]]):
+        self._core: Dict[str, Tuple[Check, ...]] = {}
+        self._billing: Dict[str, Tuple[Check, ...]] = {}
+        for line_type, rules in table.items():
+            checks = [c for field, rule in rules.items() for c in _compile_field(line_type, field, rule)]
+            self._core[line_type] = tuple(c for c in checks if not c[3])
+            self._billing[line_type] = tuple(c for c in checks if c[3])
+
+    @property
+    def line_types(self) -> Iterable[str]:
+        return self._core.keys()
+
+    def check_line(self, line: Any, intent: Optional[str] = None) -> List[Violation]:
+        # Unknown line types have no checks and are left to RecVue's own lookup validation
+        line_type = getattr(line, "lineType", None)
+        violations = _run(self._core.get(line_type, ()), line)
+        if intent != "BUY":
+            violations.extend(_run(self._billing.get(line_type, ()), line))
+        return violations
+
+    def check_billing(self, line: Any) -> List[Violation]:
+        # Billing checks alone, for callers that only learn the order intent after seeing the lines
+        return _run(self._billing.get(getattr(line, "lineType", None), ()), line)
+
+    def check_order(self, order: Any, intent: Optional[str] = None) -> List[Violation]:
+        violations = []
+        for line in order.orderLines:
+            for field, message in self.check_line(line, intent):
+                violations.append((field, f"Line {line.lineNumber}: {message}"))
+        return violations
+
+
+def _run(checks: Tuple[Check, ...], line: Any) -> List[Violation]:
+    violations = []
+    for field, check, message, _ in checks:
+        if not check(getattr(line, field, None)):
+            violations.append((field, message))
+    return violations
+
+
+def _compile_field(line_type: str, field: str, rule: Any) -> List[Check]:
+    label = FIELD_LABELS.get(field, field)
+    is_billing = field in BILLING_FIELDS
+    if isinstance(rule, str):
+        rule = [rule]
+    if field in ("uom",) or is_billing:
+        allowed = frozenset(v.strip() for r in rule for v in r.split(",") if v.strip())
+        if not allowed or "ANY" in allowed:
+            return []
+        message = f"Allowed {label}: {', '.join(sorted(allowed))}"
+        return [(field, lambda v, allowed=allowed: v is None or v in allowed, message, is_billing)]
+    checks = []
+    for condition in rule:
+        condition = condition.upper()
+        if condition == "ANY":
+            continue
+        if condition not in _CONDITIONS:
+            raise ValueError(f"Unknown condition {condition!r} for {line_type}.{field}")
+        check, template = _CONDITIONS[condition]
+        checks.append((field, check, template.format(line_type=line_type, label=label), is_billing))
+    return checks
+
+
+def load_rule_table(path: Path) -> Dict[str, Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("lineTypes", {})
+
+
+@lru_cache(maxsize=1)
+def get_rule_engine() -> LineTypeRuleEngine:
+    path = Path(settings.LINE_TYPE_RULES_FILE) if settings.LINE_TYPE_RULES_FILE else DEFAULT_RULES_FILE
+    engine = LineTypeRuleEngine(load_rule_table(path))
+    logger.info("Loaded lineType rules for %d line types from %s", len(list(engine.line_types)), path)
+    return engine
+
+
+def recvue_failure(violations: List[Violation]) -> Dict[str, Any]:
+    # Same shape RecVue returns for validation failures
+    return {
+        "statusCode": "FAILURE",
+        "message": "Validation Failed - " + " | ".join(f"{field}: {message}" for field, message in violations),
+        "id": None,
+    }
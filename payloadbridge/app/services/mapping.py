@@ -0,0 +1,252 @@
+import json
+import logging
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from app.core.config import settings
+
+# PyYAML is optional: without it only .json mapping specs are loaded
+try:
+    import yaml
+except ImportError:  # pragma: no cover - exercised only without PyYAML
+    yaml = None
+
+logger = logging.getLogger("payloadbridge")
+
+DEFAULT_MAPPINGS_DIR = Path(__file__).resolve().parent.parent / "mappings"
+
+# Requests naming a source in this header are mapped with that source's spec before validation
+SOURCE_HEADER = "X-Payload-Source"
+
+# A mapping spec turns one source's order shape into the RecVue order schema:
+#
+#   source: legacy_payload              # defaults to the file name
+#   header:                             # RecVue header field -> rule
+#     orderNumber: order_id             # a string is a (dotted) path into the source order
+#     orderType: {const: Standard Order}
+#     hdrEffectiveStartDate: {path: order_date, transform: date, required: true}
+#     hdrCreationDate: {today: true}
+#   lines:
+#     from: order_lines                 # path of the source's line list
+#     fields:                           # RecVue line field -> rule
+#       lineNumber: {index: 1}          # position in the list, counting from 1, as a string
+#       quantity: {path: quantity, transform: str}
+#
+# A rule takes its value from exactly one of path / const / index (lines only) / today, then applies, in order:
+# default (when the value is missing), values (a lookup table; unlisted values pass through), transform (a name
+# or list of names from TRANSFORMS), and required (missing -> MappingError). Missing values are left out of the
+# output so model defaults apply. Each spec is compiled once into a Python function with every rule inlined.
+
+
+class MappingError(ValueError):
+    pass
+
+
+class MappingSpecError(ValueError):
+    pass
+
+
+def _to_str(value: Any) -> str:
+    # 10.0 -> "10", not "10.0": RecVue takes numbers as strings
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _to_date(value: Any) -> str:
+    # ISO date or datetime -> "YYYY-MM-DD"
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    text = str(value)
+    return date.fromisoformat(text[:10]).isoformat()
+
+
+def _to_flag(value: Any) -> str:
+    if isinstance(value, str):
+        text = value.strip().upper()
+        if text in ("Y", "YES", "TRUE", "1"):
+            return "Y"
+        if text in ("N", "NO", "FALSE", "0"):
+            return "N"
+        raise ValueError(f"not a Y/N flag: {value!r}")
+    return "Y" if value else "N"
+
+
+TRANSFORMS: Dict[str, Callable[[Any], Any]] = {
+    "str": _to_str,
+    "int": int,
+    "float": float,
+    "upper": lambda v: str(v).upper(),
+    "lower": lambda v: str(v).lower(),
+    "strip": lambda v: str(v).strip(),
+    "date": _to_date,
+    "flag": _to_flag,
+}
+
+_SOURCE_KEYS = ("path", "const", "index", "today")
+_RULE_KEYS = frozenset(_SOURCE_KEYS + ("default", "values", "transform", "required"))
+
+
+class _Compiler:
+    """Emits the source of one transform function; values from the spec are bound as names, never inlined."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.code: List[str] = []
+        self.namespace: Dict[str, Any] = {"_MappingError": MappingError, "_date": date}
+        self.uses_today = False
+        # RecVue field -> the source path it is read from
+        self.paths: Dict[str, str] = {}
+
+    def bind(self, value: Any) -> str:
+        name = f"_k{len(self.namespace)}"
+        self.namespace[name] = value
+        return name
+
+    def emit(self, indent: int, line: str) -> None:
+        self.code.append("    " * indent + line)
+
+    def path(self, indent: int, record: str, path: str) -> None:
+        parts = path.split(".")
+        self.emit(indent, f"v = {record}.get({parts[0]!r})")
+        for part in parts[1:]:
+            self.emit(indent, f"v = v.get({part!r}) if v.__class__ is dict else None")
+
+    def field(self, indent: int, record: str, out: str, target: str, rule: Any, where: str, line_index: Optional[str]) -> None:
+        if isinstance(rule, str):
+            rule = {"path": rule}
+        if not isinstance(rule, dict):
+            raise MappingSpecError(f"{self.name}: rule for {where}{target} must be a path or a mapping")
+        unknown = set(rule) - _RULE_KEYS
+        sources = [k for k in _SOURCE_KEYS if k in rule]
+        if unknown or len(sources) != 1:
+            raise MappingSpecError(f"{self.name}: rule for {where}{target} needs exactly one of {', '.join(_SOURCE_KEYS)}"
+                                   + (f" (unknown keys: {', '.join(sorted(unknown))})" if unknown else ""))
+        source = sources[0]
+        if source == "path":
+            self.paths[target] = str(rule["path"])
+            self.path(indent, record, str(rule["path"]))
+        elif source == "index":
+            if line_index is None:
+                raise MappingSpecError(f"{self.name}: index is only available for line fields ({target})")
+            value = f"str({line_index} + {int(rule['index'])})"
+        elif source == "today":
+            self.uses_today = True
+            value = "today"
+        else:
+            value = self.bind(rule["const"])
+        steps = []
+        if "values" in rule:
+            if not isinstance(rule["values"], dict):
+                raise MappingSpecError(f"{self.name}: values for {where}{target} must be a mapping")
+            steps.append(f"v = {self.bind(rule['values'])}.get(v, v)")
+        transforms = rule.get("transform", [])
+        for transform in [transforms] if isinstance(transforms, str) else transforms:
+            if transform not in TRANSFORMS:
+                raise MappingSpecError(f"{self.name}: unknown transform {transform!r} for {where}{target}"
+                                       f" (expected one of {', '.join(TRANSFORMS)})")
+            steps.append(f"v = {self.bind(TRANSFORMS[transform])}(v)")
+        if source != "path":
+            if not steps and (source != "const" or rule["const"] is not None):
+                # Never missing: a plain assignment
+                self.emit(indent, f"{out}[{target!r}] = {value}")
+                return
+            self.emit(indent, f"v = {value}")
+
+        # Error messages name the field; spec text is bound, not spliced into the f-string
+        location = (f"{{{self.bind(where + target)}}}" if line_index is None
+                    else f"{{{self.bind(where)}}}[{{{line_index}}}].{{{self.bind(target)}}}")
+        if "default" in rule:
+            self.emit(indent, f"if v is None: v = {self.bind(rule['default'])}")
+        if steps:
+            self.emit(indent, "if v is not None:")
+            self.emit(indent + 1, "try:")
+            for step in steps:
+                self.emit(indent + 2, step)
+            self.emit(indent + 1, "except (TypeError, ValueError) as e:")
+            self.emit(indent + 2, f"raise _MappingError(f'{location}: {{e}}') from None")
+        if rule.get("required"):
+            self.emit(indent, f"if v is None: raise _MappingError(f'{location} is required')")
+        self.emit(indent, f"if v is not None: {out}[{target!r}] = v")
+
+
+def compile_spec(spec: Dict[str, Any], name: Optional[str] = None) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Compiles a mapping spec into `transform(order) -> RecVue order`. The generated source is kept on
+    `transform.source` for debugging, and the source path each RecVue field is read from on `transform.paths`."""
+    name = str(spec.get("source") or name or "mapping")
+    header = spec.get("header") or {}
+    lines = spec.get("lines")
+    if not isinstance(header, dict) or (lines is not None and not isinstance(lines, dict)):
+        raise MappingSpecError(f"{name}: header and lines must be mappings")
+
+    compiler = _Compiler(name)
+    compiler.emit(0, "def transform(src):")
+    compiler.emit(1, "if src.__class__ is not dict:")
+    compiler.emit(2, "raise _MappingError('Order must be a JSON object')")
+    compiler.emit(1, "out = {}")
+    for target, rule in header.items():
+        compiler.field(1, "src", "out", str(target), rule, "", None)
+    if lines is not None:
+        line_from = lines.get("from")
+        fields = lines.get("fields") or {}
+        if not line_from or not isinstance(fields, dict):
+            raise MappingSpecError(f"{name}: lines needs 'from' (a path) and 'fields' (a mapping)")
+        compiler.path(1, "src", str(line_from))
+        compiler.emit(1, "if v is None: v = ()")
+        compiler.emit(1, "elif v.__class__ is not list:")
+        compiler.emit(2, f"raise _MappingError({str(line_from) + ' must be a list'!r})")
+        where = compiler.bind(str(line_from))
+        compiler.emit(1, "order_lines = out['orderLines'] = []")
+        compiler.emit(1, "for i, line in enumerate(v):")
+        compiler.emit(2, "if line.__class__ is not dict:")
+        compiler.emit(3, f"raise _MappingError(f'{{{where}}}[{{i}}] must be a JSON object')")
+        compiler.emit(2, "row = {}")
+        for target, rule in fields.items():
+            compiler.field(2, "line", "row", str(target), rule, str(line_from), "i")
+        compiler.emit(2, "order_lines.append(row)")
+    compiler.emit(1, "return out")
+    if compiler.uses_today:
+        compiler.code.insert(3, "    today = _date.today().isoformat()")
+
+    source = "\n".join(compiler.code) + "\n"
+    exec(compile(source, f"<mapping {name}>", "exec"), compiler.namespace)
+    transform = compiler.namespace["transform"]
+    transform.__name__ = transform.__qualname__ = f"map_{re.sub(r'[^0-9A-Za-z_]', '_', name)}"
+    transform.source = source
+    transform.paths = compiler.paths
+    return transform
+
+
+def load_spec(path: Path) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.suffix == ".json":
+            spec = json.load(f)
+        elif yaml is None:
+            raise MappingSpecError(f"{path.name}: YAML mapping specs need PyYAML (pip install pyyaml)")
+        else:
+            spec = yaml.safe_load(f)
+    if not isinstance(spec, dict):
+        raise MappingSpecError(f"{path.name}: a mapping spec must be a mapping")
+    return spec
+
+
+@lru_cache(maxsize=1)
+def get_mappings() -> Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]]:
+    # Every spec in MAPPINGS_DIR, compiled once; a broken spec fails startup rather than the first request using it
+    directory = Path(settings.MAPPINGS_DIR) if settings.MAPPINGS_DIR else DEFAULT_MAPPINGS_DIR
+    mappings = {}
+    for path in sorted(directory.glob("*")):
+        if path.suffix not in (".yaml", ".yml", ".json"):
+            continue
+        spec = load_spec(path)
+        transform = compile_spec(spec, path.stem)
+        mappings[str(spec.get("source") or path.stem)] = transform
+    if mappings:
+        logger.info("Compiled %d payload mappings from %s: %s", len(mappings), directory, ", ".join(sorted(mappings)))
+    return mappings
+
+
+def get_mapping(source: str) -> Optional[Callable[[Dict[str, Any]], Dict[str, Any]]]:
+    return get_mappings().get(source)
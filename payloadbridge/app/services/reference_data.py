@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from app.core import metrics
+from app.core.config import settings
+from app.services.http_client import get_client
+from app.services.line_rules import Violation
+from app.utils import fastjson
+
+logger = logging.getLogger("payloadbridge")
+
+# Lookup-backed fields from docs/ORDER_VALIDATION_DOCUMENTATION.md: field -> (lookup set, label in the error message).
+# A tenant's reference data is a JSON object of lookup set -> valid values; fields whose set it doesn't define,
+# and empty values, are not checked.
+HEADER_FIELDS: Dict[str, Tuple[str, str]] = {
+    "orderType": ("ORDER_TYPE", "order type"),
+    "orderCategory": ("ORDER_CATEGORY", "order category"),
+    "businessUnit": ("BUSINESS_UNIT", "business unit"),
+    "hdrBillToCustAccountNum": ("CUSTOMER_ACCOUNT", "customer account number"),
+    "hdrSellToCustAccountNum": ("CUSTOMER_ACCOUNT", "sell-to customer"),
+    "priceList": ("PRICE_LIST", "price list"),
+    "hdrCurrency": ("CURRENCY", "currency"),
+    "hdrPayTermName": ("PAYMENT_TERMS", "payment terms"),
+    "paymentMethod": ("PAYMENT_METHOD", "payment method"),
+    "hdrBillingCycle": ("BILLING_CYCLE", "billing cycle"),
+    "hdrBillingFrequency": ("BILLING_FREQUENCY", "billing frequency"),
+    "hdrInvoicingRule": ("INVOICING_RULE", "invoicing rule"),
+    "hdrBillingChannel": ("BILLING_CHANNEL", "billing channel"),
+    "hdrDeliveryChannel": ("FULFILLMENT_CHANNEL", "delivery channel"),
+}
+LINE_FIELDS: Dict[str, Tuple[str, str]] = {
+    "lineType": ("LINE_TYPE", "line type"),
+    "lineBillToCustAccountNum": ("CUSTOMER_ACCOUNT", "bill-to customer account"),
+    "lineSellToCustAccountNum": ("CUSTOMER_ACCOUNT", "sell-to customer account"),
+    "lineBillingChannel": ("BILLING_CHANNEL", "Billing Channel"),
+    "lineDeliveryChannel": ("FULFILLMENT_CHANNEL", "Fulfillment Channel"),
+    "trackingOptions": ("TRACKING_OPTION", "tracking option"),
+}
+
+# (field, digests of the valid values, label)
+FieldCheck = Tuple[str, frozenset, str]
+
+
+def _digest(value: Any) -> int:
+    # Python's 64-bit string hash: cached on the string, and stable for the life of the process that built the index
+    return hash(value if isinstance(value, str) else str(value))
+
+
+class LookupIndex:
+    """One tenant's lookup sets, compiled into per-field checks. Values are kept as 64-bit digests in frozensets:
+    O(1) membership at a fraction of the memory of the strings. A digest collision can only let an invalid value
+    through to RecVue, never reject a valid one."""
+
+    __slots__ = ("header_checks", "line_checks", "sizes", "loaded_at")
+
+    def __init__(self, lookups: Dict[str, Iterable[Any]], loaded_at: float):
+        sets = {name: frozenset(_digest(v) for v in values) for name, values in lookups.items() if isinstance(values, list)}
+        self.header_checks: Tuple[FieldCheck, ...] = tuple(
+            (field, sets[lookup], label) for field, (lookup, label) in HEADER_FIELDS.items() if lookup in sets)
+        self.line_checks: Tuple[FieldCheck, ...] = tuple(
+            (field, sets[lookup], label) for field, (lookup, label) in LINE_FIELDS.items() if lookup in sets)
+        self.sizes = {name: len(values) for name, values in sets.items()}
+        self.loaded_at = loaded_at
+
+    def check(self, order: Any) -> List[Violation]:
+        violations: List[Violation] = []
+        _run(self.header_checks, order, False, violations)
+        if self.line_checks:
+            for line in _get(order, "orderLines") or ():
+                _run(self.line_checks, line, True, violations)
+        return violations
+
+
+def _get(record: Any, field: str) -> Any:
+    # Orders arrive as decoded JSON or as validated models
+    return record.get(field) if isinstance(record, dict) else getattr(record, field, None)
+
+
+def _run(checks: Tuple[FieldCheck, ...], record: Any, is_line: bool, violations: List[Violation]) -> None:
+    for field, valid, label in checks:
+        value = _get(record, field)
+        if value is not None and value != "" and _digest(value) not in valid:
+            prefix = f"Line {_get(record, 'lineNumber')}: " if is_line else ""
+            violations.append((field, f"{prefix}Invalid {label}: {value}"))
+
+
+Loader = Callable[[str], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class ReferenceData:
+    """Per-tenant LookupIndex cache with stale-while-revalidate: an index older than `ttl` is still served while a
+    background task reloads it, until it is `max_stale` past its TTL. The request path never waits for a load; a
+    tenant without a usable index is simply not checked (RecVue still validates). Failed loads are retried after
+    `retry` seconds."""
+
+    def __init__(self, loader: Loader, ttl: float, max_stale: float, retry: float, timer: Callable[[], float] = time.monotonic):
+        self._loader = loader
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.retry = retry
+        self._timer = timer
+        self._entries: Dict[str, LookupIndex] = {}
+        self._next_attempt: Dict[str, float] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+
+    def get(self, tenant: str) -> Optional[LookupIndex]:
+        now = self._timer()
+        entry = self._entries.get(tenant)
+        if entry is None or now - entry.loaded_at >= self.ttl:
+            self._refresh(tenant, now)
+            if entry is not None and now - entry.loaded_at >= self.ttl + self.max_stale:
+                return None
+        return entry
+
+    def _refresh(self, tenant: str, now: float) -> None:
+        if tenant in self._loading or now < self._next_attempt.get(tenant, 0.0):
+            return
+        task = asyncio.get_running_loop().create_task(self.load(tenant))
+        self._loading[tenant] = task
+        task.add_done_callback(lambda _: self._loading.pop(tenant, None))
+
+    async def load(self, tenant: str) -> Optional[LookupIndex]:
+        started = self._timer()
+        try:
+            lookups = await self._loader(tenant)
+            # Building the digest sets for large lookups (customer accounts) takes milliseconds; keep it off the loop
+            index = await asyncio.to_thread(LookupIndex, lookups or {}, started)
+        except Exception as e:
+            self._next_attempt[tenant] = self._timer() + self.retry
+            logger.warning("Reference data load for tenant %s failed: %s", tenant, e)
+            return self._entries.get(tenant)
+        self._entries[tenant] = index
+        self._next_attempt.pop(tenant, None)
+        logger.info("Loaded reference data for tenant %s: %s", tenant,
+                    ", ".join(f"{name}={size}" for name, size in sorted(index.sizes.items())) or "no lookups")
+        return index
+
+    async def close(self) -> None:
+        tasks = list(self._loading.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._next_attempt.clear()
+
+
+async def load_source(tenant: str) -> Optional[Dict[str, Any]]:
+    # REFERENCE_DATA_SOURCE is a file path or an http(s) URL; "{tenant}" in it is replaced by the tenant.
+    # A missing file or a 404 means the tenant has no reference data.
+    source = settings.REFERENCE_DATA_SOURCE.replace("{tenant}", tenant)
+    if source.startswith(("http://", "https://")):
+        resp = await get_client().get(source, headers={"Authorization": f"Bearer {settings.RECVUE_API_TOKEN}"},
+                                      timeout=settings.TIMEOUT)
+        if resp.status_code == 404:
+            return None
+        resp.raise_for_status()
+        data = fastjson.loads(resp.content)
+    else:
+        data = await asyncio.to_thread(_read_file, source)
+    if data is not None and not isinstance(data, dict):
+        raise ValueError(f"Reference data for {tenant} must be a JSON object of lookup name -> values")
+    return data
+
+
+def _read_file(path: str) -> Optional[Any]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return fastjson.loads(f.read())
+
+
+_reference: Optional[ReferenceData] = None
+
+
+def get_reference_data() -> ReferenceData:
+    global _reference
+    if _reference is None:
+        _reference = ReferenceData(load_source, settings.REFERENCE_DATA_TTL, settings.REFERENCE_DATA_MAX_STALE,
+                                   settings.REFERENCE_DATA_RETRY)
+    return _reference
+
+
+def enabled() -> bool:
+    return bool(settings.REFERENCE_DATA_SOURCE)
+
+
+def check_order(tenant: Optional[str], order: Any) -> List[Violation]:
+    # `order` is decoded JSON, a validated model, or raw bytes (decoded only if the tenant has lookups)
+    if not enabled() or not tenant:
+        return []
+    index = get_reference_data().get(tenant)
+    if index is None or not (index.header_checks or index.line_checks):
+        return []
+    if isinstance(order, (bytes, str)):
+        order = fastjson.loads(order)
+    violations = index.check(order)
+    for field, _ in violations:
+        metrics.REFERENCE_REJECTIONS.labels(tenant, field).inc()
+    return violations
+
+
+async def startup() -> None:
+    # Loads the tenants in REFERENCE_DATA_TENANTS in the background; others are loaded on their first order
+    if not enabled():
+        return
+    reference = get_reference_data()
+    for tenant in filter(None, (t.strip() for t in settings.REFERENCE_DATA_TENANTS.split(","))):
+        reference.get(tenant)
+
+
+async def shutdown() -> None:
+    global _reference
+    if _reference is not None:
+        await _reference.close()
+        _reference = None
@@ -0,0 +1,266 @@
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+from app.core.config import settings
+from app.utils.cache import new_cache
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"circuit open, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimitError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; after `reset_timeout` lets a few probes through."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, half_open_max_calls: int = 1,
+                 timer: Callable[[], float] = time.monotonic, on_change: Optional[Callable[[str], None]] = None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._timer = timer
+        self._on_change = on_change
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+    def before_call(self) -> None:
+        # Raises CircuitOpenError when the call must fail fast
+        if self.state == OPEN:
+            remaining = self._opened_at + self.reset_timeout - self._timer()
+            if remaining > 0:
+                raise CircuitOpenError(remaining)
+            self.state = HALF_OPEN
+            self._probes = 0
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_max_calls:
+                raise CircuitOpenError(self.reset_timeout)
+            self._probes += 1
+
+    def cancel_call(self) -> None:
+        # The call allowed by before_call() never reached RecVue; give the half-open probe back
+        if self.state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def record_success(self) -> None:
+        if self.state != CLOSED and self._on_change is not None:
+            self._on_change(CLOSED)
+        self.state = CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self._opened_at = self._timer()
+            if self._on_change is not None:
+                self._on_change(OPEN)
+
+    def trip(self, remaining: float) -> None:
+        # Opened elsewhere (another worker process); fail fast here too for the `remaining` seconds
+        if self.state == CLOSED:
+            self.state = OPEN
+            self._opened_at = self._timer() - max(0.0, self.reset_timeout - remaining)
+
+
+class AIMDLimiter:
+    """Adaptive concurrency limit: +1/limit per fast success, multiplicative decrease on failure or slow calls."""
+
+    def __init__(self, initial: int, minimum: int, maximum: int, latency_target: float, backoff_ratio: float):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.backoff_ratio = backoff_ratio
+        self.in_flight = 0
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+
+    @asynccontextmanager
+    async def slot(self, max_wait: float) -> AsyncIterator[None]:
+        await self._acquire(max_wait)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._wake()
+
+    async def _acquire(self, max_wait: float) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        # Futures are created per call so the limiter isn't tied to one event loop
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=max_wait)
+        except asyncio.TimeoutError:
+            raise ConcurrencyLimitError(f"concurrency limit {int(self.limit)} reached") from None
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        # The slot was handed over by _wake (which already counted it)
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def on_success(self, latency: float) -> None:
+        if latency > self.latency_target:
+            self._decrease()
+        else:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._wake()
+
+    def on_failure(self) -> None:
+        self._decrease()
+
+    def _decrease(self) -> None:
+        self.limit = max(float(self.minimum), self.limit * self.backoff_ratio)
+
+
+class LatencyTracker:
+    """Recent call latencies; hedge_delay() is their `quantile` once `min_samples` have been seen."""
+
+    def __init__(self, quantile: float, min_samples: int, min_delay: float, size: int = 200):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._cached: Optional[float] = None
+
+    def observe(self, latency: float) -> None:
+        self._samples.append(latency)
+        self._cached = None
+
+    def hedge_delay(self) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        if self._cached is None:
+            ordered = sorted(self._samples)
+            self._cached = ordered[min(len(ordered) - 1, int(self.quantile * len(ordered)))]
+        return max(self.min_delay, self._cached)
+
+
+def new_latency_tracker() -> LatencyTracker:
+    return LatencyTracker(settings.HEDGE_QUANTILE, settings.HEDGE_MIN_SAMPLES, settings.HEDGE_MIN_DELAY)
+
+
+async def hedged(call: Callable[[], Awaitable[T]], delay: Optional[float]) -> Tuple[T, str]:
+    # Starts call(); if it hasn't finished after `delay` seconds starts a second one and returns whichever succeeds
+    # first, cancelling the other. Only for idempotent calls. The second value is "" (no hedge), "lost" or "won".
+    first = asyncio.ensure_future(call())
+    if delay is None:
+        return await first, ""
+    tasks: List["asyncio.Future[T]"] = [first]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return first.result(), ""
+        tasks.append(asyncio.ensure_future(call()))
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), "won" if task is tasks[1] else "lost"
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+# Open breakers are published here (tenant -> wall-clock time the breaker may half-open) so that in multi-worker
+# mode every process stops calling a failing tenant, not just the one that saw the failures
+_UNSET = object()
+_shared_breakers: Any = _UNSET
+
+
+def _breaker_store():
+    # None unless SHARED_CACHE_PATH is set; resolved on first use
+    global _shared_breakers
+    if _shared_breakers is _UNSET:
+        _shared_breakers = new_cache(10000, settings.BREAKER_RESET_TIMEOUT, settings.SHARED_CACHE_PATH, "breakers") \
+            if settings.SHARED_CACHE_PATH else None
+    return _shared_breakers
+
+
+class TenantGuard:
+    def __init__(self, tenant: str = ""):
+        self.tenant = tenant
+        self.breaker = CircuitBreaker(settings.BREAKER_FAILURE_THRESHOLD, settings.BREAKER_RESET_TIMEOUT,
+                                      settings.BREAKER_HALF_OPEN_MAX_CALLS, on_change=self._publish)
+        self.limiter = AIMDLimiter(settings.LIMITER_INITIAL, settings.LIMITER_MIN, settings.LIMITER_MAX,
+                                   settings.LIMITER_LATENCY_TARGET, settings.LIMITER_BACKOFF_RATIO)
+        self.latencies: Dict[str, LatencyTracker] = {}
+
+    def _publish(self, state: str) -> None:
+        shared = _breaker_store()
+        if shared is None:
+            return
+        if state == OPEN:
+            shared.set(self.tenant, time.time() + self.breaker.reset_timeout)
+        else:
+            shared.pop(self.tenant)
+
+    def sync(self) -> None:
+        # Picks up a breaker opened by another worker process
+        shared = _breaker_store()
+        if shared is None or self.breaker.state != CLOSED:
+            return
+        open_until = shared.get(self.tenant)
+        if open_until is not None:
+            self.breaker.trip(open_until - time.time())
+
+    def latency(self, method: str) -> LatencyTracker:
+        tracker = self.latencies.get(method)
+        if tracker is None:
+            tracker = self.latencies[method] = new_latency_tracker()
+        return tracker
+
+    def snapshot(self) -> Dict[str, object]:
+        return {"state": self.breaker.state, "failures": self.breaker.failures,
+                "limit": round(self.limiter.limit, 2), "in_flight": self.limiter.in_flight}
+
+
+_guards: Dict[str, TenantGuard] = {}
+
+
+def get_tenant_guard(tenant: Optional[str]) -> TenantGuard:
+    key = tenant or ""
+    guard = _guards.get(key)
+    if guard is None:
+        guard = _guards[key] = TenantGuard(key)
+    return guard
+
+
+def tenant_states() -> Dict[str, Dict[str, object]]:
+    return {tenant: guard.snapshot() for tenant, guard in _guards.items()}
+
+
+def reset() -> None:
+    _guards.clear()
+    if _shared_breakers is not _UNSET and _shared_breakers is not None:
+        _shared_breakers.clear()
+
+
+def backoff_delay(attempt: int) -> float:
+    # "Full jitter" exponential backoff: uniform in [0, min(cap, base * 2^attempt)]
+    return random.uniform(0, min(settings.RETRY_BACKOFF_MAX, settings.RETRY_BACKOFF_BASE * (2 ** attempt)))
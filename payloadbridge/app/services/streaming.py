@@ -0,0 +1,92 @@
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from app.models import order_schema
+from app.services.line_rules import get_rule_engine
+from app.utils.json_stream import IncrementalOrderParser, assemble_order
+from app.utils.validators import validation_message
+
+# Cap on reported line errors so a badly broken upload can't grow the error list without bound
+MAX_REPORTED_LINE_ERRORS = 100
+
+
+class LineValidator:
+    """Validates order lines one at a time and keeps only what is needed to forward the order."""
+
+    def __init__(self):
+        self.count = 0
+        self.error_count = 0
+        self.errors: List[Dict[str, Any]] = []
+        # Billing-field rule violations are held back until the order intent ("BUY" skips them) is known; like the
+        # other errors only the first MAX_REPORTED_LINE_ERRORS are kept, the rest are only counted
+        self.billing_errors: List[Dict[str, Any]] = []
+        self.billing_error_count = 0
+        self.raw_lines: List[str] = []
+        self._rules = get_rule_engine()
+
+    def add(self, line: Any, raw: Optional[str] = None) -> None:
+        index = self.count
+        self.count += 1
+        try:
+            if not isinstance(line, dict):
+                raise ValueError("Order line must be a JSON object")
+            order_line = order_schema.validate_line(line)
+        except Exception as e:
+            self._fail(index, line.get("lineNumber") if isinstance(line, dict) else None, validation_message(e))
+            return
+        for field, message in self._rules.check_line(order_line, intent="BUY"):
+            self._fail(index, order_line.lineNumber, f"{field}: {message}")
+        for field, message in self._rules.check_billing(order_line):
+            self.billing_error_count += 1
+            if len(self.billing_errors) < MAX_REPORTED_LINE_ERRORS:
+                self.billing_errors.append({"lineIndex": index, "lineNumber": order_line.lineNumber, "error": f"{field}: {message}"})
+        if not self.error_count and raw is not None:
+            self.raw_lines.append(raw)
+
+    def apply_intent(self, intent: Optional[str]) -> None:
+        if intent != "BUY":
+            for error in self.billing_errors:
+                self._record(error)
+            self.error_count += self.billing_error_count - len(self.billing_errors)
+        self.billing_errors = []
+        self.billing_error_count = 0
+
+    def _fail(self, index: int, line_number: Any, message: str) -> None:
+        self._record({"lineIndex": index, "lineNumber": line_number, "error": message})
+
+    def _record(self, error: Dict[str, Any]) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_LINE_ERRORS:
+            self.errors.append(error)
+        # Once the order is known to be invalid there is no point holding its lines
+        self.raw_lines = []
+
+
+def validate_header(header: Dict[str, Any], lines: LineValidator) -> List[Dict[str, Any]]:
+    lines.apply_intent(header.get("hdrIntent"))
+    errors = []
+    try:
+        order_schema.validate_header(header)
+    except Exception as e:
+        errors.append({"field": "header", "error": validation_message(e)})
+    if lines.count == 0:
+        errors.append({"field": "orderLines", "error": "At least one order line is required"})
+    return errors
+
+
+def validation_details(header_errors: List[Dict[str, Any]], lines: LineValidator) -> Dict[str, Any]:
+    return {"header": header_errors, "lines": lines.errors, "invalidLineCount": lines.error_count, "lineCount": lines.count}
+
+
+async def parse_streamed_order(chunks: AsyncIterator[bytes], max_pending_chars: int) -> Tuple[Dict[str, Any], LineValidator]:
+    # Validates each order line as soon as it has been received; the decoded line is dropped right after
+    parser = IncrementalOrderParser(max_pending_chars=max_pending_chars)
+    lines = LineValidator()
+    async for chunk in chunks:
+        for line, raw in parser.feed(chunk):
+            lines.add(line, raw)
+    for line, raw in parser.close():
+        lines.add(line, raw)
+    return parser.header, lines
+
+
+def streamed_order_body(header: Dict[str, Any], lines: LineValidator) -> bytes:
+    return assemble_order(header, lines.raw_lines)
@@ -0,0 +1,60 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional, Tuple
+from app.core.config import settings
+from app.models.order_schema import validate_order, warm_up
+from app.services.line_rules import get_rule_engine
+from app.utils.validators import validation_message
+
+logger = logging.getLogger("payloadbridge")
+
+# Validating a multi-megabyte order holds the event loop for tens of milliseconds, stalling every other request on
+# the worker. Orders of at least VALIDATION_OFFLOAD_BYTES are instead validated (schema + lineType rules) in a
+# process pool; only the raw bytes go in and a small (outcome, details, line count) tuple comes back.
+
+VALID, INVALID, RULE_VIOLATIONS = "valid", "invalid", "rules"
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _warm_up() -> None:
+    # Compile the rule table and order models once per child rather than on its first order
+    get_rule_engine()
+    warm_up(settings.ORDER_SCHEMA_MODE)
+
+
+def check_order(raw_body: bytes, mode: str) -> Tuple[str, Any, int]:
+    try:
+        order = validate_order(raw_body, mode)
+    except Exception as e:
+        return INVALID, validation_message(e), 0
+    violations = get_rule_engine().check_order(order, order.hdrIntent)
+    if violations:
+        return RULE_VIOLATIONS, violations, len(order.orderLines)
+    return VALID, None, len(order.orderLines)
+
+
+def startup() -> None:
+    global _pool
+    if settings.VALIDATION_PROCESSES > 0 and _pool is None:
+        # spawn, not fork: the parent has running threads (log listener, SQLite) that fork would copy mid-state
+        _pool = ProcessPoolExecutor(settings.VALIDATION_PROCESSES, mp_context=multiprocessing.get_context("spawn"),
+                                    initializer=_warm_up)
+        logger.info("Validation pool started with %d processes", settings.VALIDATION_PROCESSES)
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def should_offload(size: int) -> bool:
+    return _pool is not None and size >= settings.VALIDATION_OFFLOAD_BYTES
+
+
+async def check_order_offloaded(raw_body: bytes) -> Tuple[str, Any, int]:
+    return await asyncio.get_running_loop().run_in_executor(_pool, check_order, raw_body, settings.ORDER_SCHEMA_MODE)
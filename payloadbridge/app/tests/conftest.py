@@ -0,0 +1,30 @@
+import os
+import tempfile
+
+# Settings() requires these; it is built on first use, so they only need to be set before the first test runs
+os.environ.setdefault("AUTHORIZE_URL_BASE", "https://auth.example.com")
+os.environ.setdefault("RECVUE_API_BASE_URL", "https://tenant.recvue.com/api/v2.0/order/orderlines")
+os.environ.setdefault("RECVUE_API_TOKEN", "test-token")
+os.environ.setdefault("JOBS_ENABLED", "true")
+os.environ.setdefault("JOBS_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="payloadbridge-tests-"), "jobs.sqlite3"))
+os.environ.setdefault("JOBS_POLL_INTERVAL", "0.05")
+os.environ.setdefault("RETRY_BACKOFF_BASE", "0.001")
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _reset_caches():
+    from app.core import metrics
+    from app.services import admission, idempotency, resilience
+    from app.services.auth_utils import clear_auth_cache
+    clear_auth_cache()
+    idempotency.clear()
+    resilience.reset()
+    admission.reset()
+    metrics.REGISTRY.clear()
+    yield
+    clear_auth_cache()
+    idempotency.clear()
+    resilience.reset()
+    admission.reset()
@@ -0,0 +1,175 @@
+import asyncio
+import pytest
+import respx
+from fastapi.testclient import TestClient
+from app.core import metrics
+from app.core.config import settings
+from app.main import app
+from app.services import admission
+from app.services.admission import (QUEUE_FULL, QUEUE_TIME, RATE, TIMEOUT, AdmissionController, FairQueue, Rejected,
+                                    TokenBucket, order_cost)
+from app.tests.test_http_client import AUTH_URL, HEADERS, PAYLOAD, RECVUE_URL
+
+
+def test_token_bucket_reserves_and_rejects_beyond_the_wait_budget():
+    now = [0.0]
+    bucket = TokenBucket(rate=2, burst=4, timer=lambda: now[0])
+    assert bucket.reserve(3, max_wait=1) == 0
+    assert bucket.reserve(2, max_wait=1) == pytest.approx(0.5)  # 1 token left, 1 more in 0.5s
+    with pytest.raises(Rejected) as e:
+        bucket.reserve(4, max_wait=1)
+    assert (e.value.status_code, e.value.reason, e.value.retry_after_header()) == (429, RATE, "3")
+    now[0] = 10
+    assert bucket.reserve(100, max_wait=0) == 0  # capped at the burst, so huge orders still get through
+
+
+def test_small_orders_cost_less():
+    assert order_cost(1) == pytest.approx(1.01)
+    assert order_cost(5000) == pytest.approx(51)
+
+
+async def _run(queue: FairQueue, tenant: str, cost: float, order: list, hold: float = 0.01, max_wait: float = 1.0):
+    held = await queue.acquire(tenant, cost, max_wait)
+    order.append(tenant)
+    await asyncio.sleep(hold)
+    queue.release(held, hold)
+
+
+@pytest.mark.asyncio
+async def test_a_backlogged_tenant_does_not_starve_others():
+    queue = FairQueue(capacity=1, max_queue=100, weights={})
+    order = []
+    tasks = [asyncio.create_task(_run(queue, "bulk", 1, order)) for _ in range(6)]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(_run(queue, "small", 1, order)))
+    await asyncio.gather(*tasks)
+    assert order.index("small") <= 2
+    assert queue.in_use == 0 and queue.queued() == 0
+
+
+@pytest.mark.asyncio
+async def test_small_orders_overtake_large_ones_and_weights_apply():
+    queue = FairQueue(capacity=10, max_queue=100, weights={"gold": 4})
+    order = []
+    blocker = asyncio.create_task(_run(queue, "blocker", 10, order, hold=0.02))
+    await asyncio.sleep(0)
+    tasks = [asyncio.create_task(_run(queue, tenant, cost, order))
+             for tenant, cost in (("large", 10), ("gold", 8), ("small", 1))]
+    await asyncio.gather(blocker, *tasks)
+    assert order == ["blocker", "small", "gold", "large"]
+
+
+@pytest.mark.asyncio
+async def test_finish_tags_survive_wakes_while_entries_wait():
+    queue = FairQueue(capacity=1, max_queue=100, weights={})
+    order = []
+    tasks = [asyncio.create_task(_run(queue, "bulk", 1, order)) for _ in range(4)]
+    await asyncio.sleep(0.015)  # the first bulk order is done and the second admitted: bulk's tags must still hold
+    tasks.append(asyncio.create_task(_run(queue, "quiet", 1, order)))
+    await asyncio.sleep(0)
+    assert queue.queued_cost == {"bulk": 2, "quiet": 1}
+    await asyncio.gather(*tasks)
+    assert order.index("quiet") <= 2
+    assert queue.queued_cost == {} and queue._last_finish == {}
+
+
+@pytest.mark.asyncio
+async def test_estimate_counts_only_the_work_ahead():
+    queue = FairQueue(capacity=1, max_queue=100, weights={})
+    queue.unit_time = 1.0
+    await queue.acquire("a", 1, 10)
+    waiters = [asyncio.create_task(queue.acquire("bulk", 1, 10)) for _ in range(5)]
+    await asyncio.sleep(0)
+    assert queue.estimate(float("inf")) == 5
+    # A quiet tenant's first order is tagged like bulk's first, so only that one is ahead of it
+    assert queue.estimate(1.0, cost=1) == 2
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    assert queue.queued() == 0 and queue.queued_cost == {} and queue.depth == {}
+
+
+@pytest.mark.asyncio
+async def test_queue_sheds_when_full_slow_or_over_budget():
+    queue = FairQueue(capacity=1, max_queue=1, weights={})
+    await queue.acquire("a", 1, 1)
+    waiting = asyncio.create_task(queue.acquire("a", 1, 1))
+    await asyncio.sleep(0)
+    with pytest.raises(Rejected) as e:
+        await queue.acquire("b", 1, 1)
+    assert (e.value.status_code, e.value.reason) == (503, QUEUE_FULL)
+
+    queue.release(1, elapsed=2.0)  # hands the slot to `waiting`; forwarding takes ~2s per unit
+    await waiting
+    queue.max_queue = 10
+    with pytest.raises(Rejected) as e:
+        await queue.acquire("b", 1, max_wait=1)
+    assert e.value.reason == QUEUE_TIME and e.value.retry_after == pytest.approx(2.0)
+
+    queue.unit_time = 0.1
+    with pytest.raises(Rejected) as e:
+        await queue.acquire("b", 1, max_wait=0.15)
+    assert e.value.reason == TIMEOUT
+    assert queue.queued() == 0
+    queue.release(1)
+    assert queue.in_use == 0
+
+
+def test_full_buckets_are_dropped(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_TENANT_RATE", 1.0)
+    monkeypatch.setattr(settings, "ADMISSION_TENANT_BURST", 2.0)
+    monkeypatch.setattr(admission, "MIN_BUCKET_SWEEP", 4)
+    now = [0.0]
+    controller = AdmissionController(timer=lambda: now[0])
+    for tenant in "abcd":
+        controller.bucket(tenant).reserve(1, max_wait=0)
+    now[0] = 0.5
+    controller.bucket("a").reserve(1, max_wait=1)  # still short of its burst at the sweep
+    now[0] = 1.5
+    controller.bucket("e")
+    assert sorted(controller._buckets) == ["a", "e"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_wait_refunds_reserved_tokens(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_TENANT_RATE", 1.0)
+    monkeypatch.setattr(settings, "ADMISSION_TENANT_BURST", 2.0)
+    monkeypatch.setattr(settings, "ADMISSION_MAX_WAIT", 5.0)
+    controller = AdmissionController()
+    bucket = controller.bucket("t")
+    bucket.reserve(2, max_wait=0)
+
+    async def order():
+        async with controller.admit("t", 1):
+            pass
+
+    task = asyncio.create_task(order())
+    await asyncio.sleep(0.01)  # reserved ~1 token, sleeping until it refills
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert bucket.tokens == pytest.approx(0, abs=0.05)  # not -1.01: the cancelled order's reservation is given back
+    assert controller.queue.in_use == 0
+
+
+@respx.mock
+def test_orders_over_the_tenant_rate_get_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_ENABLED", True)
+    monkeypatch.setattr(settings, "ADMISSION_TENANT_RATE", 0.1)
+    monkeypatch.setattr(settings, "ADMISSION_TENANT_BURST", 1.5)
+    monkeypatch.setattr(settings, "ADMISSION_MAX_WAIT", 1.0)
+    respx.get(AUTH_URL).respond(200, json={"x-forwarded-user": "u", "tenantIdentifier": "tenant1", "hostName": "h"})
+    recvue = respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS"})
+
+    with TestClient(app) as client:
+        first = client.post("/invoke_order_creation", json=PAYLOAD, headers=HEADERS)
+        second = client.post("/invoke_order_creation", json={**PAYLOAD, "orderNumber": "ORD-2"}, headers=HEADERS)
+        batch = client.post("/invoke_order_creation/batch", json=[PAYLOAD], headers=HEADERS)
+        scraped = client.get("/metrics").text
+
+    assert first.status_code == 200 and recvue.call_count == 1
+    assert second.status_code == 429 and int(second.headers["Retry-After"]) >= 5
+    assert second.json()["error"] == "Tenant rate limit exceeded"
+    assert batch.json()["results"][0]["status_code"] == 429
+    assert 'payloadbridge_admission_shed_total{tenant="tenant1",reason="rate"} 2' in scraped
+    assert "payloadbridge_admission_in_use 0" in scraped
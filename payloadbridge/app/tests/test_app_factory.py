@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from fastapi.testclient import TestClient
+from app.core import config
+from app.main import create_app
+
+PROJECT_DIR = Path(__file__).resolve().parents[2]
+
+
+def test_importing_the_app_reads_no_settings():
+    env = {k: v for k, v in os.environ.items() if k not in ("AUTHORIZE_URL_BASE", "RECVUE_API_BASE_URL", "RECVUE_API_TOKEN")}
+    script = "import app.main; from app.core import config; assert config._settings is None"
+    result = subprocess.run([sys.executable, "-c", script], cwd=PROJECT_DIR, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_create_app_uses_the_given_settings():
+    previous = config.get_settings()
+    custom = previous.model_copy(update={"RESPONSE_GZIP_MIN_BYTES": 0, "METRICS_ENABLED": False})
+    try:
+        with TestClient(create_app(custom)) as client:
+            response = client.get("/metrics", headers={"Accept-Encoding": "gzip"})
+            assert client.get("/healthcheck").json() == {"status": "ok"}
+        assert config.get_settings() is custom
+        assert "content-encoding" not in response.headers
+    finally:
+        config.use_settings(previous)
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+import respx
+from fastapi import HTTPException
+from httpx import Response
+from app.services.auth_utils import get_okta_headers
+from app.utils.cache import TTLCache
+
+AUTH_URL = "https://auth.example.com/api/v2.0/authorize"
+AUTH_OK = {"x-forwarded-user": "user1", "tenantIdentifier": "tenant1", "hostName": "dummyhost.recvue.com"}
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_repeated_token_hits_authorize_once():
+    route = respx.get(AUTH_URL).respond(200, json=AUTH_OK)
+    first = await get_okta_headers("token-a", "dummyhost.recvue.com")
+    second = await get_okta_headers("token-a", "dummyhost.recvue.com")
+    assert first == second
+    assert first["Authorization"] == "Bearer token-a"
+    assert route.call_count == 1
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_shared_cache_never_stores_the_token(tmp_path, monkeypatch):
+    from app.core.config import settings
+    from app.services import auth_utils
+    monkeypatch.setattr(settings, "SHARED_CACHE_PATH", str(tmp_path / "shared.sqlite3"))
+    monkeypatch.setattr(auth_utils, "_auth_cache", None)
+    respx.get(AUTH_URL).respond(200, json=AUTH_OK)
+    try:
+        assert (await get_okta_headers("token-secret", "dummyhost.recvue.com"))["Authorization"] == "Bearer token-secret"
+        assert (await get_okta_headers("token-secret", "dummyhost.recvue.com"))["Authorization"] == "Bearer token-secret"
+    finally:
+        auth_utils._auth_cache.close()
+        monkeypatch.setattr(auth_utils, "_auth_cache", None)
+    assert b"token-secret" not in b"".join(p.read_bytes() for p in tmp_path.iterdir())
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_cache_is_keyed_by_token_and_host():
+    route = respx.get(AUTH_URL).respond(200, json=AUTH_OK)
+    await get_okta_headers("token-a", "dummyhost.recvue.com")
+    await get_okta_headers("token-b", "dummyhost.recvue.com")
+    await get_okta_headers("token-a", "otherhost.recvue.com")
+    assert route.call_count == 3
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_unauthorized_is_negatively_cached():
+    route = respx.get(AUTH_URL).respond(401)
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc:
+            await get_okta_headers("bad-token", "dummyhost.recvue.com")
+        assert exc.value.status_code == 401
+    assert route.call_count == 1
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_server_errors_are_not_cached():
+    route = respx.get(AUTH_URL).mock(side_effect=[Response(503), Response(200, json=AUTH_OK)])
+    with pytest.raises(HTTPException):
+        await get_okta_headers("token-a", "dummyhost.recvue.com")
+    assert (await get_okta_headers("token-a", "dummyhost.recvue.com"))["tenantIdentifier"] == "tenant1"
+    assert route.call_count == 2
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_concurrent_cold_requests_are_coalesced():
+    async def slow_authorize(request):
+        await asyncio.sleep(0.05)
+        return Response(200, json=AUTH_OK)
+
+    route = respx.get(AUTH_URL).mock(side_effect=slow_authorize)
+    results = await asyncio.gather(*[get_okta_headers("token-a", "dummyhost.recvue.com") for _ in range(20)])
+    assert all(r["tenantIdentifier"] == "tenant1" for r in results)
+    assert route.call_count == 1
+
+
+def test_ttl_cache_expiry_and_lru_eviction():
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, timer=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" is now most recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    now[0] = 11
+    assert cache.get("a") is None
+    assert len(cache) == 1
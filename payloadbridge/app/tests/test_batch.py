@@ -0,0 +1,89 @@
+import json
+import copy
+import respx
+from fastapi.testclient import TestClient
+from httpx import Response
+from app.core.config import settings
+from app.main import app
+from app.tests.test_http_client import AUTH_URL, HEADERS, PAYLOAD, RECVUE_URL
+
+client = TestClient(app)
+
+AUTH_OK = {"x-forwarded-user": "user1", "tenantIdentifier": "tenant1", "hostName": "dummyhost.recvue.com"}
+
+
+def _order(number):
+    order = copy.deepcopy(PAYLOAD)
+    order["orderNumber"] = number
+    return order
+
+
+@respx.mock
+def test_batch_array_authorizes_once_and_reports_per_order():
+    auth = respx.get(AUTH_URL).respond(200, json=AUTH_OK)
+    respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS"})
+    orders = [_order(f"ORD-{i}") for i in range(5)]
+    response = client.post("/invoke_order_creation/batch", json=orders, headers=HEADERS)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] == 5 and body["succeeded"] == 5
+    assert [r["index"] for r in body["results"]] == list(range(5))
+    assert len({r["request_id"] for r in body["results"]}) == 5
+    assert auth.call_count == 1
+
+
+@respx.mock
+def test_batch_ndjson_partial_success():
+    respx.get(AUTH_URL).respond(200, json=AUTH_OK)
+
+    def recvue(request):
+        order = json.loads(request.content)
+        if order["orderNumber"] == "ORD-FAIL":
+            return Response(400, json={"statusCode": "FAILURE"})
+        return Response(200, json={"statusCode": "SUCCESS"})
+
+    recvue_route = respx.post(RECVUE_URL).mock(side_effect=recvue)
+    invalid = _order("ORD-BAD")
+    del invalid["orderType"]
+    lines = [json.dumps(_order("ORD-1")), "", json.dumps(invalid), "{not json", json.dumps(_order("ORD-FAIL"))]
+    response = client.post(
+        "/invoke_order_creation/batch",
+        content="\n".join(lines).encode(),
+        headers={**HEADERS, "Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 207
+    results = response.json()["results"]
+    assert [r["status_code"] for r in results] == [200, 422, 400, 400]
+    assert results[0]["recvue"]["statusCode"] == "SUCCESS"
+    assert results[1]["error"] == "Invalid input"
+    assert results[2]["error"] == "Invalid JSON"
+    assert recvue_route.call_count == 2
+
+
+@respx.mock
+def test_oversized_ndjson_batch_gets_one_413_entry(monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_MAX_ORDERS", 2)
+    respx.get(AUTH_URL).respond(200, json=AUTH_OK)
+    recvue = respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS"})
+    lines = [json.dumps(_order(f"ORD-{i}")) for i in range(50)]
+    response = client.post(
+        "/invoke_order_creation/batch",
+        content="\n".join(lines).encode(),
+        headers={**HEADERS, "Content-Type": "application/x-ndjson"},
+    )
+    results = response.json()["results"]
+    assert [(r["index"], r["status_code"]) for r in results] == [(0, 200), (1, 200), (2, 413)]
+    assert results[2]["details"] == "Orders from index 2 on were not processed"
+    assert recvue.call_count == 2
+
+
+@respx.mock
+def test_batch_rejects_non_array_body():
+    respx.get(AUTH_URL).respond(200, json=AUTH_OK)
+    response = client.post("/invoke_order_creation/batch", json=PAYLOAD, headers=HEADERS)
+    assert response.status_code == 422
+
+
+def test_batch_requires_auth_headers():
+    response = client.post("/invoke_order_creation/batch", json=[PAYLOAD])
+    assert response.status_code == 400
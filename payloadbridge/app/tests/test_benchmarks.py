@@ -0,0 +1,31 @@
+import httpx
+import pytest
+from app.models.order_line import OrderPayload
+from app.services.line_rules import get_rule_engine
+from benchmarks.fake_upstream import FakeUpstream, UpstreamProfile
+from benchmarks.loadtest import percentile
+from benchmarks.payloads import build_order
+
+
+def test_generated_orders_are_valid():
+    order = build_order(7, "BENCH-7")
+    assert [line["lineNumber"] for line in order["orderLines"]] == [str(i) for i in range(1, 8)]
+    assert get_rule_engine().check_order(OrderPayload(**order), order.get("hdrIntent")) == []
+
+
+def test_percentile_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 95) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_fake_upstream_profiles():
+    upstream = FakeUpstream(UpstreamProfile(recvue_error_rate=1.0, seed=1))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=upstream), base_url="http://fake") as client:
+        auth = await client.get("/api/v2.0/authorize", headers={"hostName": "acme.recvue.com"})
+        assert auth.json()["tenantIdentifier"] == "acme"
+        resp = await client.post("/acme/api/v2.0/order/orderlines", content=b"{}")
+        assert resp.status_code == 503
+    assert upstream.recvue_calls == 1 and upstream.recvue_bytes == 2
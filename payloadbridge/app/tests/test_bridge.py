@@ -0,0 +1,37 @@
+import httpx
+import pytest
+import respx
+from fastapi.testclient import TestClient
+from httpx import Response
+from app.main import app
+from app.services.bridge import send_order
+from app.tests.test_http_client import AUTH_URL, HEADERS, RECVUE_URL
+
+client = TestClient(app)
+
+OKTA_HEADERS = {"x-forwarded-user": "user1", "tenantIdentifier": "tenant1", "hostName": "dummyhost.recvue.com", "Authorization": "Bearer t"}
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_send_order_reuses_encoded_body_across_retries():
+    route = respx.post(RECVUE_URL).mock(side_effect=[httpx.ConnectError("boom"), Response(200, json={"statusCode": "SUCCESS"})])
+    status_code, content = await send_order({"orderNumber": "1", "note": "é"}, OKTA_HEADERS, "req-1")
+    assert status_code == 200
+    assert content["recvue"]["statusCode"] == "SUCCESS"
+    first, second = (call.request for call in route.calls)
+    assert first.content == second.content
+    assert first.headers["content-type"] == "application/json"
+
+
+@respx.mock
+def test_request_bytes_are_forwarded_verbatim():
+    respx.get(AUTH_URL).respond(200, json=OKTA_HEADERS)
+    recvue = respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS"})
+    raw = (b'{ "orderNumber": "ORD-1", "orderType": "Standard Order", "orderCategory": "New", "businessUnit": "US1",'
+           b' "hdrEffectiveStartDate": "2024-01-01", "hdrEffectiveEndDate": "2024-12-31", "hdrBillToCustAccountNum": "C-1",'
+           b' "orderLines": [{"lineNumber": "1", "lineType": "Recurring", "lineEffectiveStartDate": "2024-01-01",'
+           b' "quantity": 1, "unitPrice": 100}] }')
+    response = client.post("/invoke_order_creation", content=raw, headers={**HEADERS, "Content-Type": "application/json"})
+    assert response.status_code == 200
+    assert recvue.calls.last.request.content == raw
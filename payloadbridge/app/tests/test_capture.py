@@ -0,0 +1,116 @@
+import zlib
+import pytest
+import respx
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.main import app
+from app.services import capture
+from app.services.capture import MAGIC, CaptureWriter, Sanitizer, read_capture, segment_paths
+from app.tests.test_http_client import AUTH_URL, HEADERS, PAYLOAD, RECVUE_URL
+from benchmarks.fake_upstream import UpstreamProfile
+from benchmarks.replay import ReplayUpstream, prepare
+
+
+def capture_request(writer, order_number, token="secret-token"):
+    body = {"orderNumber": order_number, "hdrBillToCustAccountNum": "26360", "orderType": "New",
+            "orderLines": [{"lineType": "Recurring", "lineComments": "call Jane"}, {"lineType": "Usage"}]}
+    headers = {"access_token": token, "hostName": "acme.recvue.com", "content-type": "application/json",
+               "Idempotency-Key": "key-1", "Authorization": "Bearer hunter2"}
+    writer.submit((1000.0, 0.25, "/invoke_order_creation", headers, body, 180, 200, "acme",
+                   [("authorize", "", 0.01, 200), ("recvue", "POST", 0.2, 200)]))
+
+
+def test_capture_segments_round_trip_sanitized(monkeypatch, tmp_path):
+    monkeypatch.setattr(capture, "BLOCK_BYTES", 1)  # a block per record, so the 200-byte segments rotate
+    writer = CaptureWriter(str(tmp_path), segment_bytes=200, max_bytes=0, sanitizer=Sanitizer())
+    writer.start()
+    for i in range(3):
+        capture_request(writer, f"ORD-{i}")
+    capture_request(writer, "ORD-0")
+    writer.close()
+    # A restarted writer (same pid, same second) starts a new segment
+    restarted = CaptureWriter(str(tmp_path), 200, 0, writer.sanitizer)
+    restarted.start()
+    capture_request(restarted, "ORD-4")
+    restarted.close()
+
+    assert len(segment_paths([tmp_path])) == 5
+    records = list(read_capture([tmp_path]))
+    assert len(records) == 5
+    first = records[0]
+    assert first["tenant"] == "acme" and first["status"] == 200 and first["lines"] == 2 and first["bytes"] == 180
+    assert first["line_types"] == {"Recurring": 1, "Usage": 1}
+    assert first["calls"][1] == {"call": "recvue", "method": "POST", "seconds": 0.2, "status": 200}
+    assert first["headers"]["hostName"] == "acme.recvue.com" and "Authorization" not in first["headers"]
+    assert first["headers"]["Idempotency-Key"] != "key-1"
+    # Sensitive values become same-length pseudonyms, stable for the same input; the rest is kept
+    body = first["body"]
+    assert body["orderType"] == "New"
+    assert len(body["orderNumber"]) == 5 and body["orderNumber"] != "ORD-0"
+    assert body["orderNumber"] == records[3]["body"]["orderNumber"] != records[1]["body"]["orderNumber"]
+    assert len(body["hdrBillToCustAccountNum"]) == 5 and body["orderLines"][0]["lineComments"] != "call Jane"
+    assert first["caller"] and first["caller"] == records[1]["caller"]
+
+    raw = b"".join(zlib.decompress(p.read_bytes()[len(MAGIC) + 8:]) for p in segment_paths([tmp_path]))
+    assert b"ORD-4" not in raw
+    assert b"secret-token" not in raw and b"hunter2" not in raw and b"Jane" not in raw
+
+
+def test_mapped_source_bodies_are_sanitized():
+    body = {"order_id": "ORD-9", "customer_id": "ACME Corp", "notes": "call Bob 555-1234",
+            "order_lines": [{"product_id": "SKU-1", "quantity": 2}]}
+    sanitized = Sanitizer().order(body)
+    assert sanitized["order_lines"] == body["order_lines"]
+    for field in ("order_id", "customer_id", "notes"):
+        assert len(sanitized[field]) == len(body[field]) and sanitized[field] != body[field]
+    assert Sanitizer(mappings={}).order(body)["customer_id"] == "ACME Corp"
+
+
+def test_reader_stops_at_a_torn_block(tmp_path):
+    writer = CaptureWriter(str(tmp_path), 1 << 20, 0, Sanitizer())
+    writer.start()
+    capture_request(writer, "A")
+    writer.close()
+    path = segment_paths([tmp_path])[0]
+    intact = path.read_bytes()
+    path.write_bytes(intact + intact[len(MAGIC):-3])  # a second block cut short, as after a crash
+    assert [r["body"]["orderLines"][1] for r in read_capture([path])] == [{"lineType": "Usage"}]
+
+
+def test_capture_stops_at_max_bytes(tmp_path):
+    writer = CaptureWriter(str(tmp_path), 1 << 20, 50, Sanitizer())
+    writer.start()
+    capture_request(writer, "A")
+    writer.close()
+    assert writer.stopped and list(read_capture([tmp_path])) == []
+
+
+@respx.mock
+def test_invoke_order_creation_is_captured(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "CAPTURE_ENABLED", True)
+    monkeypatch.setattr(settings, "CAPTURE_DIR", str(tmp_path))
+    respx.get(AUTH_URL).respond(200, json={"x-forwarded-user": "u", "tenantIdentifier": "tenant1", "hostName": "h"})
+    respx.post(RECVUE_URL).respond(201, json={"statusCode": "SUCCESS", "id": "1"})
+    with TestClient(app) as client:
+        assert client.post("/invoke_order_creation", json=PAYLOAD, headers=HEADERS).status_code == 201
+        assert client.post("/invoke_order_creation", json={"orderLines": "bad"}, headers=HEADERS).status_code == 422
+        assert client.post("/invoke_order_creation", content=b"{not json", headers=HEADERS).status_code == 500
+    # Shutting down flushed the writer
+    ok, invalid, unparsable = read_capture([tmp_path])
+    assert ok["status"] == 201 and ok["tenant"] == "tenant1" and ok["path"] == "/invoke_order_creation"
+    assert [(c["call"], c["method"], c["status"]) for c in ok["calls"]] == [("authorize", "", 200), ("recvue", "POST", 201)]
+    assert ok["lines"] == len(PAYLOAD["orderLines"]) and ok["caller"] and "access_token" not in ok["headers"]
+    assert invalid["status"] == 422 and invalid["calls"] == []
+    assert unparsable["body"] is None and unparsable["status"] == 500
+
+    # The replay stand-in answers the same order with the recorded RecVue outcome
+    standin = ReplayUpstream([ok], UpstreamProfile(seed=1))
+    body, headers = prepare(ok)
+    assert headers["access_token"] == f"replay-{ok['caller']}" and headers["hostName"] == HEADERS["hostName"]
+    assert standin.recvue_outcome({}, "tenant1", body) == (ok["calls"][1]["seconds"], 201)
+    assert standin.matched == 1
+
+
+def test_capture_is_off_by_default():
+    with TestClient(app):
+        assert capture.begin() is None
@@ -0,0 +1,93 @@
+import json
+import pytest
+import respx
+from fastapi.testclient import TestClient
+from httpx import Response
+from app.core import deadline
+from app.core.config import settings
+from app.main import app
+from app.services.chunking import SKIPPED, send_order_chunked
+from app.tests.test_bridge import OKTA_HEADERS
+from app.tests.test_http_client import AUTH_URL, HEADERS, PAYLOAD, RECVUE_URL
+
+
+def _order(line_count):
+    line = PAYLOAD["orderLines"][0]
+    return {**PAYLOAD, "orderLines": [{**line, "lineNumber": str(i + 1)} for i in range(line_count)]}
+
+
+def _line_numbers(request):
+    return [line["lineNumber"] for line in json.loads(request.content)["orderLines"]]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_creates_with_post_then_puts_remaining_chunks_and_retries_only_failures():
+    respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS", "id": "42"})
+    flaky = {"failures": 1}
+
+    def put(request):
+        if _line_numbers(request) == ["3", "4"] and flaky["failures"]:
+            flaky["failures"] -= 1
+            return Response(503, json={"statusCode": "FAILURE"})
+        return Response(200, json={"statusCode": "SUCCESS", "id": "42"})
+
+    puts = respx.put(RECVUE_URL).mock(side_effect=put)
+    status_code, content = await send_order_chunked(_order(5), OKTA_HEADERS, "req-1", chunk_lines=2, concurrency=2, retries=2)
+
+    assert status_code == 200
+    assert content["recvue"]["id"] == "42" and content["chunkCount"] == 3 and content["failedChunks"] == 0
+    assert sorted(_line_numbers(c.request) for c in puts.calls) == [["3", "4"], ["3", "4"], ["5"]]
+    assert [c["attempts"] for c in content["chunks"]] == [1, 2, 1]
+    assert [(l["lineNumber"], l["chunk"]) for l in content["lines"]] == [("1", 0), ("2", 0), ("3", 1), ("4", 1), ("5", 2)]
+    header = json.loads(puts.calls.last.request.content)
+    assert header["orderNumber"] == PAYLOAD["orderNumber"]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_failed_chunks_make_a_partial_response():
+    respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS", "id": "42"})
+    respx.put(RECVUE_URL).respond(400, json={"statusCode": "FAILURE", "message": "Validation Failed"})
+    status_code, content = await send_order_chunked(_order(3), OKTA_HEADERS, "req-1", chunk_lines=2, concurrency=2, retries=2)
+    assert status_code == 207
+    assert content["failedChunks"] == 1
+    assert content["chunks"][1]["attempts"] == 1  # 4xx is not retried
+    assert content["lines"][2] == {"lineNumber": "3", "chunk": 1, "status_code": 400}
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_failed_create_stops_before_any_put():
+    respx.post(RECVUE_URL).respond(400, json={"statusCode": "FAILURE"})
+    puts = respx.put(RECVUE_URL).respond(200, json={})
+    status_code, content = await send_order_chunked(_order(5), OKTA_HEADERS, "req-1", chunk_lines=2, concurrency=2, retries=2)
+    assert status_code == 400 and content["request_id"] == "req-1"
+    assert puts.call_count == 0
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_chunks_without_deadline_left_are_reported_as_skipped(monkeypatch):
+    created = []
+    respx.post(RECVUE_URL).mock(side_effect=lambda request: created.append(1) or Response(200, json={"id": "42"}))
+    puts = respx.put(RECVUE_URL).respond(200, json={})
+    monkeypatch.setattr(deadline, "remaining", lambda: 0.0 if created else None)  # the POST used up the deadline
+    status_code, content = await send_order_chunked(_order(3), OKTA_HEADERS, "req-1", chunk_lines=2, concurrency=2, retries=2)
+    assert status_code == 207 and puts.call_count == 0
+    assert content["chunks"][1]["status_code"] == SKIPPED and content["chunks"][1]["attempts"] == 0
+    assert content["lines"][2] == {"lineNumber": "3", "chunk": 1, "status_code": SKIPPED}
+
+
+@respx.mock
+def test_endpoint_chunks_large_orders(monkeypatch):
+    monkeypatch.setattr(settings, "ORDER_CHUNK_LINES", 2)
+    respx.get(AUTH_URL).respond(200, json=OKTA_HEADERS)
+    post = respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS", "id": "1"})
+    put = respx.put(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS", "id": "1"})
+    with TestClient(app) as client:
+        small = client.post("/invoke_order_creation", json={**_order(2), "orderNumber": "SMALL"}, headers=HEADERS)
+        large = client.post("/invoke_order_creation", json=_order(5), headers=HEADERS)
+    assert small.status_code == 200 and "chunked" not in small.json()
+    assert large.status_code == 200 and large.json()["chunkCount"] == 3
+    assert post.call_count == 2 and put.call_count == 2
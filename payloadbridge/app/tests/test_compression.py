@@ -0,0 +1,122 @@
+import gzip
+import json
+import zlib
+import pytest
+import respx
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from httpx import Response
+from app.core.config import settings
+from app.main import app
+from app.services import bridge
+from app.services.bridge import send_order
+from app.utils.compression import DecompressionMiddleware, brotli
+from app.tests.test_bridge import OKTA_HEADERS
+from app.tests.test_http_client import AUTH_URL, HEADERS, PAYLOAD, RECVUE_URL
+from app.tests.test_metrics import AUTH_RESPONSE
+
+echo = FastAPI()
+
+
+@echo.post("/echo")
+async def echo_body(request: Request):
+    chunks = [chunk async for chunk in request.stream()]
+    return {"size": sum(map(len, chunks)), "chunks": len(chunks), "content_length": request.headers.get("content-length")}
+
+
+echo.add_middleware(DecompressionMiddleware, max_size=1_000_000)
+echo_client = TestClient(echo)
+
+
+@pytest.mark.parametrize("encoding,compress", [
+    ("gzip", gzip.compress),
+    ("deflate", zlib.compress),
+    pytest.param("br", brotli and brotli.compress, marks=pytest.mark.skipif(brotli is None, reason="brotli not installed")),
+])
+def test_request_bodies_are_decompressed(encoding, compress):
+    response = echo_client.post("/echo", content=compress(b"x" * 5000), headers={"Content-Encoding": encoding})
+    assert response.status_code == 200
+    assert response.json()["size"] == 5000 and response.json()["content_length"] is None
+
+
+def test_body_is_decompressed_chunk_by_chunk():
+    def chunks():
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+        for _ in range(4):
+            yield compressor.compress(b"y" * 200_000) + compressor.flush(zlib.Z_FULL_FLUSH)
+        yield compressor.flush()
+
+    response = echo_client.post("/echo", content=chunks(), headers={"Content-Encoding": "gzip"})
+    assert response.json()["size"] == 800_000 and response.json()["chunks"] > 1
+
+
+def test_decompression_bomb_is_rejected_with_413():
+    bomb = gzip.compress(b"\0" * 50_000_000)
+    response = echo_client.post("/echo", content=bomb, headers={"Content-Encoding": "gzip"})
+    assert response.status_code == 413
+    assert "exceeds 1000000 bytes" in response.json()["error"]
+
+
+def test_corrupt_truncated_and_unknown_encodings_are_rejected():
+    assert echo_client.post("/echo", content=b"not gzip", headers={"Content-Encoding": "gzip"}).status_code == 400
+    truncated = gzip.compress(b"z" * 1000)[:-8]
+    assert echo_client.post("/echo", content=truncated, headers={"Content-Encoding": "gzip"}).status_code == 400
+    assert echo_client.post("/echo", content=b"{}", headers={"Content-Encoding": "zstd"}).status_code == 415
+
+
+@respx.mock
+def test_gzip_order_is_validated_and_forwarded_uncompressed():
+    respx.get(AUTH_URL).respond(200, json=AUTH_RESPONSE)
+    recvue = respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS"})
+    raw = json.dumps(PAYLOAD).encode()
+    with TestClient(app) as client:
+        response = client.post("/invoke_order_creation", content=gzip.compress(raw),
+                               headers={**HEADERS, "Content-Type": "application/json", "Content-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert recvue.calls.last.request.content == raw
+    assert "content-encoding" not in recvue.calls.last.request.headers
+
+
+def test_large_responses_are_gzipped():
+    with TestClient(app) as client:
+        response = client.get("/metrics", headers={"Accept-Encoding": "gzip"})
+        small = client.get("/healthcheck", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in small.headers
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_recvue_bodies_are_gzipped_for_enabled_tenants(monkeypatch):
+    monkeypatch.setattr(settings, "RECVUE_GZIP_TENANTS", "tenant1, tenant2")
+    monkeypatch.setattr(settings, "RECVUE_GZIP_MIN_BYTES", 100)
+    monkeypatch.setattr(bridge, "_gzip_rejected", set())
+    route = respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS"})
+    raw = json.dumps(PAYLOAD).encode()
+
+    await send_order(raw, OKTA_HEADERS, "req-1")
+    sent = route.calls.last.request
+    assert sent.headers["content-encoding"] == "gzip" and gzip.decompress(sent.content) == raw
+
+    await send_order(b'{"orderNumber": "1"}', OKTA_HEADERS, "req-2")  # below RECVUE_GZIP_MIN_BYTES
+    assert "content-encoding" not in route.calls.last.request.headers
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_tenant_rejecting_gzip_falls_back_to_plain_bodies(monkeypatch):
+    monkeypatch.setattr(settings, "RECVUE_GZIP_TENANTS", "*")
+    monkeypatch.setattr(settings, "RECVUE_GZIP_MIN_BYTES", 0)
+    monkeypatch.setattr(bridge, "_gzip_rejected", set())
+    route = respx.post(RECVUE_URL).mock(side_effect=[Response(415), Response(200, json={"statusCode": "SUCCESS"}),
+                                                     Response(200, json={"statusCode": "SUCCESS"})])
+    raw = json.dumps(PAYLOAD).encode()
+
+    status_code, _ = await send_order(raw, OKTA_HEADERS, "req-1")
+    assert status_code == 200
+    first, second = (call.request for call in route.calls)
+    assert first.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in second.headers and second.content == raw
+
+    await send_order(raw, OKTA_HEADERS, "req-2")
+    assert "content-encoding" not in route.calls.last.request.headers
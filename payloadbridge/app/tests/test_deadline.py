@@ -0,0 +1,140 @@
+import asyncio
+import time
+import pytest
+import respx
+from httpx import Response
+from fastapi.testclient import TestClient
+from app.core import deadline, metrics
+from app.core.config import settings
+from app.main import app
+from app.services.bridge import send_order
+from app.services.resilience import LatencyTracker, get_tenant_guard, hedged
+from app.tests.test_bridge import OKTA_HEADERS
+from app.tests.test_http_client import AUTH_URL, HEADERS, PAYLOAD, RECVUE_URL
+
+
+def test_deadline_header_overrides_default_and_is_capped(monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_DEADLINE_MAX", 120.0)
+    assert deadline.from_headers({}, 60.0) == 60.0
+    assert deadline.from_headers({}, 0.0) is None
+    assert deadline.from_headers({"x-request-timeout": "2.5"}, 60.0) == 2.5
+    assert deadline.from_headers({"x-request-timeout": "9999"}) == 120.0
+    assert deadline.from_headers({"x-request-timeout": "soon"}, 60.0) == 60.0
+
+
+@pytest.mark.asyncio
+async def test_budget_shrinks_with_remaining_time():
+    deadline.start(None)
+    assert deadline.remaining() is None and deadline.budget(30.0) == 30.0
+    deadline.start(1.0)
+    assert 0.9 < deadline.budget(30.0) <= 1.0
+    assert deadline.budget(30.0, share=0.25) <= 0.25
+    assert deadline.budget(0.1) == 0.1
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_attempts_are_bounded_by_the_request_deadline():
+    calls = []
+
+    async def hang(request):
+        calls.append(request)
+        await asyncio.sleep(5)
+        return Response(200, json={})
+
+    respx.post(RECVUE_URL).mock(side_effect=hang)
+    deadline.start(0.5)
+    started = time.monotonic()
+    status_code, content = await send_order({"orderNumber": "1"}, OKTA_HEADERS, "req-1")
+    assert time.monotonic() - started < 1.0
+    assert status_code == 504 and content["error"] == "Deadline exceeded"
+    assert len(calls) == 1  # no time was left to retry
+
+
+@respx.mock
+def test_slow_authorize_only_gets_its_share_of_the_deadline():
+    async def slow_auth(request):
+        await asyncio.sleep(5)
+        return Response(200, json={})
+
+    respx.get(AUTH_URL).mock(side_effect=slow_auth)
+    with TestClient(app) as client:
+        started = time.monotonic()
+        response = client.post("/invoke_order_creation", json=PAYLOAD, headers={**HEADERS, "X-Request-Timeout": "2"})
+    assert time.monotonic() - started < 1.5
+    assert response.status_code == 504 and response.json()["details"] == "Auth service timed out"
+
+
+def test_latency_tracker_waits_for_samples_then_reports_quantile():
+    tracker = LatencyTracker(quantile=0.95, min_samples=10, min_delay=0.05)
+    for i in range(9):
+        tracker.observe(i / 100)
+    assert tracker.hedge_delay() is None
+    for i in range(9, 100):
+        tracker.observe(i / 100)
+    assert tracker.hedge_delay() == 0.95
+    assert LatencyTracker(0.5, 1, 0.05).hedge_delay() is None
+
+
+@pytest.mark.asyncio
+async def test_hedge_fires_after_delay_and_cancels_the_loser():
+    delays = [1.0, 0.0]
+    cancelled = []
+
+    async def call():
+        delay = delays.pop(0)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(delay)
+            raise
+        return delay
+
+    assert await hedged(call, 0.05) == (0.0, "won")
+    await asyncio.sleep(0)
+    assert cancelled == [1.0]
+
+    delays[:] = [0.0]
+    assert await hedged(call, 0.05) == (0.0, "")
+
+
+@pytest.mark.asyncio
+async def test_hedge_falls_back_to_the_attempt_that_succeeds():
+    results = [ValueError("boom"), "ok"]
+
+    async def call():
+        outcome = results.pop(0)
+        await asyncio.sleep(0.1 if outcome == "ok" else 0.2)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert await hedged(call, 0.05) == ("ok", "won")
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_chunk_puts_are_hedged_but_posts_are_not(monkeypatch):
+    monkeypatch.setattr(settings, "HEDGE_ENABLED", True)
+    calls = []
+
+    async def recvue(request):
+        calls.append(request.method)
+        if len(calls) in (1, 3):  # the first PUT and the POST are slow
+            await asyncio.sleep(1)
+        return Response(200, json={"statusCode": "SUCCESS"})
+
+    respx.put(RECVUE_URL).mock(side_effect=recvue)
+    respx.post(RECVUE_URL).mock(side_effect=recvue)
+    guard = get_tenant_guard("tenant1")
+    for method in ("PUT", "POST"):
+        for _ in range(settings.HEDGE_MIN_SAMPLES):
+            guard.latency(method).observe(0.01)
+
+    status_code, _ = await send_order({"orderNumber": "1"}, OKTA_HEADERS, "req-1", method="PUT")
+    assert status_code == 200 and calls == ["PUT", "PUT"]
+    assert 'outcome="won"' in metrics.REGISTRY.render()
+
+    started = time.monotonic()
+    await send_order({"orderNumber": "1"}, OKTA_HEADERS, "req-2")
+    assert calls == ["PUT", "PUT", "POST"] and time.monotonic() - started >= 1
@@ -0,0 +1,96 @@
+import asyncio
+import re
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.core import profiling
+from app.core.config import settings
+from app.core.profiling import LoopMonitor, collapsed, sample_stacks
+from app.main import app
+
+TOKEN = {"X-Debug-Token": "s3cret"}
+
+
+@pytest.fixture
+def debug_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "DEBUG_ENDPOINTS_ENABLED", True)
+    monkeypatch.setattr(settings, "DEBUG_TOKEN", "s3cret")
+    monkeypatch.setattr(settings, "LOOP_STALL_THRESHOLD", 0.05)
+
+
+def test_debug_endpoints_are_hidden_and_token_protected(monkeypatch):
+    with TestClient(app) as client:
+        assert client.get("/debug/loop", headers=TOKEN).status_code == 404
+        monkeypatch.setattr(settings, "DEBUG_ENDPOINTS_ENABLED", True)
+        assert client.get("/debug/loop", headers=TOKEN).status_code == 404  # no DEBUG_TOKEN configured
+        monkeypatch.setattr(settings, "DEBUG_TOKEN", "s3cret")
+        assert client.get("/debug/profile?seconds=0.1").status_code == 401
+        assert client.get("/debug/profile?seconds=0.1", headers={"X-Debug-Token": "guess"}).status_code == 401
+        assert client.get("/debug/profile?seconds=3600", headers=TOKEN).status_code == 422
+
+
+def busy_work(seconds):
+    stop_at = time.monotonic() + seconds
+    while time.monotonic() < stop_at:
+        sum(range(1000))
+
+
+def test_sampler_returns_collapsed_stacks():
+    import threading
+    worker = threading.Thread(target=busy_work, args=(0.3,), name="busy")
+    worker.start()
+    stacks = sample_stacks(0.2, 0.005, [worker.ident])
+    worker.join()
+    lines = collapsed(stacks).splitlines()
+    assert lines and all(re.fullmatch(r"busy;.+ \d+", line) for line in lines)
+    assert any("busy_work (app/tests/test_debug.py:" in line for line in lines)
+
+
+def test_profile_endpoint(debug_enabled):
+    with TestClient(app) as client:
+        response = client.get("/debug/profile?seconds=0.2&interval=0.01&threads=all&idle=true", headers=TOKEN)
+    assert response.status_code == 200 and int(response.headers["X-Profile-Samples"]) > 0
+    assert re.match(r"\S.*;.* \d+$", response.text.splitlines()[0])
+
+
+@pytest.mark.asyncio
+async def test_loop_monitor_captures_the_blocking_callback():
+    monitor = LoopMonitor(threshold=0.05, interval=0.01)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        busy_work(0.3)  # blocks the event loop
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+    stall = monitor.snapshot()["stalls"][0]
+    assert any(frame.startswith("busy_work (") for frame in stall["stack"])
+    assert stall["blocked_seconds"] >= 0.2 and monitor.max_lag >= 0.2
+
+
+def test_memory_diff_after_stop_is_none():
+    tracker = profiling.MemoryTracker()
+    tracker.start(1)
+    stopper = threading.Thread(target=tracker.stop)
+    with tracker._lock:  # a diff in progress: stop() waits for it
+        stopper.start()
+        stopper.join(0.05)
+        assert stopper.is_alive() and tracker.active
+    stopper.join()
+    assert tracker.diff(5) is None
+
+
+def test_loop_and_memory_endpoints(debug_enabled):
+    with TestClient(app) as client:
+        assert client.get("/debug/loop", headers=TOKEN).json()["threshold"] == 0.05
+        assert client.get("/debug/memory", headers=TOKEN).status_code == 409
+        assert client.post("/debug/memory?frames=5", headers=TOKEN).status_code == 200
+        retained = [bytearray(1000) for _ in range(2000)]
+        diff = client.get("/debug/memory?top=5", headers=TOKEN).json()
+        assert len(client.get("/debug/memory?top=-3", headers=TOKEN).json()["top"]) == 1
+        assert client.delete("/debug/memory", headers=TOKEN).status_code == 200
+        assert client.get("/debug/memory", headers=TOKEN).status_code == 409
+    assert diff["growth_bytes"] >= 2_000_000 and len(diff["top"]) == 5
+    assert any("app/tests/test_debug.py" in frame for stat in diff["top"] for frame in stat["traceback"])
+    assert profiling.loop_monitor() is None and len(retained) == 2000
@@ -0,0 +1,57 @@
+import pytest
+import respx
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import http_client
+
+AUTH_URL = "https://auth.example.com/api/v2.0/authorize"
+RECVUE_URL = "https://tenant1.recvue.com/api/v2.0/order/orderlines"
+
+HEADERS = {"access_token": "dummy_token", "hostName": "dummyhost.recvue.com"}
+
+PAYLOAD = {
+    "orderNumber": "ORD-2024-001",
+    "orderType": "Standard Order",
+    "orderCategory": "New",
+    "businessUnit": "US1 Business Unit",
+    "hdrEffectiveStartDate": "2024-01-01",
+    "hdrEffectiveEndDate": "2024-12-31",
+    "hdrBillToCustAccountNum": "CUST-12345",
+    "hdrEvergreenFlag": "N",
+    "orderLines": [
+        {
+            "lineNumber": "1",
+            "lineType": "Recurring",
+            "lineEffectiveStartDate": "2024-01-01",
+            "lineEffectiveEndDate": "2024-12-31",
+            "quantity": 1,
+            "unitPrice": 100
+        }
+    ]
+}
+
+
+def test_get_client_is_shared():
+    assert http_client.get_client() is http_client.get_client()
+
+
+@pytest.mark.asyncio
+async def test_shutdown_closes_client():
+    client = http_client.get_client()
+    await http_client.shutdown()
+    assert client.is_closed
+    assert http_client.get_client() is not client
+
+
+@respx.mock
+def test_lifespan_reuses_one_client_across_orders():
+    respx.get(AUTH_URL).respond(200, json={"x-forwarded-user": "user1", "tenantIdentifier": "tenant1", "hostName": "dummyhost.recvue.com"})
+    recvue = respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS", "id": "1"})
+    with TestClient(app) as client:
+        shared = http_client.get_client()
+        for i in range(3):
+            response = client.post("/invoke_order_creation", json={**PAYLOAD, "orderNumber": f"ORD-{i}"}, headers=HEADERS)
+            assert response.status_code == 200
+        assert http_client.get_client() is shared
+    assert recvue.call_count == 3
+    assert shared.is_closed
@@ -0,0 +1,80 @@
+import asyncio
+import copy
+import json
+import httpx
+import pytest
+import respx
+from fastapi.testclient import TestClient
+from httpx import Response
+from app.main import app
+from app.tests.test_http_client import AUTH_URL, HEADERS, PAYLOAD, RECVUE_URL
+
+client = TestClient(app)
+
+AUTH_OK = {"x-forwarded-user": "user1", "tenantIdentifier": "tenant1", "hostName": "dummyhost.recvue.com"}
+
+
+@respx.mock
+def test_identical_payload_is_forwarded_once():
+    respx.get(AUTH_URL).respond(200, json=AUTH_OK)
+    recvue = respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS", "id": "1"})
+    first = client.post("/invoke_order_creation", json=PAYLOAD, headers=HEADERS)
+    # Same order with different key order and whitespace
+    reordered = json.dumps(dict(reversed(list(PAYLOAD.items()))), indent=2)
+    second = client.post("/invoke_order_creation", content=reordered, headers={**HEADERS, "Content-Type": "application/json"})
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert recvue.call_count == 1
+
+
+@respx.mock
+def test_duplicates_are_scoped_to_the_caller_token():
+    respx.get(AUTH_URL).respond(200, json=AUTH_OK)
+    recvue = respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS"})
+    client.post("/invoke_order_creation", json=PAYLOAD, headers=HEADERS)
+    client.post("/invoke_order_creation", json=PAYLOAD, headers={**HEADERS, "access_token": "other-token"})
+    assert recvue.call_count == 2
+
+
+@respx.mock
+def test_server_errors_are_not_replayed():
+    respx.get(AUTH_URL).respond(200, json=AUTH_OK)
+    recvue = respx.post(RECVUE_URL).mock(side_effect=[httpx.ConnectError("down")] * 3 + [Response(200, json={"statusCode": "SUCCESS"})])
+    assert client.post("/invoke_order_creation", json=PAYLOAD, headers=HEADERS).status_code == 502
+    assert client.post("/invoke_order_creation", json=PAYLOAD, headers=HEADERS).status_code == 200
+    assert recvue.call_count == 4
+
+
+@respx.mock
+def test_idempotency_key_rejects_a_different_payload():
+    respx.get(AUTH_URL).respond(200, json=AUTH_OK)
+    recvue = respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS"})
+    headers = {**HEADERS, "Idempotency-Key": "abc-123"}
+    assert client.post("/invoke_order_creation", json=PAYLOAD, headers=headers).status_code == 200
+    changed = copy.deepcopy(PAYLOAD)
+    changed["orderNumber"] = "ORD-OTHER"
+    response = client.post("/invoke_order_creation", json=changed, headers=headers)
+    assert response.status_code == 422
+    assert "Idempotency-Key" in response.json()["error"]
+    assert recvue.call_count == 1
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_concurrent_duplicates_wait_for_the_first_result():
+    respx.get(AUTH_URL).respond(200, json=AUTH_OK)
+
+    async def slow_recvue(request):
+        await asyncio.sleep(0.05)
+        return Response(200, json={"statusCode": "SUCCESS"})
+
+    recvue = respx.post(RECVUE_URL).mock(side_effect=slow_recvue)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bridge") as ac:
+        responses = await asyncio.gather(*[ac.post("/invoke_order_creation", json=PAYLOAD, headers=HEADERS) for _ in range(5)])
+    assert [r.status_code for r in responses] == [200] * 5
+    assert len({r.json()["request_id"] for r in responses}) == 1
+    assert sum(1 for r in responses if r.headers.get("Idempotent-Replayed")) == 4
+    assert recvue.call_count == 1
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import time
+import pytest
+import respx
+from cryptography.fernet import Fernet
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.main import app
+from app.services import jobs
+from app.services.jobs import FAILED, JobQueue, JobStore, QUEUED, RUNNING, SUCCEEDED
+from app.tests.test_http_client import AUTH_URL, HEADERS, PAYLOAD, RECVUE_URL
+
+AUTH_OK = {"x-forwarded-user": "user1", "tenantIdentifier": "tenant1", "hostName": "dummyhost.recvue.com"}
+
+
+def _wait_for(client, job_id, headers, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}", headers=headers).json()
+        if job["status"] not in (QUEUED, RUNNING):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+@respx.mock
+def test_async_submission_returns_202_and_completes_in_background():
+    respx.get(AUTH_URL).respond(200, json=AUTH_OK)
+    recvue = respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS", "id": "42"})
+    with TestClient(app) as client:
+        response = client.post("/invoke_order_creation/async", json=PAYLOAD, headers=HEADERS)
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        assert response.headers["Location"] == f"/jobs/{job_id}"
+        job = _wait_for(client, job_id, HEADERS)
+    assert job["status"] == SUCCEEDED
+    assert job["tenant"] == "tenant1"
+    assert job["result"] == {"status_code": 200, "body": {"recvue": {"statusCode": "SUCCESS", "id": "42"}, "request_id": job_id, "tenant": "tenant1"}}
+    assert recvue.call_count == 1
+
+
+def test_async_submission_validates_before_queueing():
+    with TestClient(app) as client:
+        response = client.post("/invoke_order_creation/async", json={**PAYLOAD, "orderLines": []}, headers=HEADERS)
+    assert response.status_code == 422
+
+
+@respx.mock
+def test_jobs_are_only_visible_to_the_submitting_caller():
+    respx.get(AUTH_URL).respond(200, json=AUTH_OK)
+    respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS"})
+    with TestClient(app) as client:
+        job_id = client.post("/invoke_order_creation/async", json=PAYLOAD, headers=HEADERS).json()["job_id"]
+        assert client.get(f"/jobs/{job_id}", headers={**HEADERS, "access_token": "someone-else"}).status_code == 404
+        assert client.get("/jobs/unknown", headers=HEADERS).status_code == 404
+
+
+def test_jobs_are_off_unless_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "JOBS_ENABLED", False)
+    with TestClient(app) as client:
+        assert jobs._queue is None
+        assert client.post("/invoke_order_creation/async", json=PAYLOAD, headers=HEADERS).status_code == 404
+        assert client.get("/jobs/unknown", headers=HEADERS).status_code == 404
+    assert jobs._queue is None
+
+
+def test_default_db_path_is_private_and_independent_of_the_working_directory(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "JOBS_DB_PATH", None)
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+    monkeypatch.chdir(tmp_path)
+    path = jobs.db_path()
+    assert path == str(tmp_path / "state" / "payloadbridge" / "jobs.sqlite3")
+    assert os.stat(os.path.dirname(path)).st_mode & 0o777 == 0o700
+
+
+def test_store_recovers_running_jobs_and_drops_secrets_when_done(tmp_path):
+    path, key = str(tmp_path / "jobs.sqlite3"), Fernet.generate_key()
+    store = JobStore(path, key)
+    job_id = store.enqueue(b'{"orderNumber": "1"}', {"tenantIdentifier": "t1", "Authorization": "Bearer secret"}, "caller")
+    headers, token = store._conn.execute("SELECT headers, token FROM jobs").fetchone()
+    assert "secret" not in headers and b"secret" not in token
+    claimed = store.claim()
+    assert claimed[0] == job_id and claimed[2]["Authorization"] == "Bearer secret"
+    assert store.claim() is None
+    store.close()
+
+    store = JobStore(path, key)
+    assert store.requeue_running() == 1
+    assert store.claim()[0] == job_id
+    store.complete(job_id, 200, b'{"ok": true}')
+    assert store.get(job_id, "caller")["result"] == {"status_code": 200, "body": {"ok": True}}
+    assert store._conn.execute("SELECT payload, headers, token FROM jobs").fetchone() == (None, None, None)
+    assert store.purge_finished(older_than=-1) == 1
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_job_queued_under_another_key_fails_for_resubmission(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    before_restart = JobStore(path, Fernet.generate_key())
+    job_id = before_restart.enqueue(b"{}", {"tenantIdentifier": "t1", "Authorization": "Bearer secret"}, "caller")
+    before_restart.close()
+    queue = JobQueue(JobStore(path, Fernet.generate_key()), 1, 0.01)
+    await queue.start()
+    try:
+        for _ in range(100):
+            job = await queue.get(job_id, "caller")
+            if job["status"] == FAILED:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await queue.stop()
+        queue.store.close()
+    assert job["result"]["status_code"] == 401
@@ -0,0 +1,92 @@
+import copy
+import json
+import pytest
+import respx
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models.order_line import OrderLine, OrderPayload
+from app.services.line_rules import LineTypeRuleEngine, get_rule_engine, recvue_failure
+from app.tests.test_http_client import AUTH_URL, HEADERS, PAYLOAD
+
+client = TestClient(app)
+
+TABLE = {
+    "T_COMMIT_USAGE": {"quantity": ["ZERO"], "itemName": "NOTNULL"},
+    "One Time": {"quantity": ["NOTNULL", "POSITIVE"], "uom": ["Each,Hour"], "lineBillingFrequency": ["One Time"]},
+    "Flexible": {"quantity": "ANY", "uom": ["ANY"]},
+}
+
+
+def _line(**fields):
+    base = {"lineNumber": "1", "lineEffectiveStartDate": "2024-01-01", "lineEffectiveEndDate": "2024-12-31"}
+    return OrderLine(**{**base, **fields})
+
+
+def test_conditions_are_checked_per_line_type():
+    engine = LineTypeRuleEngine(TABLE)
+    assert engine.check_line(_line(lineType="T_COMMIT_USAGE", itemName="Fuel", quantity=0)) == []
+    violations = engine.check_line(_line(lineType="T_COMMIT_USAGE", quantity=3))
+    assert violations == [
+        ("quantity", "Line Type T_COMMIT_USAGE should have Quantity as zero"),
+        ("itemName", "Line Type T_COMMIT_USAGE can't have Item Name as null"),
+    ]
+    assert engine.check_line(_line(lineType="One Time", quantity=1, uom="Each", lineBillingFrequency="One Time")) == []
+    assert [f for f, _ in engine.check_line(_line(lineType="One Time", uom="Box", lineBillingFrequency="Monthly"))] == ["quantity", "uom", "lineBillingFrequency"]
+    assert engine.check_line(_line(lineType="Flexible", uom="Anything")) == []
+    assert engine.check_line(_line(lineType="Unknown Type", quantity=0)) == []
+
+
+def test_shipped_rules_require_recurring_quantity_and_price():
+    engine = get_rule_engine()
+    for line_type in ("Recurring", "Recurring Fulfillment"):
+        assert engine.check_line(_line(lineType=line_type, quantity=2, unitPrice=10)) == []
+        assert [f for f, _ in engine.check_line(_line(lineType=line_type, unitPrice=10))] == ["quantity"]
+        assert [f for f, _ in engine.check_line(_line(lineType=line_type, quantity=2))] == ["unitPrice"]
+
+
+def test_buy_intent_skips_billing_field_checks():
+    engine = LineTypeRuleEngine(TABLE)
+    line = _line(lineType="One Time", quantity=1, lineBillingFrequency="Monthly")
+    assert engine.check_line(line, intent="BUY") == []
+    assert engine.check_billing(line) == [("lineBillingFrequency", "Allowed Billing Frequency: One Time")]
+
+
+def test_unknown_condition_is_rejected_at_compile_time():
+    with pytest.raises(ValueError):
+        LineTypeRuleEngine({"Recurring": {"quantity": ["SOMETIMES"]}})
+
+
+def test_check_order_reports_all_violations_in_recvue_format():
+    payload = copy.deepcopy(PAYLOAD)
+    first = payload["orderLines"][0]
+    payload["orderLines"] = [dict(first, lineNumber="1", lineType="T_COMMIT_USAGE", quantity=2, itemName="x"),
+                             dict(first, lineNumber="2", lineType="T_COMMIT_USAGE", quantity=0)]
+    violations = get_rule_engine().check_order(OrderPayload(**payload))
+    assert recvue_failure(violations) == {
+        "statusCode": "FAILURE",
+        "message": "Validation Failed - quantity: Line 1: Line Type T_COMMIT_USAGE should have Quantity as zero"
+                   " | itemName: Line 2: Line Type T_COMMIT_USAGE can't have Item Name as null",
+        "id": None,
+    }
+
+
+@respx.mock
+def test_endpoint_rejects_rule_violations_before_authorize():
+    auth = respx.get(AUTH_URL).respond(200)
+    payload = copy.deepcopy(PAYLOAD)
+    payload["orderLines"][0].update(lineType="T_COMMIT_USAGE", itemName="Fuel", quantity=5)
+    response = client.post("/invoke_order_creation", json=payload, headers=HEADERS)
+    assert response.status_code == 422
+    assert response.json()["statusCode"] == "FAILURE"
+    assert "should have Quantity as zero" in response.json()["message"]
+    assert auth.call_count == 0
+
+
+def test_stream_applies_line_type_rules():
+    payload = copy.deepcopy(PAYLOAD)
+    payload["orderLines"][0].update(lineType="T_COMMIT_USAGE", quantity=1)
+    response = client.post("/invoke_order_creation/stream", content=json.dumps(payload).encode(), headers=HEADERS)
+    assert response.status_code == 422
+    errors = [e["error"] for e in response.json()["details"]["lines"]]
+    assert errors == ["itemName: Line Type T_COMMIT_USAGE can't have Item Name as null",
+                      "quantity: Line Type T_COMMIT_USAGE should have Quantity as zero"]
@@ -0,0 +1,65 @@
+import asyncio
+import json
+import logging
+import queue
+import pytest
+from app.core import log
+from app.core.log import JsonFormatter, RateLimitFilter, TextFormatter
+
+
+def _record(msg="RecVue response: %s", args=(503,), level=logging.WARNING, **extra):
+    record = logging.LogRecord("payloadbridge", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_rate_limit_reports_suppressed_count_when_window_rolls():
+    now = [0.0]
+    limiter = RateLimitFilter(limit=2, window=1.0, timer=lambda: now[0])
+    assert [limiter.filter(_record()) for _ in range(5)] == [True, True, False, False, False]
+    assert limiter.filter(_record("other template"))  # keyed by template, not by formatted message
+    now[0] = 1.5
+    record = _record()
+    assert limiter.filter(record)
+    assert record.suppressed == 3
+
+
+def test_json_formatter_merges_context_and_extra():
+    record = _record(context={"request_id": "r1", "tenant": "t1"}, tenant="t2", attempt=2)
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["msg"] == "RecVue response: 503"
+    assert entry["request_id"] == "r1" and entry["tenant"] == "t2" and entry["attempt"] == 2
+    assert entry["ts"].endswith("Z") and entry["level"] == "WARNING"
+    assert "tenant=t2" in TextFormatter().format(_record(context={"tenant": "t2"}))
+
+
+@pytest.mark.asyncio
+async def test_context_is_isolated_per_task():
+    async def handle(request_id):
+        log.bind(request_id=request_id)
+        await asyncio.sleep(0)
+        return log.current_context()["request_id"]
+
+    assert await asyncio.gather(handle("a"), handle("b")) == ["a", "b"]
+    assert "request_id" not in log.current_context()
+    with log.log_context(tenant="t1"):
+        assert log.current_context()["tenant"] == "t1"
+    assert "tenant" not in log.current_context()
+
+
+def test_queue_handler_defers_formatting_and_captures_context():
+    records = queue.SimpleQueue()
+    handler = log._ContextQueueHandler(records)
+
+    class Lazy:
+        formatted = False
+
+        def __str__(self):
+            Lazy.formatted = True
+            return "body"
+
+    with log.log_context(request_id="r9"):
+        handler.handle(_record("error body %s", (Lazy(),)))
+    record = records.get_nowait()
+    assert not Lazy.formatted and record.context == {"request_id": "r9"}
+    assert record.getMessage() == "error body body"
@@ -0,0 +1,101 @@
+import json
+from datetime import date
+import pytest
+import respx
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.main import app
+from app.models.order_schema import validate_order
+from app.services import mapping
+from app.services.mapping import MappingError, MappingSpecError, compile_spec, get_mapping
+from app.tests.test_http_client import AUTH_URL, HEADERS, RECVUE_URL
+
+LEGACY = {
+    "order_id": 1001,
+    "customer_id": " CUST-12345 ",
+    "notes": "rush",
+    "order_lines": [{"product_id": "SKU-1", "quantity": 2, "price": "9.50"}, {"product_id": "SKU-2", "quantity": 1, "price": 120}],
+}
+
+
+def test_legacy_spec_maps_to_a_valid_recvue_order():
+    order = get_mapping("legacy_payload")(LEGACY)
+    today = date.today().isoformat()
+    assert order["orderNumber"] == "1001" and order["hdrBillToCustAccountNum"] == "CUST-12345"
+    assert order["hdrEffectiveStartDate"] == today and "businessUnit" in order
+    assert order["orderLines"][1] == {"lineNumber": "2", "lineType": "Recurring", "lineEffectiveStartDate": today,
+                                      "lineEvergreenFlag": "Y", "itemName": "SKU-2", "quantity": 1.0, "unitPrice": 120.0}
+    validate_order(json.dumps(order).encode())
+
+
+def test_rules_paths_values_and_errors():
+    transform = compile_spec({
+        "header": {
+            "orderNumber": "meta.id",
+            "hdrEvergreenFlag": {"path": "evergreen", "transform": "flag"},
+            "orderType": {"path": "kind", "values": {"new": "Standard Order", "renew": "Renewal Order"}},
+            "hdrCurrency": {"path": "currency", "transform": "upper", "default": "usd"},
+            "hdrEffectiveStartDate": {"path": "starts", "transform": "date", "required": True},
+        },
+        "lines": {"from": "items", "fields": {"lineNumber": {"index": 10}, "quantity": {"path": "qty", "transform": "int"}}},
+    })
+    order = transform({"meta": {"id": "A-1"}, "evergreen": "yes", "kind": "renew", "starts": "2024-03-01T10:00:00Z",
+                       "items": [{"qty": "3"}, {}]})
+    assert order == {"orderNumber": "A-1", "hdrEvergreenFlag": "Y", "orderType": "Renewal Order", "hdrCurrency": "USD",
+                     "hdrEffectiveStartDate": "2024-03-01", "orderLines": [{"lineNumber": "10", "quantity": 3}, {"lineNumber": "11"}]}
+    assert transform({"meta": "not an object", "kind": "other", "starts": "2024-03-01"})["orderType"] == "other"
+
+    with pytest.raises(MappingError, match="hdrEffectiveStartDate is required"):
+        transform({})
+    with pytest.raises(MappingError, match=r"items\[1\]\.quantity: invalid literal"):
+        transform({"starts": "2024-03-01", "items": [{"qty": 1}, {"qty": "many"}]})
+    with pytest.raises(MappingError, match="items must be a list"):
+        transform({"starts": "2024-03-01", "items": {}})
+
+
+@pytest.mark.parametrize("spec, message", [
+    ({"header": {"orderType": {"const": "A", "path": "b"}}}, "exactly one of"),
+    ({"header": {"orderType": {"path": "a", "transfrom": "str"}}}, "unknown keys: transfrom"),
+    ({"header": {"orderType": {"path": "a", "transform": "titlecase"}}}, "unknown transform"),
+    ({"header": {"lineNumber": {"index": 1}}}, "only available for line fields"),
+    ({"lines": {"fields": {}}}, "lines needs 'from'"),
+])
+def test_invalid_specs_fail_at_compile_time(spec, message):
+    with pytest.raises(MappingSpecError, match=message):
+        compile_spec(spec)
+
+
+def test_specs_are_loaded_from_mappings_dir(tmp_path, monkeypatch):
+    (tmp_path / "crm.json").write_text(json.dumps({"header": {"orderNumber": "id"}}))
+    (tmp_path / "shop.yaml").write_text("source: webshop\nheader:\n  orderNumber: {path: ref, transform: str}\n")
+    (tmp_path / "README.md").write_text("not a spec")
+    monkeypatch.setattr(settings, "MAPPINGS_DIR", str(tmp_path))
+    mapping.get_mappings.cache_clear()
+    try:
+        assert sorted(mapping.get_mappings()) == ["crm", "webshop"]
+        assert get_mapping("webshop")({"ref": 7}) == {"orderNumber": "7"}
+        assert get_mapping("legacy_payload") is None
+    finally:
+        mapping.get_mappings.cache_clear()
+
+
+@respx.mock
+def test_mapped_orders_are_validated_and_forwarded():
+    respx.get(AUTH_URL).respond(200, json={"x-forwarded-user": "u", "tenantIdentifier": "tenant1", "hostName": "h"})
+    recvue = respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS"})
+    headers = {**HEADERS, mapping.SOURCE_HEADER: "legacy_payload"}
+
+    with TestClient(app) as client:
+        created = client.post("/invoke_order_creation", json=LEGACY, headers=headers)
+        unmappable = client.post("/invoke_order_creation", json={**LEGACY, "customer_id": None}, headers=headers)
+        unknown = client.post("/invoke_order_creation", json=LEGACY, headers={**HEADERS, mapping.SOURCE_HEADER: "nope"})
+        batch = client.post("/invoke_order_creation/batch", json=[LEGACY, {"order_id": 2, "order_lines": []}], headers=headers)
+
+    assert created.status_code == 200
+    sent = json.loads(recvue.calls[0].request.content)
+    assert sent["orderNumber"] == "1001" and sent["orderLines"][0]["itemName"] == "SKU-1"
+    assert unmappable.status_code == 422 and unmappable.json()["details"] == "hdrBillToCustAccountNum is required"
+    assert unknown.status_code == 400
+    assert batch.status_code == 207
+    assert [r["status_code"] for r in batch.json()["results"]] == [200, 422]
+    assert recvue.call_count == 2
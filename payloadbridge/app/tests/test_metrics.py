@@ -0,0 +1,95 @@
+import httpx
+import pytest
+import respx
+from fastapi.testclient import TestClient
+from app.core import metrics
+from app.core.metrics import Counter, Histogram, REGISTRY, Registry
+from app.main import app
+from app.tests.test_http_client import AUTH_URL, HEADERS, PAYLOAD, RECVUE_URL
+
+AUTH_RESPONSE = {"x-forwarded-user": "user1", "tenantIdentifier": "tenant1", "hostName": "dummyhost.recvue.com"}
+
+
+def _sample(text, line_prefix):
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_histogram_exposition_is_cumulative():
+    registry = Registry()
+    hist = registry.register(Histogram("demo_seconds", "Demo.", ("stage",), buckets=(0.1, 1.0)))
+    hist.labels("parse").observe(0.05)
+    hist.labels("parse").observe(0.5)
+    hist.labels("parse").observe(5)
+    text = registry.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert _sample(text, 'demo_seconds_bucket{stage="parse",le="0.1"}') == 1
+    assert _sample(text, 'demo_seconds_bucket{stage="parse",le="1"}') == 2
+    assert _sample(text, 'demo_seconds_bucket{stage="parse",le="+Inf"}') == 3
+    assert _sample(text, 'demo_seconds_count{stage="parse"}') == 3
+    assert _sample(text, 'demo_seconds_sum{stage="parse"}') == 5.55
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    counter = registry.register(Counter("demo_total", "Demo.", ("tenant",)))
+    counter.labels('a"b\\c').inc()
+    assert 'demo_total{tenant="a\\"b\\\\c"} 1' in registry.render()
+
+
+def test_tenant_labels_are_capped(monkeypatch):
+    monkeypatch.setattr(metrics, "MAX_TENANT_LABELS", 2)
+    registry = Registry()
+    counter = registry.register(Counter("demo_total", "Demo.", ("status", "tenant")))
+    for tenant in ("t1", "t2", "t3", "t4", "t1"):
+        counter.labels("200", tenant).inc()
+    text = registry.render()
+    assert _sample(text, 'demo_total{status="200",tenant="t1"}') == 2
+    assert _sample(text, 'demo_total{status="200",tenant="other"}') == 2
+    assert "t3" not in text
+
+
+def test_metric_types_must_define_their_children():
+    class Summary(metrics._Metric):
+        type_name = "summary"
+
+    with pytest.raises(TypeError):
+        Summary("demo_summary", "Demo.")
+
+
+@respx.mock
+def test_order_request_records_stage_and_recvue_metrics():
+    respx.get(AUTH_URL).respond(200, json=AUTH_RESPONSE)
+    respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS", "id": "1"})
+    with TestClient(app) as client:
+        assert client.post("/invoke_order_creation", json=PAYLOAD, headers=HEADERS).status_code == 200
+        text = client.get("/metrics").text
+
+    assert _sample(text, 'payloadbridge_http_requests_total{endpoint="/invoke_order_creation",method="POST",status="200"}') == 1
+    assert _sample(text, 'payloadbridge_request_duration_seconds_count{endpoint="/invoke_order_creation",tenant="tenant1"}') == 1
+    for stage in ("parse", "validate", "rules", "authorize", "recvue_post"):
+        assert _sample(text, f'payloadbridge_stage_duration_seconds_count{{stage="{stage}",tenant="tenant1"}}') == 1
+    assert _sample(text, 'payloadbridge_recvue_responses_total{tenant="tenant1",status="200"}') == 1
+    assert _sample(text, 'payloadbridge_order_lines_count{endpoint="/invoke_order_creation",tenant="tenant1"}') == 1
+    assert _sample(text, 'payloadbridge_payload_bytes_count{endpoint="/invoke_order_creation",tenant="tenant1"}') == 1
+    assert _sample(text, 'payloadbridge_http_in_flight_requests{method="POST",tenant="tenant1"}') == 0
+    assert _sample(text, 'payloadbridge_http_in_flight_requests{method="GET",tenant=""}') == 1  # the scrape itself
+    assert _sample(text, 'payloadbridge_circuit_state{tenant="tenant1"}') == 0
+    assert _sample(text, 'payloadbridge_recvue_in_flight_requests{tenant="tenant1"}') == 0
+
+
+@respx.mock
+def test_retries_and_templated_routes_are_labelled():
+    respx.get(AUTH_URL).respond(200, json=AUTH_RESPONSE)
+    respx.post(RECVUE_URL).mock(side_effect=httpx.ConnectError("refused"))
+    with TestClient(app) as client:
+        assert client.post("/invoke_order_creation", json=PAYLOAD, headers=HEADERS).status_code == 502
+        client.get("/jobs/does-not-exist", headers=HEADERS)
+        text = REGISTRY.render()
+
+    assert _sample(text, 'payloadbridge_recvue_retries_total{tenant="tenant1"}') == 2
+    assert _sample(text, 'payloadbridge_recvue_responses_total{tenant="tenant1",status="error"}') == 3
+    assert 'endpoint="/jobs/{job_id}"' in text
+    assert "does-not-exist" not in text
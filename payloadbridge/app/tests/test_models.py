@@ -0,0 +1,39 @@
+import pytest
+from pydantic import ValidationError
+from app.models.order_line import OrderLine, OrderPayload
+from app.tests.test_http_client import PAYLOAD
+from app.utils import fastjson
+from app.utils.validators import is_json_error, validation_message
+
+
+def test_validate_json_matches_dict_validation():
+    raw = fastjson.dumps({**PAYLOAD, "orderType": "  Standard Order  "})
+    from_json = OrderPayload.model_validate_json(raw)
+    assert from_json == OrderPayload.model_validate(fastjson.loads(raw))
+    assert from_json.orderType == "Standard Order"
+
+
+def test_evergreen_rules_and_messages():
+    line = {"lineNumber": "1", "lineType": "Recurring", "lineEffectiveStartDate": "2024-01-01", "lineEvergreenFlag": "N"}
+    with pytest.raises(ValidationError) as e:
+        OrderLine.model_validate(line)
+    assert validation_message(e.value) == "lineEffectiveEndDate is required if lineEvergreenFlag is N"
+    with pytest.raises(ValidationError) as e:
+        OrderPayload.model_validate({**PAYLOAD, "hdrEffectiveEndDate": None, "orderLines": []})
+    assert "orderLines: List should have at least 1 item" in validation_message(e.value)
+    assert "hdrEffectiveEndDate" not in validation_message(e.value)  # field errors short-circuit the after-validator
+
+
+def test_invalid_json_is_distinguished():
+    with pytest.raises(ValidationError) as e:
+        OrderPayload.model_validate_json(b"{not json")
+    assert is_json_error(e.value)
+    assert not is_json_error(ValueError("x"))
+
+
+def test_numeric_identifiers_are_coerced_to_strings():
+    line = {**PAYLOAD["orderLines"][0], "lineNumber": 1}
+    payload = {**PAYLOAD, "orderNumber": 12345, "hdrBillToCustAccountNum": 100, "orderLines": [line]}
+    order = OrderPayload.model_validate(payload)
+    assert (order.orderNumber, order.hdrBillToCustAccountNum, order.orderLines[0].lineNumber) == ("12345", "100", "1")
+    assert OrderPayload.model_validate_json(fastjson.dumps(payload)) == order
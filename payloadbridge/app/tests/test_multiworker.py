@@ -0,0 +1,179 @@
+import asyncio
+import copy
+import json
+import os
+import sqlite3
+import pytest
+import respx
+from fastapi import Response
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.main import app
+from app.services import idempotency, resilience, validation_pool
+from app.services.resilience import OPEN, CircuitOpenError, TenantGuard
+from app.server import prepare_workers, worker_count
+from app.utils.cache import SQLiteTTLCache, TTLCache, new_cache
+from app.tests.test_http_client import AUTH_URL, HEADERS, PAYLOAD, RECVUE_URL
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "shared.sqlite3")
+
+
+def test_sqlite_cache_is_shared_between_instances(cache_path):
+    now = [1000.0]
+    first = SQLiteTTLCache(cache_path, "auth", maxsize=10, ttl=5, timer=lambda: now[0])
+    second = SQLiteTTLCache(cache_path, "auth", maxsize=10, ttl=5, timer=lambda: now[0])
+    first.set(("caller", "host"), {"tenantIdentifier": "t1"})
+    assert second.get(("caller", "host")) == {"tenantIdentifier": "t1"}
+    assert len(second) == 1
+    now[0] += 6
+    assert second.get(("caller", "host")) is None
+    assert isinstance(new_cache(10, 5), TTLCache)
+    assert isinstance(new_cache(10, 5, cache_path, "other"), SQLiteTTLCache)
+
+
+def test_add_only_claims_missing_or_expired_keys(cache_path):
+    now = [0.0]
+    cache = SQLiteTTLCache(cache_path, "leases", maxsize=10, ttl=5, timer=lambda: now[0])
+    assert cache.add("order", "pending", ttl=1)
+    assert not cache.add("order", "pending", ttl=1)
+    now[0] = 2
+    assert cache.add("order", "pending", ttl=1)
+    assert cache.pop("order") == "pending" and cache.get("order") is None
+
+
+def test_locked_database_is_a_cache_miss(cache_path):
+    cache = SQLiteTTLCache(cache_path, "contended", maxsize=10, ttl=60, busy_timeout=0.01)
+    cache.set("key", "value")
+    other_worker = sqlite3.connect(cache_path, isolation_level=None)
+    other_worker.execute("BEGIN EXCLUSIVE")
+    try:
+        assert cache.get("key") == "value"  # WAL readers don't wait for the writer
+        cache.set("other", "value")
+        assert not cache.add("lease", "pending")
+        assert cache.pop("key") is None
+    finally:
+        other_worker.execute("ROLLBACK")
+        other_worker.close()
+    assert cache.get("key") == "value" and cache.get("other") is None and cache.add("lease", "pending")
+
+
+def test_eviction_keeps_maxsize_entries(cache_path):
+    cache = SQLiteTTLCache(cache_path, "small", maxsize=8, ttl=60)
+    for i in range(128):
+        cache.set(i, i)
+    assert len(cache) == 8
+    assert cache.get(127) == 127 and cache.get(0) is None
+
+
+@pytest.mark.asyncio
+async def test_duplicate_waits_for_the_worker_holding_the_lease(cache_path, monkeypatch):
+    monkeypatch.setattr(idempotency, "_results", SQLiteTTLCache(cache_path, "idempotency", 100, 60))
+    other_worker = SQLiteTTLCache(cache_path, "idempotency", 100, 60)
+    key = ("caller", "host", "body", "digest")
+    assert other_worker.add(key, idempotency._PENDING, ttl=60)
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        return Response(status_code=200, content=b"{}")
+
+    waiting = asyncio.ensure_future(idempotency.run_once(key, "digest", "req-2", handler))
+    await asyncio.sleep(0.1)
+    assert not waiting.done()
+    other_worker.set(key, idempotency.StoredResponse("digest", 201, b'{"id": "1"}'))
+    response = await waiting
+    assert response.status_code == 201 and response.headers["Idempotent-Replayed"] == "true"
+    assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_failed_submission_releases_the_lease(cache_path, monkeypatch):
+    monkeypatch.setattr(idempotency, "_results", SQLiteTTLCache(cache_path, "idempotency", 100, 60))
+
+    async def handler():
+        return Response(status_code=503, content=b"{}")
+
+    await idempotency.run_once(("k",), "digest", "req-1", handler)
+    assert idempotency._results.get(("k",)) is None
+
+
+@pytest.mark.asyncio
+async def test_result_write_is_retried_while_the_file_is_locked(cache_path, monkeypatch):
+    monkeypatch.setattr(idempotency, "_results", SQLiteTTLCache(cache_path, "idempotency", 100, 60, busy_timeout=0.01))
+    other_worker = sqlite3.connect(cache_path, isolation_level=None)
+
+    async def handler():
+        other_worker.execute("BEGIN EXCLUSIVE")  # another worker takes the write lock while the order is forwarded
+        return Response(status_code=201, content=b'{"id": "1"}')
+
+    async def unlock():
+        await asyncio.sleep(0.2)
+        other_worker.execute("ROLLBACK")
+
+    unlocking = asyncio.ensure_future(unlock())
+    response = await idempotency.run_once(("k",), "digest", "req-1", handler)
+    await unlocking
+    other_worker.close()
+    assert response.status_code == 201
+    assert idempotency._results.get(("k",)) == idempotency.StoredResponse("digest", 201, b'{"id": "1"}')
+
+
+def test_open_breaker_is_seen_by_other_workers(cache_path, monkeypatch):
+    monkeypatch.setattr(resilience, "_shared_breakers", SQLiteTTLCache(cache_path, "breakers", 100, 30))
+    sick, other = TenantGuard("tenant1"), TenantGuard("tenant1")
+    for _ in range(settings.BREAKER_FAILURE_THRESHOLD):
+        sick.breaker.record_failure()
+    other.sync()
+    assert other.breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        other.breaker.before_call()
+    sick.breaker.record_success()
+    late = TenantGuard("tenant1")
+    late.sync()
+    assert late.breaker.state != OPEN
+
+
+def test_check_order_reports_outcome_and_line_count():
+    assert validation_pool.check_order(json.dumps(PAYLOAD).encode(), "lazy") == (validation_pool.VALID, None, 1)
+    outcome, details, _ = validation_pool.check_order(b'{"orderNumber": "1"}', "lazy")
+    assert outcome == validation_pool.INVALID and "orderLines" in details
+    payload = copy.deepcopy(PAYLOAD)
+    payload["orderLines"][0].update(lineType="T_COMMIT_USAGE", itemName="Fuel", quantity=5)
+    outcome, violations, _ = validation_pool.check_order(json.dumps(payload).encode(), "lazy")
+    assert outcome == validation_pool.RULE_VIOLATIONS and violations[0][0] == "quantity"
+
+
+@respx.mock
+def test_large_orders_are_validated_in_the_process_pool(monkeypatch):
+    monkeypatch.setattr(settings, "VALIDATION_PROCESSES", 1)
+    monkeypatch.setattr(settings, "VALIDATION_OFFLOAD_BYTES", 0)
+    respx.get(AUTH_URL).respond(200, json={"x-forwarded-user": "u", "tenantIdentifier": "tenant1", "hostName": "h"})
+    respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS"})
+    with TestClient(app) as client:
+        assert validation_pool.should_offload(1)
+        assert client.post("/invoke_order_creation", json=PAYLOAD, headers=HEADERS).status_code == 200
+        invalid = client.post("/invoke_order_creation/async", json={"orderNumber": "1"}, headers=HEADERS)
+    assert invalid.status_code == 422 and invalid.json()["error"] == "Invalid input"
+    assert not validation_pool.should_offload(1)
+
+
+def test_multi_worker_setup_shares_caches_and_recovers_jobs_once(tmp_path, monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    assert worker_count() == 3 and worker_count(5) == 5
+    monkeypatch.delenv("WEB_CONCURRENCY")
+    assert worker_count() == (os.cpu_count() or 1)
+
+    for name in ("SHARED_CACHE_PATH", "JOBS_RECOVER_ON_STARTUP", "JOBS_TOKEN_KEY"):
+        monkeypatch.setenv(name, "")  # restored after the test
+        monkeypatch.delenv(name)
+    monkeypatch.setattr(settings, "JOBS_DB_PATH", str(tmp_path / "jobs.sqlite3"))
+    prepare_workers(1)
+    assert "SHARED_CACHE_PATH" not in os.environ
+    prepare_workers(4)
+    path = os.environ["SHARED_CACHE_PATH"]
+    assert path.endswith(".sqlite3")
+    assert os.stat(path).st_mode & 0o777 == 0o600 and os.stat(os.path.dirname(path)).st_mode & 0o777 == 0o700
+    assert os.environ["JOBS_RECOVER_ON_STARTUP"] == "false" and os.environ["JOBS_TOKEN_KEY"]
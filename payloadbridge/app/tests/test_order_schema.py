@@ -0,0 +1,49 @@
+import json
+from pathlib import Path
+import pytest
+from app.models import generate_schema, order_schema
+from app.models.order_schema import AttributeValidationError, FullOrderPayload, validate_order
+from app.tests.test_http_client import PAYLOAD
+from benchmarks.payloads import build_order
+
+DOCS_SAMPLE = Path(__file__).resolve().parents[3] / "docs" / "OrderLines_API.json"
+
+
+def test_schema_file_matches_generator():
+    with open(order_schema.SCHEMA_FILE) as f:
+        assert json.load(f) == generate_schema.generate(generate_schema.load_sample(DOCS_SAMPLE))
+
+
+def test_sample_order_covers_every_field():
+    order = FullOrderPayload.from_body(build_order(2))
+    line = order.orderLines[0]
+    assert order.hdrBillToSiteNumber == "CHCTN0513-001"
+    assert order.attributes.hdrAttribute1N == 4.0
+    assert order.attributes.orderLines[0].lineAttribute1D.isoformat() == "2023-11-10"
+    known = set(type(line).model_fields) | set(order_schema.family_fields(order_schema._SCHEMA["line"]))
+    assert set(build_order(1)["orderLines"][0]) <= known
+    assert order.attribute_errors() == []
+
+
+def test_attribute_families_are_checked_lazily():
+    body = {**PAYLOAD, "hdrAttribute2N": "not-a-number",
+            "orderLines": [{**PAYLOAD["orderLines"][0], "lineRevAttribute3D": "someday"}]}
+    order = validate_order(body, mode="lazy")  # accepted: families are not touched
+    assert "hdrAttribute2N" not in order.__dict__
+    assert order.attribute_errors() == [
+        "hdrAttribute2N: Input should be a valid number, unable to parse string as a number",
+        "orderLines.0.lineRevAttribute3D: Input should be a valid date or datetime, input is too short",
+    ]
+    with pytest.raises(AttributeValidationError):
+        validate_order(body, mode="full")
+    with pytest.raises(AttributeValidationError):
+        order_schema.validate_line(body["orderLines"][0], mode="full")
+    assert validate_order(body, mode="core").orderType == "Standard Order"
+
+
+def test_named_fields_are_checked_eagerly():
+    with pytest.raises(ValueError):
+        validate_order({**PAYLOAD, "nextRenewalDate": "soon"}, mode="lazy")
+    assert validate_order({**PAYLOAD, "nextRenewalDate": "soon"}, mode="core")
+    with pytest.raises(ValueError):
+        validate_order(PAYLOAD, mode="eager")
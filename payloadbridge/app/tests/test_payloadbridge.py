@@ -1,6 +1,7 @@
 import uuid
 import httpx
 from app.main import app
+from app.tests.test_http_client import AUTH_URL
 import pytest
 from fastapi.testclient import TestClient
 import respx
@@ -29,7 +30,9 @@ def test_evergreen_end_date_conflict():
                 "lineType": "Recurring",
                 "lineEffectiveStartDate": "2024-01-01",
                 "lineEvergreenFlag": "Y",
-                "lineEffectiveEndDate": "2024-12-31"
+                "lineEffectiveEndDate": "2024-12-31",
+                "quantity": 1,
+                "unitPrice": 100
             }
         ]
     }
@@ -53,12 +56,14 @@ def test_recvue_500():
                 "lineNumber": "1",
                 "lineType": "Recurring",
                 "lineEffectiveStartDate": "2024-01-01",
-                "lineEffectiveEndDate": "2024-12-31"
+                "lineEffectiveEndDate": "2024-12-31",
+                "quantity": 1,
+                "unitPrice": 100
             }
         ]
     }
     headers = {"access_token": "dummy", "hostName": "dummyhost"}
-    respx.get("https://dummyhost/api/v2.0/authorize").respond(200, json={"x-forwarded-user": "user", "tenantIdentifier": "tenant", "hostName": "dummyhost"})
+    respx.get(AUTH_URL).respond(200, json={"x-forwarded-user": "user", "tenantIdentifier": "tenant", "hostName": "dummyhost"})
     respx.post("https://tenant.recvue.com/api/v2.0/order/orderlines").respond(500, json={"error": "Internal Server Error"})
     response = client.post("/invoke_order_creation", json=payload, headers=headers)
     assert response.status_code == 500 or response.status_code == 502
@@ -78,12 +83,14 @@ def test_recvue_timeout():
                 "lineNumber": "1",
                 "lineType": "Recurring",
                 "lineEffectiveStartDate": "2024-01-01",
-                "lineEffectiveEndDate": "2024-12-31"
+                "lineEffectiveEndDate": "2024-12-31",
+                "quantity": 1,
+                "unitPrice": 100
             }
         ]
     }
     headers = {"access_token": "dummy", "hostName": "dummyhost"}
-    respx.get("https://dummyhost/api/v2.0/authorize").respond(200, json={"x-forwarded-user": "user", "tenantIdentifier": "tenant", "hostName": "dummyhost"})
+    respx.get(AUTH_URL).respond(200, json={"x-forwarded-user": "user", "tenantIdentifier": "tenant", "hostName": "dummyhost"})
     respx.post("https://tenant.recvue.com/api/v2.0/order/orderlines").mock(side_effect=httpx.TimeoutException("Timeout"))
     response = client.post("/invoke_order_creation", json=payload, headers=headers)
     assert response.status_code == 502
@@ -103,23 +110,18 @@ def test_recvue_malformed_response():
                 "lineNumber": "1",
                 "lineType": "Recurring",
                 "lineEffectiveStartDate": "2024-01-01",
-                "lineEffectiveEndDate": "2024-12-31"
+                "lineEffectiveEndDate": "2024-12-31",
+                "quantity": 1,
+                "unitPrice": 100
             }
         ]
     }
     headers = {"access_token": "dummy", "hostName": "dummyhost"}
-    respx.get("https://dummyhost/api/v2.0/authorize").respond(200, json={"x-forwarded-user": "user", "tenantIdentifier": "tenant", "hostName": "dummyhost"})
+    respx.get(AUTH_URL).respond(200, json={"x-forwarded-user": "user", "tenantIdentifier": "tenant", "hostName": "dummyhost"})
     respx.post("https://tenant.recvue.com/api/v2.0/order/orderlines").respond(200, text="<html>not json</html>")
     response = client.post("/invoke_order_creation", json=payload, headers=headers)
     assert response.status_code == 200
     assert "RecVue returned non-JSON response" in response.text
-import pytest
-from fastapi.testclient import TestClient
-from payloadbridge.main import app
-import respx
-from httpx import Response
-
-client = TestClient(app)
 
 @pytest.fixture
 def valid_headers():
@@ -144,14 +146,16 @@ def valid_payload():
                 "lineNumber": "1",
                 "lineType": "Recurring",
                 "lineEffectiveStartDate": "2024-01-01",
-                "lineEffectiveEndDate": "2024-12-31"
+                "lineEffectiveEndDate": "2024-12-31",
+                "quantity": 1,
+                "unitPrice": 100
             }
         ]
     }
 
 @respx.mock
 def test_valid_payload(valid_headers, valid_payload):
-    respx.get("https://dummyhost.recvue.com/api/v2.0/authorize").respond(
+    respx.get(AUTH_URL).respond(
         200, json={
             "x-forwarded-user": "user1",
             "tenantIdentifier": "tenant1",
@@ -163,17 +167,17 @@ def test_valid_payload(valid_headers, valid_payload):
     )
     response = client.post("/invoke_order_creation", json=valid_payload, headers=valid_headers)
     assert response.status_code == 200
-    assert response.json()["statusCode"] == "SUCCESS"
+    assert response.json()["recvue"]["statusCode"] == "SUCCESS"
 
 @respx.mock
 def test_missing_field(valid_headers, valid_payload):
     del valid_payload["orderType"]
     response = client.post("/invoke_order_creation", json=valid_payload, headers=valid_headers)
     assert response.status_code == 422
-    assert "Order type is required" in response.text
+    assert "orderType: Field required" in response.text
 
 @respx.mock
 def test_bad_auth(valid_headers, valid_payload):
-    respx.get("https://dummyhost.recvue.com/api/v2.0/authorize").respond(401)
+    respx.get(AUTH_URL).respond(401)
     response = client.post("/invoke_order_creation", json=valid_payload, headers=valid_headers)
     assert response.status_code == 401
@@ -0,0 +1,136 @@
+import asyncio
+import copy
+import json
+import pytest
+import respx
+from fastapi.testclient import TestClient
+from app.core import metrics
+from app.core.config import settings
+from app.main import app
+from app.models.order_schema import validate_order
+from app.services import reference_data
+from app.services.reference_data import LookupIndex, ReferenceData, load_source
+from app.tests.test_http_client import AUTH_URL, HEADERS, PAYLOAD, RECVUE_URL
+
+LOOKUPS = {
+    "ORDER_TYPE": ["Standard Order", "Renewal Order"],
+    "BUSINESS_UNIT": ["US1 Business Unit"],
+    "CUSTOMER_ACCOUNT": ["CUST-12345", "CUST-777"],
+    "LINE_TYPE": ["Recurring", "One Time"],
+}
+
+
+def test_index_checks_header_and_line_fields():
+    index = LookupIndex(LOOKUPS, 0.0)
+    assert index.check(PAYLOAD) == []
+    order = copy.deepcopy(PAYLOAD)
+    order.update(orderType="Bogus", priceList="Not checked: no PRICE_LIST lookup", hdrSellToCustAccountNum="")
+    order["orderLines"][0].update(lineType="Mystery", lineSellToCustAccountNum="CUST-777")
+    assert index.check(order) == [("orderType", "Invalid order type: Bogus"), ("lineType", "Line 1: Invalid line type: Mystery")]
+    # Validated models are checked the same way
+    assert index.check(validate_order(json.dumps(order).encode(), "lazy")) == index.check(order)
+
+
+@pytest.mark.asyncio
+async def test_stale_data_is_served_while_it_is_reloaded():
+    now = [0.0]
+    loads = []
+
+    async def loader(tenant):
+        loads.append(tenant)
+        return {"ORDER_TYPE": [f"Type {len(loads)}"]}
+
+    cache = ReferenceData(loader, ttl=10, max_stale=100, retry=5, timer=lambda: now[0])
+    assert cache.get("t1") is None  # never waits for the first load
+    await asyncio.sleep(0.05)
+    first = cache.get("t1")
+    assert first.check({"orderType": "Type 1"}) == []
+
+    now[0] = 50
+    assert cache.get("t1") is first  # stale, served while the reload runs
+    await asyncio.sleep(0.05)
+    assert cache.get("t1").check({"orderType": "Type 1"}) != [] and loads == ["t1", "t1"]
+
+    now[0] = 500
+    assert cache.get("t1") is None  # too stale to trust
+
+
+@pytest.mark.asyncio
+async def test_failed_loads_keep_the_old_data_and_back_off():
+    now = [0.0]
+    calls = []
+
+    async def loader(tenant):
+        calls.append(now[0])
+        if len(calls) > 1:
+            raise OSError("lookup service down")
+        return {"ORDER_TYPE": ["Standard Order"]}
+
+    cache = ReferenceData(loader, ttl=10, max_stale=100, retry=5, timer=lambda: now[0])
+    await cache.load("t1")
+    now[0] = 20
+    assert await cache.load("t1") is not None
+    now[0] = 22
+    assert cache.get("t1") is not None
+    await asyncio.sleep(0.05)
+    assert calls == [0.0, 20]  # no new attempt within REFERENCE_DATA_RETRY
+    now[0] = 26
+    cache.get("t1")
+    await asyncio.sleep(0.05)
+    assert calls == [0.0, 20, 26]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_sources_are_files_or_urls_per_tenant(tmp_path, monkeypatch):
+    (tmp_path / "tenant1.json").write_text(json.dumps(LOOKUPS))
+    monkeypatch.setattr(settings, "REFERENCE_DATA_SOURCE", str(tmp_path / "{tenant}.json"))
+    assert await load_source("tenant1") == LOOKUPS
+    assert await load_source("tenant2") is None
+
+    monkeypatch.setattr(settings, "REFERENCE_DATA_SOURCE", "https://lookups.example.com/{tenant}")
+    respx.get("https://lookups.example.com/tenant1").respond(200, json=LOOKUPS)
+    respx.get("https://lookups.example.com/tenant2").respond(404)
+    assert await load_source("tenant1") == LOOKUPS
+    assert await load_source("tenant2") is None
+
+
+@respx.mock
+def test_invalid_lookups_are_rejected_before_recvue(tmp_path, monkeypatch):
+    (tmp_path / "tenant1.json").write_text(json.dumps(LOOKUPS))
+    monkeypatch.setattr(settings, "REFERENCE_DATA_SOURCE", str(tmp_path / "{tenant}.json"))
+    monkeypatch.setattr(settings, "REFERENCE_DATA_TENANTS", "tenant1")
+    respx.get(AUTH_URL).respond(200, json={"x-forwarded-user": "u", "tenantIdentifier": "tenant1", "hostName": "h"})
+    recvue = respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS"})
+    invalid = {**PAYLOAD, "hdrBillToCustAccountNum": "CUST-404"}
+
+    with TestClient(app) as client:
+        client.portal.call(reference_data.get_reference_data().load, "tenant1")
+        rejected = client.post("/invoke_order_creation", json=invalid, headers=HEADERS)
+        queued = client.post("/invoke_order_creation/async", json=invalid, headers=HEADERS)
+        assert client.post("/invoke_order_creation", json=PAYLOAD, headers=HEADERS).status_code == 200
+
+    assert rejected.status_code == 422 and queued.status_code == 422
+    assert rejected.json()["statusCode"] == "FAILURE"
+    assert "Invalid customer account number: CUST-404" in json.dumps(rejected.json())
+    assert recvue.call_count == 1
+    assert 'payloadbridge_reference_data_rejections_total{tenant="tenant1",field="hdrBillToCustAccountNum"} 2' in metrics.REGISTRY.render()
+
+
+@respx.mock
+def test_reference_data_rejections_are_not_replayed(tmp_path, monkeypatch):
+    source = tmp_path / "tenant1.json"
+    source.write_text(json.dumps(LOOKUPS))
+    monkeypatch.setattr(settings, "REFERENCE_DATA_SOURCE", str(tmp_path / "{tenant}.json"))
+    respx.get(AUTH_URL).respond(200, json={"x-forwarded-user": "u", "tenantIdentifier": "tenant1", "hostName": "h"})
+    respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS"})
+    order = {**PAYLOAD, "hdrBillToCustAccountNum": "CUST-404"}
+
+    with TestClient(app) as client:
+        client.portal.call(reference_data.get_reference_data().load, "tenant1")
+        assert client.post("/invoke_order_creation", json=order, headers=HEADERS).status_code == 422
+        # The account is set up in RecVue and the reference data refreshed: the same order now goes through
+        source.write_text(json.dumps({**LOOKUPS, "CUSTOMER_ACCOUNT": LOOKUPS["CUSTOMER_ACCOUNT"] + ["CUST-404"]}))
+        client.portal.call(reference_data.get_reference_data().load, "tenant1")
+        accepted = client.post("/invoke_order_creation", json=order, headers=HEADERS)
+    assert accepted.status_code == 200 and "Idempotent-Replayed" not in accepted.headers
@@ -0,0 +1,137 @@
+import asyncio
+import httpx
+import pytest
+import respx
+from httpx import Response
+from app.services import bridge
+from app.services.bridge import send_order
+from app.services.resilience import (AIMDLimiter, CLOSED, CircuitBreaker, CircuitOpenError, ConcurrencyLimitError,
+                                     HALF_OPEN, OPEN, backoff_delay, get_tenant_guard)
+from app.tests.test_bridge import OKTA_HEADERS
+from app.tests.test_http_client import RECVUE_URL
+
+
+def test_breaker_opens_half_opens_and_closes():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, timer=lambda: now[0])
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    now[0] = 11
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one probe at a time
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.failures == 0
+
+
+def test_failed_probe_reopens_breaker():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, timer=lambda: now[0])
+    breaker.record_failure()
+    now[0] = 6
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_aimd_limit_adjusts_to_latency_and_failures():
+    limiter = AIMDLimiter(initial=10, minimum=2, maximum=11, latency_target=1.0, backoff_ratio=0.5)
+    limiter.on_success(0.1)
+    assert limiter.limit == pytest.approx(10.1)
+    limiter.on_success(5.0)  # slower than target
+    assert limiter.limit == pytest.approx(5.05)
+    for _ in range(5):
+        limiter.on_failure()
+    assert limiter.limit == 2
+    for _ in range(1000):
+        limiter.on_success(0.1)
+    assert limiter.limit == 11
+
+
+@pytest.mark.asyncio
+async def test_limiter_queues_then_rejects_after_max_wait():
+    limiter = AIMDLimiter(initial=1, minimum=1, maximum=1, latency_target=1.0, backoff_ratio=0.5)
+    order = []
+
+    async def hold(name, delay):
+        async with limiter.slot(max_wait=1.0):
+            order.append(name)
+            await asyncio.sleep(delay)
+
+    await asyncio.gather(hold("a", 0.02), hold("b", 0))
+    assert order == ["a", "b"] and limiter.in_flight == 0
+
+    async with limiter.slot(max_wait=1.0):
+        with pytest.raises(ConcurrencyLimitError):
+            async with limiter.slot(max_wait=0.01):
+                pass
+    assert limiter.in_flight == 0
+
+
+def test_backoff_is_jittered_and_capped(monkeypatch):
+    monkeypatch.setattr("app.services.resilience.random.uniform", lambda low, high: high)
+    assert [backoff_delay(a) for a in range(3)] == [0.001, 0.002, 0.004]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_sick_tenant_fails_fast_without_affecting_others(monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(bridge, "sleep", fake_sleep)
+    sick = respx.post(RECVUE_URL).mock(side_effect=httpx.ConnectError("down"))
+    healthy = respx.post("https://tenant2.recvue.com/api/v2.0/order/orderlines").respond(200, json={"statusCode": "SUCCESS"})
+
+    status_code, _ = await send_order(b"{}", OKTA_HEADERS, "r1")  # 3 failed attempts
+    assert status_code == 502 and len(sleeps) == 2
+    await send_order(b"{}", OKTA_HEADERS, "r2")  # failures 4 and 5 open the breaker
+    assert get_tenant_guard("tenant1").breaker.state == OPEN
+
+    calls = sick.call_count
+    status_code, content = await send_order(b"{}", OKTA_HEADERS, "r3")
+    assert status_code == 503 and content["error"] == "RecVue circuit open"
+    assert sick.call_count == calls
+
+    status_code, _ = await send_order(b"{}", {**OKTA_HEADERS, "tenantIdentifier": "tenant2"}, "r4")
+    assert status_code == 200 and healthy.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_is_given_back(monkeypatch):
+    breaker = get_tenant_guard("tenant1").breaker
+    breaker.record_failure()
+    breaker.state, breaker._opened_at = OPEN, breaker._timer() - breaker.reset_timeout - 1
+    started = asyncio.Event()
+
+    async def hang(*args):
+        started.set()
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(bridge, "_request", hang)
+    task = asyncio.ensure_future(send_order(b"{}", OKTA_HEADERS, "r"))
+    await started.wait()
+    assert breaker.state == HALF_OPEN and breaker._probes == 1
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert breaker._probes == 0
+    breaker.before_call()  # the next request may probe
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_server_errors_count_against_the_breaker():
+    respx.post(RECVUE_URL).mock(return_value=Response(503))
+    for _ in range(5):
+        await send_order(b"{}", OKTA_HEADERS, "r")
+    assert get_tenant_guard("tenant1").breaker.state == OPEN
@@ -0,0 +1,129 @@
+import copy
+import json
+import pytest
+import respx
+from fastapi.testclient import TestClient
+from app.main import app
+from app.tests.test_http_client import AUTH_URL, HEADERS, PAYLOAD, RECVUE_URL
+from app.services.streaming import MAX_REPORTED_LINE_ERRORS, LineValidator
+from app.utils.json_stream import IncrementalOrderParser, assemble_order
+
+client = TestClient(app)
+
+AUTH_OK = {"x-forwarded-user": "user1", "tenantIdentifier": "tenant1", "hostName": "dummyhost.recvue.com"}
+
+
+def _large_order(line_count):
+    order = copy.deepcopy(PAYLOAD)
+    line = order["orderLines"][0]
+    order["orderLines"] = [dict(line, lineNumber=str(i + 1), itemName="Item \"quoted\" é") for i in range(line_count)]
+    return order
+
+
+def test_parser_resumes_a_split_element_instead_of_redecoding_it():
+    order = {"orderNumber": "1", "orderLines": [{"lineComments": "x\\\\\" ]}" * 20000, "lineNumber": 1}]}
+    body = json.dumps(order).encode()
+    parser = IncrementalOrderParser()
+    calls = []
+    decode = parser._decoder.raw_decode
+    parser._decoder.raw_decode = lambda *args: calls.append(1) or decode(*args)
+    lines = []
+    for i in range(0, len(body), 1000):
+        lines += parser.feed(body[i:i + 1000])
+    lines += parser.close()
+    assert [line for line, _ in lines] == order["orderLines"] and parser.header == {"orderNumber": "1"}
+    assert len(calls) == 5  # three header tokens, then the line: once incomplete, once whole; not once per chunk
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_parser_yields_lines_across_chunk_boundaries(chunk_size):
+    order = _large_order(25)
+    raw = json.dumps(order).encode()
+    parser = IncrementalOrderParser()
+    items = []
+    for i in range(0, len(raw), chunk_size):
+        items.extend(parser.feed(raw[i:i + chunk_size]))
+    items.extend(parser.close())
+    assert [line for line, _ in items] == order["orderLines"]
+    assert "orderLines" not in parser.header and parser.header["orderNumber"] == order["orderNumber"]
+    assert json.loads(assemble_order(parser.header, [r for _, r in items])) == order
+
+
+def test_parser_accepts_a_body_split_at_any_offset():
+    body = b'{"a":1.5e3,"b":-0.25E-2,"c":true,"d":null,"orderLines":[{"q":10},2.5e1,false],"e":12}'
+    expected = json.loads(body)
+    for split in range(len(body) + 1):
+        parser = IncrementalOrderParser()
+        items = parser.feed(body[:split]) + parser.feed(body[split:]) + parser.close()
+        assert [line for line, _ in items] == expected["orderLines"], split
+        assert parser.header == {k: v for k, v in expected.items() if k != "orderLines"}, split
+
+
+@pytest.mark.parametrize("body", [b'{"orderNumber": "1"', b'{"orderLines": [1 2]}', b'[]', b'{"a": 1} {}'])
+def test_parser_rejects_malformed_json(body):
+    parser = IncrementalOrderParser()
+    with pytest.raises(ValueError):
+        parser.feed(body)
+        parser.close()
+
+
+@respx.mock
+def test_stream_single_order_is_forwarded():
+    respx.get(AUTH_URL).respond(200, json=AUTH_OK)
+    recvue = respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS"})
+    order = _large_order(200)
+    response = client.post("/invoke_order_creation/stream", content=json.dumps(order).encode(), headers=HEADERS)
+    assert response.status_code == 200
+    assert response.json()["recvue"]["statusCode"] == "SUCCESS"
+    assert json.loads(recvue.calls.last.request.content) == order
+
+
+def test_stream_single_order_reports_every_bad_line():
+    order = _large_order(10)
+    order["orderLines"][2]["lineEvergreenFlag"] = "Y"  # end date set on an evergreen line
+    del order["orderLines"][7]["lineType"]
+    response = client.post("/invoke_order_creation/stream", content=json.dumps(order).encode(), headers=HEADERS)
+    assert response.status_code == 422
+    details = response.json()["details"]
+    assert [e["lineIndex"] for e in details["lines"]] == [2, 7]
+    assert details["lineCount"] == 10 and details["invalidLineCount"] == 2
+
+
+def test_stream_single_order_rejects_truncated_body():
+    raw = json.dumps(_large_order(3)).encode()[:-10]
+    response = client.post("/invoke_order_creation/stream", content=raw, headers=HEADERS)
+    assert response.status_code == 400
+
+
+@respx.mock
+def test_stream_ndjson_orders():
+    respx.get(AUTH_URL).respond(200, json=AUTH_OK)
+    recvue = respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS"})
+    bad = _large_order(3)
+    bad["orderLines"][1]["lineEffectiveStartDate"] = "not-a-date"
+    body = "\n".join(json.dumps(o) for o in [_large_order(3), bad, _large_order(1)]).encode()
+    response = client.post("/invoke_order_creation/stream", content=body, headers={**HEADERS, "Content-Type": "application/x-ndjson"})
+    assert response.status_code == 207
+    results = response.json()["results"]
+    assert [r["status_code"] for r in results] == [200, 422, 200]
+    # Same per-record outcome as a /batch NDJSON record
+    assert results[1]["error"] == "Invalid input" and results[1]["details"].startswith("orderLines.1.lineEffectiveStartDate")
+    assert recvue.call_count == 2
+
+
+def test_held_back_billing_errors_are_capped():
+    class BillingOnly:
+        def check_line(self, line, intent=None):
+            return []
+
+        def check_billing(self, line):
+            return [("lineBillingFrequency", "Allowed Billing Frequency: One Time")]
+
+    lines = LineValidator()
+    lines._rules = BillingOnly()
+    for _ in range(MAX_REPORTED_LINE_ERRORS * 3):
+        lines.add(PAYLOAD["orderLines"][0], "{}")
+    assert len(lines.billing_errors) == MAX_REPORTED_LINE_ERRORS and lines.error_count == 0
+    lines.apply_intent("SELL")
+    assert len(lines.errors) == MAX_REPORTED_LINE_ERRORS and lines.error_count == MAX_REPORTED_LINE_ERRORS * 3
+    assert lines.raw_lines == [] and lines.billing_errors == []
@@ -0,0 +1,94 @@
+import time
+import httpx
+import pytest
+import respx
+from fastapi.testclient import TestClient
+from app.core import tracing
+from app.main import app
+from app.tests.test_http_client import AUTH_URL, HEADERS, PAYLOAD, RECVUE_URL
+from app.tests.test_metrics import AUTH_RESPONSE
+
+UPSTREAM_TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+TRACEPARENT = f"00-{UPSTREAM_TRACE_ID}-00f067aa0ba902b7-01"
+
+
+@pytest.fixture
+def spans():
+    assert tracing.setup_tracing(True, "memory")
+    yield tracing.memory_exporter()
+    tracing.shutdown_tracing()
+
+
+def _by_name(exporter):
+    return {s.name: s for s in exporter.get_finished_spans()}
+
+
+@respx.mock
+def test_order_request_is_traced_and_propagated(spans):
+    respx.get(AUTH_URL).respond(200, json=AUTH_RESPONSE)
+    recvue = respx.post(RECVUE_URL).respond(200, json={"statusCode": "SUCCESS", "id": "1"})
+    with TestClient(app) as client:
+        response = client.post("/invoke_order_creation", json=PAYLOAD, headers={**HEADERS, "traceparent": TRACEPARENT})
+    assert response.status_code == 200
+
+    by_name = _by_name(spans)
+    server = by_name["POST /invoke_order_creation"]
+    assert format(server.context.trace_id, "032x") == UPSTREAM_TRACE_ID
+    assert server.parent.is_remote
+    for name in ("parse", "validate", "rules", "authorize", "RecVue POST"):
+        assert by_name[name].context.trace_id == server.context.trace_id
+        assert by_name[name].parent.span_id == server.context.span_id
+    attempt = by_name["RecVue POST"]
+    assert attempt.attributes["tenant"] == "tenant1" and attempt.attributes["attempt"] == 1
+    assert attempt.attributes["http.response.status_code"] == 200
+
+    # RecVue sees the attempt span as its parent
+    outbound = recvue.calls.last.request.headers["traceparent"]
+    assert outbound == f"00-{UPSTREAM_TRACE_ID}-{attempt.context.span_id:016x}-01"
+
+
+@respx.mock
+def test_each_recvue_attempt_gets_a_span(spans):
+    respx.get(AUTH_URL).respond(200, json=AUTH_RESPONSE)
+    respx.post(RECVUE_URL).mock(side_effect=httpx.ConnectError("refused"))
+    with TestClient(app) as client:
+        assert client.post("/invoke_order_creation", json=PAYLOAD, headers=HEADERS).status_code == 502
+
+    attempts = [s for s in spans.get_finished_spans() if s.name == "RecVue POST"]
+    assert sorted(s.attributes["attempt"] for s in attempts) == [1, 2, 3]
+    assert all(not s.status.is_ok for s in attempts)
+    assert _by_name(spans)["POST /invoke_order_creation"].attributes["http.response.status_code"] == 502
+
+
+def test_head_sampling_drops_unsampled_traces():
+    assert tracing.setup_tracing(True, "memory", sample_ratio=0.0)
+    try:
+        with tracing.span("root"), tracing.span("child"):
+            pass
+        assert tracing.memory_exporter().get_finished_spans() == ()
+    finally:
+        tracing.shutdown_tracing()
+
+
+def test_tail_sampling_keeps_failed_and_slow_traces():
+    assert tracing.setup_tracing(True, "memory", sample_ratio=0.0, tail_sampling=True, tail_latency=0.05)
+    try:
+        exporter = tracing.memory_exporter()
+        with tracing.span("fast"), tracing.span("fast.child"):
+            pass
+        with pytest.raises(RuntimeError):
+            with tracing.span("failed"), tracing.span("failed.child"):
+                raise RuntimeError("boom")
+        with tracing.span("slow"):
+            time.sleep(0.06)
+        assert sorted(s.name for s in exporter.get_finished_spans()) == ["failed", "failed.child", "slow"]
+    finally:
+        tracing.shutdown_tracing()
+
+
+def test_tracing_disabled_is_a_no_op():
+    assert not tracing.setup_tracing(False)
+    headers = {}
+    with tracing.span("parse") as span:
+        assert span is None
+    assert tracing.inject(headers) == {}
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger("payloadbridge")
+
+
+class TTLCache:
+    """Bounded in-process cache with per-entry expiry and LRU eviction."""
+
+    def __init__(self, maxsize: int, ttl: float, timer: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at <= self._timer():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        # True unless the write was given up (only the shared cache can fail to write)
+        if self.maxsize <= 0:
+            return True
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return True
+        self._data[key] = (self._timer() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one in-flight awaitable."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        fut = self._calls.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(fn())
+            self._calls[key] = fut
+            fut.add_done_callback(lambda f, key=key: self._forget(key, f))
+        # Shield so a cancelled waiter doesn't cancel the call other waiters depend on
+        return await asyncio.shield(fut)
+
+    def _forget(self, key: Hashable, fut: "asyncio.Future[Any]") -> None:
+        if self._calls.get(key) is fut:
+            del self._calls[key]
+        if not fut.cancelled():
+            fut.exception()  # mark retrieved when every waiter has gone away
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
+
+
+class SQLiteTTLCache:
+    """TTLCache with the same interface backed by a local SQLite file, so every worker process on the host shares
+    it. Values are pickled; expiry uses wall-clock time since monotonic clocks are per process. Calls are made inline
+    on the event loop: reads on a WAL database don't wait for writers, and a write that can't get the database lock
+    within `busy_timeout` seconds is given up, so a contended file costs a cache miss (get/pop return the default,
+    set stores nothing and returns False, add claims nothing) rather than a stalled loop."""
+
+    def __init__(self, path: str, table: str, maxsize: int, ttl: float, timer: Callable[[], float] = time.time,
+                 busy_timeout: float = 0.02):
+        self.path = path
+        self.table = table
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._writes = 0
+        # Setup may wait for another worker creating the same tables; afterwards the busy timeout is kept short
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value BLOB NOT NULL)")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_expires ON {table} (expires_at)")
+        self._conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+
+    @staticmethod
+    def _key(key: Hashable) -> str:
+        return repr(key)
+
+    def _run(self, fn: Callable[[sqlite3.Connection], Any], default: Any = None) -> Any:
+        with self._lock:
+            try:
+                return fn(self._conn)
+            except sqlite3.OperationalError as e:
+                # SQLITE_BUSY: another worker held the write lock past the busy timeout
+                if "locked" not in str(e) and "busy" not in str(e):
+                    raise
+                logger.warning("Shared cache %s busy, treated as a miss", self.table)
+                return default
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        row = self._run(lambda conn: conn.execute(f"SELECT value FROM {self.table} WHERE key = ? AND expires_at > ?",
+                                                  (self._key(key), self._timer())).fetchone())
+        return default if row is None else pickle.loads(row[0])
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        ttl = self.ttl if ttl is None else ttl
+        if self.maxsize <= 0 or ttl <= 0:
+            self.pop(key)  # nothing is stored, but a lease taken with add() is released
+            return True
+        row = (self._key(key), self._timer() + ttl, pickle.dumps(value))
+
+        def write(conn: sqlite3.Connection) -> bool:
+            conn.execute(f"INSERT OR REPLACE INTO {self.table} (key, expires_at, value) VALUES (?, ?, ?)", row)
+            self._maybe_evict()
+            return True
+
+        return self._run(write, False)
+
+    def add(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        # Stores `value` only if there is no live entry for `key`; the atomic claim used for cross-process leases
+        ttl = self.ttl if ttl is None else ttl
+        now = self._timer()
+        return self._run(lambda conn: conn.execute(
+            f"INSERT INTO {self.table} (key, expires_at, value) VALUES (?, ?, ?) "
+            f"ON CONFLICT(key) DO UPDATE SET expires_at = excluded.expires_at, value = excluded.value WHERE expires_at <= ?",
+            (self._key(key), now + ttl, pickle.dumps(value), now)).rowcount > 0, False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        row = self._run(lambda conn: conn.execute(f"DELETE FROM {self.table} WHERE key = ? AND expires_at > ? RETURNING value",
+                                                  (self._key(key), self._timer())).fetchone())
+        return default if row is None else pickle.loads(row[0])
+
+    def _maybe_evict(self) -> None:
+        # Expired rows are dropped, and the oldest-expiring ones beyond maxsize, every 64 writes
+        self._writes += 1
+        if self._writes % 64:
+            return
+        self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (self._timer(),))
+        self._conn.execute(f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} "
+                           f"ORDER BY expires_at DESC LIMIT -1 OFFSET ?)", (self.maxsize,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table} WHERE expires_at > ?", (self._timer(),)).fetchone()[0]
+
+
+def new_cache(maxsize: int, ttl: float, shared_path: Optional[str] = None, table: str = "cache"):
+    # Process-local unless a shared cache file is configured (multi-worker mode)
+    if shared_path:
+        return SQLiteTTLCache(shared_path, table, maxsize, ttl)
+    return TTLCache(maxsize, ttl)
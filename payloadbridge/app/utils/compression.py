@@ -0,0 +1,125 @@
+import gzip
+import zlib
+from typing import Optional
+
+# brotli is optional: without it `Content-Encoding: br` requests are answered with 415
+try:
+    import brotli
+except ImportError:  # pragma: no cover - exercised only without brotli
+    brotli = None
+
+from app.utils import fastjson
+
+SUPPORTED_ENCODINGS = ("gzip", "deflate", "br") if brotli is not None else ("gzip", "deflate")
+
+
+class DecompressionError(ValueError):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Decompressor:
+    """Incremental decoder for one Content-Encoding; raises DecompressionError once more than `max_size`
+    bytes would be produced, without ever holding more than that (decompression bombs)."""
+
+    def __init__(self, encoding: str, max_size: int):
+        self.encoding = encoding
+        self.max_size = max_size
+        self.total = 0
+        if encoding == "br":
+            self._brotli = brotli.Decompressor()
+        else:
+            # 16 + MAX_WBITS: gzip header; MAX_WBITS: zlib-wrapped deflate
+            self._zlib = zlib.decompressobj(16 + zlib.MAX_WBITS if encoding == "gzip" else zlib.MAX_WBITS)
+
+    def feed(self, data: bytes) -> bytes:
+        remaining = self.max_size - self.total
+        try:
+            if self.encoding == "br":
+                try:
+                    out = self._brotli.process(data, output_buffer_limit=remaining + 1)
+                except TypeError:  # brotli < 1.2 has no output limit
+                    out = self._brotli.process(data)
+            else:
+                out = self._zlib.decompress(data, remaining + 1)
+        except (zlib.error, getattr(brotli, "error", zlib.error)) as e:
+            raise DecompressionError(f"Invalid {self.encoding} request body: {e}") from None
+        self.total += len(out)
+        if self.total > self.max_size:
+            raise DecompressionError(f"Decompressed request body exceeds {self.max_size} bytes", 413)
+        return out
+
+    def finish(self) -> None:
+        complete = self._brotli.is_finished() if self.encoding == "br" else self._zlib.eof
+        if not complete:
+            raise DecompressionError(f"Truncated {self.encoding} request body")
+
+
+def gzip_compress(data: bytes, level: int) -> bytes:
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class DecompressionMiddleware:
+    """Pure ASGI middleware decoding gzip/deflate/br request bodies chunk by chunk as the app reads them, so
+    streaming endpoints stay incremental. Errors (bad data, too large) replace whatever the app answered."""
+
+    def __init__(self, app, max_size: int):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = None
+        for name, value in scope["headers"]:
+            if name == b"content-encoding":
+                encoding = value.decode("latin-1").strip().lower()
+        if encoding in (None, "", "identity"):
+            await self.app(scope, receive, send)
+            return
+        if encoding not in SUPPORTED_ENCODINGS:
+            await _send_error(send, 415, f"Unsupported Content-Encoding {encoding!r}; use one of {', '.join(SUPPORTED_ENCODINGS)}")
+            return
+
+        # The app sees a plain body of unknown length. Mutated in place: outer middleware reads scope["route"] later
+        scope["headers"] = [(k, v) for k, v in scope["headers"] if k not in (b"content-encoding", b"content-length")]
+        decompressor = Decompressor(encoding, self.max_size)
+        failure: Optional[DecompressionError] = None
+        response_started = False
+
+        async def receive_wrapper():
+            nonlocal failure
+            message = await receive()
+            if message["type"] == "http.request":
+                try:
+                    body = decompressor.feed(message.get("body", b""))
+                    if not message.get("more_body", False):
+                        decompressor.finish()
+                except DecompressionError as e:
+                    failure = e
+                    raise
+                message = dict(message, body=body)
+            return message
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if failure is None:
+                response_started = True
+                await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        except DecompressionError:
+            if failure is None:
+                raise
+        if failure is not None and not response_started:
+            await _send_error(send, failure.status_code, str(failure))
+
+
+async def _send_error(send, status: int, message: str) -> None:
+    body = fastjson.dumps({"error": message})
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
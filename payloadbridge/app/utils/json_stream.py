@@ -0,0 +1,234 @@
+import codecs
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_WS = re.compile(r"[ \t\n\r]*")
+_NEED_MORE = object()
+# Structural characters outside and inside strings, and what ends a number or literal
+_STRUCTURE = re.compile(r'["{}\[\]]')
+_IN_STRING = re.compile(r'["\\]')
+_PRIMITIVE_END = re.compile(r"[ \t\n\r,\]}]")
+
+_START, _KEY_OR_END, _KEY, _COLON, _VALUE, _AFTER_VALUE, _ARRAY_START, _ITEM_OR_END, _ITEM, _AFTER_ITEM, _DONE = range(11)
+
+
+class _ElementScanner:
+    """Finds where a JSON value split across chunks ends, resuming from where the previous chunk left off. The
+    partial value is kept as a list of pieces, so a large element costs one pass instead of a re-decode per chunk."""
+
+    __slots__ = ("primitive", "depth", "in_string", "escaped", "parts", "size")
+
+    def __init__(self, first: str):
+        self.primitive = first not in '{["'
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.parts: List[str] = []
+        self.size = 0
+
+    def scan(self, text: str, pos: int = 0) -> int:
+        # Offset just past the end of the value in `text`, or -1 when it continues beyond it
+        if self.primitive:
+            match = _PRIMITIVE_END.search(text, pos)
+            return match.start() if match else -1
+        if self.escaped:
+            if pos >= len(text):
+                return -1
+            self.escaped = False
+            pos += 1
+        while True:
+            match = (_IN_STRING if self.in_string else _STRUCTURE).search(text, pos)
+            if match is None:
+                return -1
+            c = match.group()
+            pos = match.end()
+            if self.in_string:
+                if c == "\\":
+                    if pos >= len(text):
+                        self.escaped = True
+                        return -1
+                    pos += 1
+                else:
+                    self.in_string = False
+                    if not self.depth:
+                        return pos
+            elif c == '"':
+                self.in_string = True
+            elif c in "{[":
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if not self.depth:
+                    return pos
+
+    def keep(self, text: str) -> None:
+        self.parts.append(text)
+        self.size += len(text)
+
+
+class IncrementalOrderParser:
+    """Incrementally decodes one JSON order object fed in byte chunks.
+
+    Elements of the `array_key` array are returned from feed()/close() as (value, raw_json) as soon as
+    each one is complete; all other top-level fields are collected into `header`. Values are decoded
+    with the stdlib C scanner, so only the structural tokens of the top-level object are walked in Python.
+    """
+
+    def __init__(self, array_key: str = "orderLines", max_pending_chars: int = 16 * 1024 * 1024):
+        self.array_key = array_key
+        self.max_pending_chars = max_pending_chars
+        self.header: Dict[str, Any] = {}
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._state = _START
+        self._key = None
+        self._eof = False
+        # Set while a value is incomplete; it then holds the value's text instead of _buf
+        self._scanner: Optional[_ElementScanner] = None
+
+    def feed(self, chunk: bytes) -> List[Tuple[Any, str]]:
+        items: List[Tuple[Any, str]] = []
+        if self._append(self._utf8.decode(chunk)):
+            self._run(items)
+        pending = self._scanner.size if self._scanner is not None else len(self._buf) - self._pos
+        if pending > self.max_pending_chars:
+            raise ValueError(f"JSON element exceeds {self.max_pending_chars} characters")
+        return items
+
+    def close(self) -> List[Tuple[Any, str]]:
+        self._eof = True
+        self._append(self._utf8.decode(b"", final=True))
+        items: List[Tuple[Any, str]] = []
+        self._run(items)
+        if self._state != _DONE:
+            raise ValueError("Unexpected end of JSON body")
+        return items
+
+    def _append(self, text: str) -> bool:
+        # False while the incomplete value is still incomplete: nothing new to parse yet
+        scanner = self._scanner
+        if scanner is None:
+            self._buf = self._buf[self._pos:] + text
+        else:
+            end = scanner.scan(text)
+            if end < 0 and not self._eof:
+                scanner.keep(text)
+                return False
+            if end < 0:
+                end = len(text)
+            scanner.keep(text[:end])
+            self._buf = "".join(scanner.parts) + text[end:]
+            self._scanner = None
+        self._pos = 0
+        return True
+
+    def _decode_value(self):
+        try:
+            value, end = self._decoder.raw_decode(self._buf, self._pos)
+        except json.JSONDecodeError as e:
+            if self._eof or not self._wait_for_rest():
+                raise ValueError(f"Invalid JSON: {e}") from None
+            return _NEED_MORE
+        # A number or literal with no terminator after it may still be growing: a chunk can end after "1", "1." or "1.5e"
+        if not self._eof and self._buf[self._pos] not in '{["' and _PRIMITIVE_END.search(self._buf, end) is None:
+            self._wait_for_rest()
+            return _NEED_MORE
+        raw = self._buf[self._pos:end]
+        self._pos = end
+        return value, raw
+
+    def _wait_for_rest(self) -> bool:
+        # Hands the incomplete value at _pos to a scanner; False if it is complete after all (so it is invalid)
+        scanner = _ElementScanner(self._buf[self._pos])
+        if scanner.scan(self._buf, self._pos) >= 0:
+            return False
+        scanner.keep(self._buf[self._pos:])
+        self._scanner = scanner
+        self._buf = ""
+        self._pos = 0
+        return True
+
+    def _expected(self, what: str) -> ValueError:
+        return ValueError(f"Invalid JSON: expected {what} at offset {self._pos}")
+
+    def _run(self, items: List[Tuple[Any, str]]) -> None:
+        buf = self._buf
+        while True:
+            self._pos = _WS.match(buf, self._pos).end()
+            if self._pos >= len(buf):
+                return
+            c = buf[self._pos]
+            state = self._state
+            if state == _START:
+                if c != "{":
+                    raise self._expected("'{'")
+                self._pos += 1
+                self._state = _KEY_OR_END
+            elif state in (_KEY_OR_END, _KEY):
+                if c == "}" and state == _KEY_OR_END:
+                    self._pos += 1
+                    self._state = _DONE
+                    continue
+                if c != '"':
+                    raise self._expected("a field name")
+                decoded = self._decode_value()
+                if decoded is _NEED_MORE:
+                    return
+                self._key = decoded[0]
+                self._state = _COLON
+            elif state == _COLON:
+                if c != ":":
+                    raise self._expected("':'")
+                self._pos += 1
+                self._state = _ARRAY_START if self._key == self.array_key else _VALUE
+            elif state == _ARRAY_START:
+                if c != "[":
+                    # Not an array; keep it as a header value and let validation reject it
+                    self._state = _VALUE
+                    continue
+                self._pos += 1
+                self._state = _ITEM_OR_END
+            elif state in (_ITEM_OR_END, _ITEM):
+                if c == "]" and state == _ITEM_OR_END:
+                    self._pos += 1
+                    self._state = _AFTER_VALUE
+                    continue
+                decoded = self._decode_value()
+                if decoded is _NEED_MORE:
+                    return
+                items.append(decoded)
+                self._state = _AFTER_ITEM
+            elif state == _AFTER_ITEM:
+                if c == ",":
+                    self._state = _ITEM
+                elif c == "]":
+                    self._state = _AFTER_VALUE
+                else:
+                    raise self._expected("',' or ']'")
+                self._pos += 1
+            elif state == _VALUE:
+                decoded = self._decode_value()
+                if decoded is _NEED_MORE:
+                    return
+                self.header[self._key] = decoded[0]
+                self._state = _AFTER_VALUE
+            elif state == _AFTER_VALUE:
+                if c == ",":
+                    self._state = _KEY
+                elif c == "}":
+                    self._state = _DONE
+                else:
+                    raise self._expected("',' or '}'")
+                self._pos += 1
+            else:
+                raise ValueError(f"Invalid JSON: extra data at offset {self._pos}")
+
+
+def assemble_order(header: Dict[str, Any], raw_items: List[str], array_key: str = "orderLines") -> bytes:
+    # Re-emits the order from the decoded header and the untouched raw line JSON, without re-encoding lines
+    head = json.dumps(header, separators=(",", ":"))
+    prefix = head[:-1] + ("," if header else "")
+    return f'{prefix}"{array_key}":[{",".join(raw_items)}]}}'.encode("utf-8")
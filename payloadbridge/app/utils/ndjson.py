@@ -0,0 +1,25 @@
+from typing import AsyncIterator
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[bytes]:
+    """Split a byte stream into non-blank NDJSON records without buffering more than one record."""
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end == -1:
+                break
+            if end - start > max_line_bytes:
+                raise ValueError(f"NDJSON record exceeds {max_line_bytes} bytes")
+            line = bytes(buffer[start:end]).strip()
+            start = end + 1
+            if line:
+                yield line
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            raise ValueError(f"NDJSON record exceeds {max_line_bytes} bytes")
+    line = bytes(buffer).strip()
+    if line:
+        yield line
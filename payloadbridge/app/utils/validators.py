@@ -1,9 +1,25 @@
 from typing import Optional
 from datetime import date
-from app.models.order_line import EvergreenFlag
+from pydantic import ValidationError
 
-def validate_evergreen_and_end_date(flag: Optional[EvergreenFlag], end_date: Optional[date]) -> None:
-    if flag == EvergreenFlag.Y and end_date is not None:
+# Flags are compared by value so this module doesn't import app.models.order_line (which imports it)
+def validate_evergreen_and_end_date(flag: Optional[str], end_date: Optional[date]) -> None:
+    if flag == 'Y' and end_date is not None:
         raise ValueError('lineEffectiveEndDate should not be set if lineEvergreenFlag is Y')
-    if flag == EvergreenFlag.N and end_date is None:
+    if flag == 'N' and end_date is None:
         raise ValueError('lineEffectiveEndDate is required if lineEvergreenFlag is N')
+
+def validation_message(error: Exception) -> str:
+    # "loc: msg; loc: msg" without pydantic's per-error documentation links
+    if not isinstance(error, ValidationError):
+        return str(error)
+    parts = []
+    for e in error.errors(include_url=False, include_context=False, include_input=False):
+        msg = e["msg"][len("Value error, "):] if e["msg"].startswith("Value error, ") else e["msg"]
+        loc = ".".join(str(p) for p in e["loc"])
+        parts.append(f"{loc}: {msg}" if loc else msg)
+    return "; ".join(parts)
+
+
+def is_json_error(error: Exception) -> bool:
+    return isinstance(error, ValidationError) and any(e["type"] == "json_invalid" for e in error.errors(include_url=False))
@@ -0,0 +1,96 @@
+"""Month-end scenario for admission control: one tenant floods the bridge while another keeps sending small orders.
+
+Forwarding is simulated (a sleep proportional to order size, with CAPACITY cost units in flight) so the numbers
+show queuing only. Without admission control every order waits in arrival order (a FIFO semaphore, like the
+outbound connection pool); with it orders go through FairQueue. Reports the quiet tenant's latency and how many of
+the flooding tenant's orders were shed.
+
+    python -m benchmarks.bench_admission --flood 2000 --quiet 50 --capacity 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import Dict, List
+
+os.environ.setdefault("AUTHORIZE_URL_BASE", "https://auth.example.com")
+os.environ.setdefault("RECVUE_API_BASE_URL", "https://tenant.recvue.com/api/v2.0/order/orderlines")
+os.environ.setdefault("RECVUE_API_TOKEN", "bench")
+
+from app.services.admission import FairQueue, Rejected, order_cost  # noqa: E402
+
+UNIT_SECONDS = 0.002  # simulated RecVue time per cost unit
+
+
+async def fifo_run(cost: float, semaphore: asyncio.Semaphore) -> None:
+    async with semaphore:
+        await asyncio.sleep(cost * UNIT_SECONDS)
+
+
+async def fair_run(queue: FairQueue, tenant: str, cost: float, max_wait: float) -> None:
+    held = await queue.acquire(tenant, cost, max_wait)
+    started = time.perf_counter()
+    try:
+        await asyncio.sleep(cost * UNIT_SECONDS)
+    finally:
+        queue.release(held, time.perf_counter() - started)
+
+
+async def scenario(mode: str, flood: int, quiet: int, capacity: int, max_wait: float) -> Dict[str, List[float]]:
+    semaphore = asyncio.Semaphore(capacity)
+    queue = FairQueue(capacity, max_queue=100000, weights={})
+    latencies: Dict[str, List[float]] = {"flood": [], "quiet": [], "shed": []}
+
+    async def order(tenant: str, lines: int) -> None:
+        cost = order_cost(lines)
+        started = time.perf_counter()
+        try:
+            if mode == "fifo":
+                await fifo_run(cost, semaphore)
+            else:
+                await fair_run(queue, tenant, cost, max_wait)
+        except Rejected:
+            latencies["shed"].append(time.perf_counter() - started)
+            return
+        latencies[tenant].append(time.perf_counter() - started)
+
+    async def quiet_sender() -> None:
+        tasks = []
+        for _ in range(quiet):
+            tasks.append(asyncio.create_task(order("quiet", 5)))
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*tasks)
+
+    # The flood arrives all at once: a month-end backlog of mixed order sizes
+    flood_tasks = [asyncio.create_task(order("flood", 500 if i % 10 == 0 else 20)) for i in range(flood)]
+    await quiet_sender()
+    await asyncio.gather(*flood_tasks)
+    return latencies
+
+
+def pct(samples: List[float], q: float) -> float:
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flood", type=int, default=2000)
+    parser.add_argument("--quiet", type=int, default=50)
+    parser.add_argument("--capacity", type=int, default=20)
+    parser.add_argument("--max-wait", type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<6} {'quiet p50 ms':>13} {'quiet p99 ms':>13} {'flood p50 ms':>13} {'flood done':>11} {'shed':>6}")
+    for mode in ("fifo", "fair"):
+        result = asyncio.run(scenario(mode, args.flood, args.quiet, args.capacity, args.max_wait))
+        print(f"{mode:<6} {pct(result['quiet'], 0.5):>13.1f} {pct(result['quiet'], 0.99):>13.1f} "
+              f"{statistics.median(result['flood']) * 1000 if result['flood'] else float('nan'):>13.1f} "
+              f"{len(result['flood']):>11} {len(result['shed']):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Bandwidth and latency impact of compressing order payloads, per order size.
+
+For each codec: wire size, compress/decompress CPU time, and the modelled time to move one order over a link of
+--mbps (compress + transfer + decompress) against sending it uncompressed. The last column measures the in-process
+cost of a gzip request body through the app's DecompressionMiddleware (upstream stubbed by FakeUpstream).
+
+    python -m benchmarks.bench_compression --lines 10 100 1000 --mbps 10 100 1000
+"""
+import argparse
+import asyncio
+import gzip
+import os
+import statistics
+import time
+import zlib
+
+os.environ.setdefault("AUTHORIZE_URL_BASE", "https://auth.example.com")
+os.environ.setdefault("RECVUE_API_BASE_URL", "https://tenant.recvue.com/api/v2.0/order/orderlines")
+os.environ.setdefault("RECVUE_API_TOKEN", "bench")
+
+import httpx  # noqa: E402
+from app.utils.compression import Decompressor, brotli  # noqa: E402
+from benchmarks.fake_upstream import UpstreamProfile, UpstreamServer  # noqa: E402
+from benchmarks.loadtest import configure_app_env  # noqa: E402
+from benchmarks.payloads import encode_order  # noqa: E402
+
+CODECS = {
+    "gzip-1": (lambda data: gzip.compress(data, 1, mtime=0), "gzip"),
+    "gzip-5": (lambda data: gzip.compress(data, 5, mtime=0), "gzip"),
+    "gzip-9": (lambda data: gzip.compress(data, 9, mtime=0), "gzip"),
+    "deflate": (lambda data: zlib.compress(data, 6), "deflate"),
+}
+if brotli is not None:
+    CODECS["br-4"] = (lambda data: brotli.compress(data, quality=4), "br")
+    CODECS["br-11"] = (lambda data: brotli.compress(data, quality=11), "br")
+
+
+def best_of(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return min(samples)
+
+
+def transfer_seconds(size: int, mbps: float) -> float:
+    return size * 8 / (mbps * 1_000_000)
+
+
+async def request_latency(client: httpx.AsyncClient, body: bytes, headers: dict, repeat: int) -> float:
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        resp = await client.post("/invoke_order_creation", content=body,
+                                 headers={**headers, "access_token": f"bench-{i}", "Idempotency-Key": f"{time.time()}-{i}"})
+        samples.append(time.perf_counter() - start)
+        assert resp.status_code == 200, resp.text
+    return statistics.median(samples)
+
+
+async def app_overhead(raws, repeat: int):
+    # Plain vs gzip-encoded request body through the full app, in process
+    from app.main import app
+    results = {}
+    headers = {"hostName": "bench.recvue.com", "Content-Type": "application/json"}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://payloadbridge") as client:
+            for line_count, raw in raws.items():
+                compressed = gzip.compress(raw, 5, mtime=0)
+                await request_latency(client, raw, headers, 2)
+                plain = await request_latency(client, raw, headers, repeat)
+                gz = await request_latency(client, compressed, {**headers, "Content-Encoding": "gzip"}, repeat)
+                results[line_count] = (plain, gz)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--mbps", type=float, nargs="+", default=[10, 100, 1000], help="modelled link speeds")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=20, help="requests per body for the in-process measurement")
+    args = parser.parse_args()
+
+    raws = {line_count: encode_order(line_count) for line_count in args.lines}
+    link_headers = "".join(f" {f'{m:g}Mb/s ms':>12}" for m in args.mbps)
+    print(f"{'lines':>6} {'codec':>8} {'bytes':>10} {'ratio':>6} {'comp ms':>8} {'decomp ms':>9}{link_headers}")
+    for line_count, raw in raws.items():
+        links = "".join(f" {transfer_seconds(len(raw), m) * 1000:>12.2f}" for m in args.mbps)
+        print(f"{line_count:>6} {'none':>8} {len(raw):>10} {1.0:>6.1f} {0.0:>8.3f} {0.0:>9.3f}{links}")
+        for name, (compress, encoding) in CODECS.items():
+            body = compress(raw)
+            comp = best_of(lambda: compress(raw), args.repeat)
+            decomp = best_of(lambda: Decompressor(encoding, len(raw)).feed(body), args.repeat)
+            links = "".join(f" {(comp + transfer_seconds(len(body), m) + decomp) * 1000:>12.2f}" for m in args.mbps)
+            print(f"{line_count:>6} {name:>8} {len(body):>10} {len(raw) / len(body):>6.1f} {comp * 1000:>8.3f} {decomp * 1000:>9.3f}{links}")
+
+    with UpstreamServer(UpstreamProfile(recvue_latency=0.0, auth_latency=0.0)) as upstream:
+        configure_app_env(upstream.url)
+        overhead = asyncio.run(app_overhead(raws, args.requests))
+    print()
+    print(f"{'lines':>6} {'plain ms':>9} {'gzip ms':>9} {'delta ms':>9}   (in-process request latency, median)")
+    for line_count, (plain, gz) in overhead.items():
+        print(f"{line_count:>6} {plain * 1000:>9.2f} {gz * 1000:>9.2f} {(gz - plain) * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Throughput of the compiled payload mappings on large orders.
+
+Maps generated orders in the legacy PayloadBridge shape (app/mappings/legacy_payload.yaml) with the compiled
+transform and, for comparison, with a straightforward interpreter that walks the same spec for every field of every
+record. Line records/sec is the number to watch; validation of the mapped order is shown for scale.
+
+    python -m benchmarks.bench_mapping --lines 1 100 1000 10000
+"""
+import argparse
+import os
+import time
+from datetime import date
+from typing import Any, Dict
+
+os.environ.setdefault("AUTHORIZE_URL_BASE", "https://auth.example.com")
+os.environ.setdefault("RECVUE_API_BASE_URL", "https://tenant.recvue.com/api/v2.0/order/orderlines")
+os.environ.setdefault("RECVUE_API_TOKEN", "bench")
+
+from app.models.order_schema import validate_order  # noqa: E402
+from app.services.mapping import DEFAULT_MAPPINGS_DIR, TRANSFORMS, compile_spec, load_spec  # noqa: E402
+
+
+def legacy_order(line_count: int) -> Dict[str, Any]:
+    return {
+        "order_id": 1001,
+        "customer_id": "CUST-12345",
+        "notes": "bench",
+        "order_lines": [{"product_id": f"SKU-{i % 50}", "quantity": i % 7 + 1, "price": "19.90"} for i in range(line_count)],
+    }
+
+
+def interpret_rule(rule: Any, record: Dict[str, Any], index: int) -> Any:
+    rule = {"path": rule} if isinstance(rule, str) else rule
+    if "path" in rule:
+        value = record
+        for part in rule["path"].split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+    elif "index" in rule:
+        value = str(index + rule["index"])
+    elif "today" in rule:
+        value = date.today().isoformat()
+    else:
+        value = rule["const"]
+    if value is None:
+        value = rule.get("default")
+    if value is not None:
+        if "values" in rule:
+            value = rule["values"].get(value, value)
+        transforms = rule.get("transform", [])
+        for name in [transforms] if isinstance(transforms, str) else transforms:
+            value = TRANSFORMS[name](value)
+    if value is None and rule.get("required"):
+        raise ValueError("required")
+    return value
+
+
+def interpret(spec: Dict[str, Any], order: Dict[str, Any]) -> Dict[str, Any]:
+    out = {}
+    for target, rule in spec["header"].items():
+        value = interpret_rule(rule, order, 0)
+        if value is not None:
+            out[target] = value
+    out["orderLines"] = []
+    for i, line in enumerate(order.get(spec["lines"]["from"]) or ()):
+        row = {}
+        for target, rule in spec["lines"]["fields"].items():
+            value = interpret_rule(rule, line, i)
+            if value is not None:
+                row[target] = value
+        out["orderLines"].append(row)
+    return out
+
+
+def rate(fn, order, line_count: int, min_time: float = 0.5) -> float:
+    runs, started = 0, time.perf_counter()
+    while True:
+        fn(order)
+        runs += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            return runs * line_count / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 100, 1000, 10000])
+    args = parser.parse_args()
+
+    spec = load_spec(DEFAULT_MAPPINGS_DIR / "legacy_payload.yaml")
+    started = time.perf_counter()
+    transform = compile_spec(spec)
+    print(f"compile: {(time.perf_counter() - started) * 1000:.2f} ms")
+    print(f"{'lines':>6} {'compiled rec/s':>15} {'interpreted rec/s':>18} {'speedup':>8} {'map ms':>8} {'validate ms':>12}")
+    for line_count in args.lines:
+        order = legacy_order(line_count)
+        assert transform(order) == interpret(spec, order)
+        compiled = rate(transform, order, line_count)
+        interpreted = rate(lambda o: interpret(spec, o), order, line_count)
+        mapped = transform(order)
+        validate = float("inf")
+        for _ in range(3):
+            started = time.perf_counter()
+            validate_order(mapped)
+            validate = min(validate, time.perf_counter() - started)
+        print(f"{line_count:>6} {compiled:>15,.0f} {interpreted:>18,.0f} {compiled / interpreted:>7.1f}x "
+              f"{line_count / compiled * 1000:>8.2f} {validate * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
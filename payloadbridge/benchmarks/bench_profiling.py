@@ -0,0 +1,79 @@
+"""Overhead of the /debug/profile sampler and the event-loop monitor on the work they observe.
+
+Validates a generated order in a loop (CPU-bound, like the request path) and reports throughput alone, while
+sample_stacks() samples the thread at each interval, and on an event loop with and without a LoopMonitor. Runs
+on a shared machine vary by several percent; use a longer --seconds before reading much into small differences.
+
+    python -m benchmarks.bench_profiling --lines 100 --seconds 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+
+os.environ.setdefault("AUTHORIZE_URL_BASE", "https://auth.example.com")
+os.environ.setdefault("RECVUE_API_BASE_URL", "https://tenant.recvue.com/api/v2.0/order/orderlines")
+os.environ.setdefault("RECVUE_API_TOKEN", "bench")
+
+from app.core.profiling import LoopMonitor, sample_stacks  # noqa: E402
+from app.models.order_schema import validate_order  # noqa: E402
+from benchmarks.payloads import build_order  # noqa: E402
+
+
+def throughput(body: bytes, seconds: float) -> float:
+    runs, started = 0, time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        validate_order(body)
+        runs += 1
+    return runs / (time.perf_counter() - started)
+
+
+def with_sampler(body: bytes, seconds: float, interval: float) -> float:
+    target = threading.get_ident()
+    sampler = threading.Thread(target=sample_stacks, args=(seconds, interval, [target]))
+    sampler.start()
+    rate = throughput(body, seconds)
+    sampler.join()
+    return rate
+
+
+async def on_event_loop(body: bytes, seconds: float, monitored: bool) -> float:
+    monitor = LoopMonitor(threshold=0.1)
+    if monitored:
+        monitor.start()
+    runs, started = 0, time.perf_counter()
+    try:
+        while time.perf_counter() - started < seconds:
+            validate_order(body)
+            runs += 1
+            if runs % 5 == 0:
+                await asyncio.sleep(0)  # let the heartbeat run, as requests yield between stages
+    finally:
+        await monitor.stop()
+    return runs / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+    body = json.dumps(build_order(args.lines)).encode()
+    throughput(body, args.seconds / 2)  # warm-up
+
+    base = throughput(body, args.seconds)
+    print(f"{'mode':<24} {'orders/s':>10} {'overhead':>9}")
+    print(f"{'baseline':<24} {base:>10,.0f} {'':>9}")
+    for interval in (0.01, 0.005, 0.001):
+        rate = with_sampler(body, args.seconds, interval)
+        print(f"{f'sampler every {interval * 1000:g} ms':<24} {rate:>10,.0f} {(1 - rate / base) * 100:>8.1f}%")
+    loop_base = asyncio.run(on_event_loop(body, args.seconds, False))
+    rate = asyncio.run(on_event_loop(body, args.seconds, True))
+    print(f"{'event loop':<24} {loop_base:>10,.0f} {'':>9}")
+    print(f"{'event loop + monitor':<24} {rate:>10,.0f} {(1 - rate / loop_base) * 100:>8.1f}%")
+
+
+if __name__ == "__main__":
+    main()
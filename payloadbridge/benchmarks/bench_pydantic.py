@@ -0,0 +1,105 @@
+"""OrderPayload validation cost: the previous Pydantic v1 models vs the v2 (pydantic-core) models.
+
+The v1 models below are the pre-port definitions, run through the `pydantic.v1` compatibility layer.
+
+    python -m benchmarks.bench_pydantic --lines 10 1000 5000
+"""
+import argparse
+import json
+import os
+import time
+from datetime import date
+from enum import Enum
+from typing import List, Optional
+
+os.environ.setdefault("AUTHORIZE_URL_BASE", "https://auth.example.com")
+os.environ.setdefault("RECVUE_API_BASE_URL", "https://tenant.recvue.com/api/v2.0/order/orderlines")
+os.environ.setdefault("RECVUE_API_TOKEN", "bench")
+
+from pydantic import v1  # noqa: E402
+
+from app.models.order_line import OrderPayload  # noqa: E402
+from app.utils import fastjson  # noqa: E402
+from app.utils.validators import validate_evergreen_and_end_date  # noqa: E402
+from benchmarks.payloads import encode_order  # noqa: E402
+
+
+class EvergreenFlagV1(str, Enum):
+    Y = 'Y'
+    N = 'N'
+
+
+class OrderLineV1(v1.BaseModel):
+    lineNumber: str = v1.Field(..., min_length=1, strip_whitespace=True)
+    lineType: str = v1.Field(..., min_length=1, strip_whitespace=True)
+    lineEffectiveStartDate: date
+    lineEffectiveEndDate: Optional[date]
+    lineEvergreenFlag: Optional[EvergreenFlagV1]
+    itemName: Optional[str]
+    itemDescription: Optional[str]
+    uom: Optional[str]
+    quantity: Optional[float] = v1.Field(None, ge=0)
+    unitPrice: Optional[float] = v1.Field(None, ge=0)
+    lineStatus: Optional[str]
+    trackingOptions: Optional[str]
+    lineBillingCycle: Optional[str]
+    lineBillingFrequency: Optional[str]
+    lineInvoicingRule: Optional[str]
+    lineBillingChannel: Optional[str]
+    lineDeliveryChannel: Optional[str]
+
+    @v1.root_validator
+    def validate_evergreen_and_end_date(cls, values):
+        validate_evergreen_and_end_date(values.get('lineEvergreenFlag'), values.get('lineEffectiveEndDate'))
+        return values
+
+
+class OrderPayloadV1(v1.BaseModel):
+    orderNumber: Optional[str]
+    orderType: str = v1.Field(..., min_length=1, strip_whitespace=True)
+    orderCategory: str = v1.Field(..., min_length=1, strip_whitespace=True)
+    businessUnit: str = v1.Field(..., min_length=1, strip_whitespace=True)
+    hdrEffectiveStartDate: date
+    hdrEffectiveEndDate: Optional[date]
+    hdrBillToCustAccountNum: str = v1.Field(..., min_length=1, strip_whitespace=True)
+    hdrEvergreenFlag: Optional[EvergreenFlagV1]
+    orderLines: List[OrderLineV1]
+
+    @v1.root_validator
+    def validate_header_fields(cls, values):
+        if values.get('hdrEvergreenFlag') == EvergreenFlagV1.N and not values.get('hdrEffectiveEndDate'):
+            raise ValueError('hdrEffectiveEndDate is required for non-evergreen orders')
+        return values
+
+    @v1.root_validator
+    def validate_order_lines(cls, values):
+        if not values.get('orderLines'):
+            raise ValueError('At least one order line is required')
+        return values
+
+
+def measure(fn, iterations: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, nargs="+", default=[10, 1000, 5000])
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'lines':>6} {'v1 json+model ms':>17} {'v2 orjson+model ms':>19} {'v2 validate_json ms':>20} {'speedup':>8}")
+    for line_count in args.lines:
+        raw = encode_order(line_count)
+        old = measure(lambda: OrderPayloadV1(**json.loads(raw)), args.iterations)
+        new_dict = measure(lambda: OrderPayload.model_validate(fastjson.loads(raw)), args.iterations)
+        new_json = measure(lambda: OrderPayload.model_validate_json(raw), args.iterations)
+        print(f"{line_count:>6} {old * 1000:>17.2f} {new_dict * 1000:>19.2f} {new_json * 1000:>20.2f} {old / new_json:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Cost of the local reference-data checks, per order size and lookup size.
+
+Times LookupIndex.check on generated orders (valid, so every checked field is looked up) and reports the memory of
+the digest sets against keeping the lookup values as strings. Compare with the authorize + RecVue round trip an
+invalid order otherwise costs before RecVue rejects it.
+
+    python -m benchmarks.bench_reference_data --lines 1 100 1000 --accounts 1000 100000
+"""
+import argparse
+import sys
+import time
+
+from app.services.reference_data import LookupIndex
+from benchmarks.payloads import build_order
+
+
+def lookups_for(order: dict, accounts: int) -> dict:
+    lines = order["orderLines"]
+    return {
+        "ORDER_TYPE": [order["orderType"], "Renewal Order"],
+        "BUSINESS_UNIT": [order["businessUnit"]],
+        "CUSTOMER_ACCOUNT": [order["hdrBillToCustAccountNum"]] + [f"CUST-{i:08d}" for i in range(accounts)],
+        "LINE_TYPE": sorted({line["lineType"] for line in lines}),
+        "BILLING_CHANNEL": sorted({str(order.get("hdrBillingChannel"))} | {str(line.get("lineBillingChannel")) for line in lines}),
+    }
+
+
+def set_bytes(values) -> int:
+    return sys.getsizeof(values) + sum(sys.getsizeof(v) for v in values)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--accounts", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'accounts':>9} {'build ms':>9} {'digest MB':>10} {'str MB':>8} {'lines':>6} {'check us':>9}")
+    for accounts in args.accounts:
+        base = build_order(1)
+        lookups = lookups_for(base, accounts)
+        started = time.perf_counter()
+        index = LookupIndex(lookups, 0.0)
+        build = time.perf_counter() - started
+        digests = set_bytes(next(valid for field, valid, _ in index.header_checks if field == "hdrBillToCustAccountNum"))
+        strings = set_bytes(frozenset(lookups["CUSTOMER_ACCOUNT"]))
+        for line_count in args.lines:
+            order = build_order(line_count)
+            index = LookupIndex(lookups_for(order, accounts), 0.0)
+            assert index.check(order) == []
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                index.check(order)
+            check = (time.perf_counter() - started) / args.repeat
+            print(f"{accounts:>9} {build * 1000:>9.1f} {digests / 1e6:>10.2f} {strings / 1e6:>8.2f} {line_count:>6} {check * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
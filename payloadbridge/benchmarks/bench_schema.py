@@ -0,0 +1,65 @@
+"""Cost of full RecVue schema coverage per ORDER_SCHEMA_MODE, on orders built from docs/OrderLines_API.json.
+
+"eager families" declares every attribute-family member as a regular field, i.e. what a fully hand-written
+schema would cost; "lazy" is the default mode and "lazy+check" adds the on-demand family check.
+
+    python -m benchmarks.bench_schema --lines 10 1000
+"""
+import argparse
+import os
+import time
+from typing import List
+
+os.environ.setdefault("AUTHORIZE_URL_BASE", "https://auth.example.com")
+os.environ.setdefault("RECVUE_API_BASE_URL", "https://tenant.recvue.com/api/v2.0/order/orderlines")
+os.environ.setdefault("RECVUE_API_TOKEN", "bench")
+
+from pydantic import Field, create_model  # noqa: E402
+
+from app.models import order_schema  # noqa: E402
+from benchmarks.payloads import encode_order  # noqa: E402
+
+
+def _eager_models():
+    line_attrs = order_schema.LineAttributes.model_fields
+    header_attrs = order_schema.HeaderAttributes.model_fields
+    line = create_model("EagerLine", __base__=order_schema.FullOrderLine,
+                        **{name: (f.annotation, None) for name, f in line_attrs.items()})
+    return create_model("EagerOrder", __base__=order_schema.FullOrderHeader,
+                        orderLines=(List[line], Field(..., min_length=1)),
+                        **{name: (f.annotation, None) for name, f in header_attrs.items()})
+
+
+def measure(fn, iterations: int) -> float:
+    # Best of `iterations` runs; the minimum is the least noisy estimate of the CPU cost
+    fn()
+    best = float("inf")
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, nargs="+", default=[10, 1000])
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    eager = _eager_models()
+    cases = {
+        "core": lambda raw: order_schema.validate_order(raw, mode="core"),
+        "lazy": lambda raw: order_schema.validate_order(raw, mode="lazy"),
+        "lazy+check": lambda raw: order_schema.validate_order(raw, mode="full"),
+        "eager families": lambda raw: eager.model_validate_json(raw),
+    }
+    print(f"{'lines':>6} " + " ".join(f"{name + ' ms':>18}" for name in cases))
+    for line_count in args.lines:
+        raw = encode_order(line_count)
+        timings = [measure(lambda: fn(raw), args.iterations) for fn in cases.values()]
+        print(f"{line_count:>6} " + " ".join(f"{t * 1000:>18.2f}" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Per-request CPU cost of JSON handling on the invoke_order_creation path.
+
+Compares the previous flow (stdlib parse -> validate -> re-encode the dict on every RecVue attempt ->
+stdlib reply) against the current one (orjson parse -> validate -> forward the received bytes ->
+orjson reply).
+
+    python -m benchmarks.bench_serialization --lines 500 --attempts 3
+"""
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("AUTHORIZE_URL_BASE", "https://auth.example.com")
+os.environ.setdefault("RECVUE_API_BASE_URL", "https://tenant.recvue.com/api/v2.0/order/orderlines")
+os.environ.setdefault("RECVUE_API_TOKEN", "bench")
+
+from app.models.order_line import OrderPayload  # noqa: E402
+from app.utils import fastjson  # noqa: E402
+
+RECVUE_REPLY = {"statusCode": "SUCCESS", "message": "Order created successfully", "id": "12345"}
+
+
+def build_order(line_count: int) -> dict:
+    line = {
+        "lineNumber": "1", "lineType": "Recurring", "itemName": "Monthly Service", "itemDescription": "Premium monthly service package",
+        "quantity": "1", "unitPrice": "100.00", "uom": "Each", "lineEffectiveStartDate": "2024-01-01", "lineEffectiveEndDate": "2024-12-31",
+        "lineBillingCycle": "1st Day of Period", "lineBillingFrequency": "Monthly", "lineInvoicingRule": "Invoice in Advance",
+        "lineBillingChannel": "ATLAS", "lineDeliveryChannel": "Digital", "lineEvergreenFlag": "N",
+    }
+    return {
+        "orderNumber": "ORD-2024-001", "orderType": "Standard Order", "orderCategory": "New", "businessUnit": "US1 Business Unit",
+        "hdrEffectiveStartDate": "2024-01-01", "hdrEffectiveEndDate": "2024-12-31", "hdrBillToCustAccountNum": "CUST-12345",
+        "hdrEvergreenFlag": "N", "orderLines": [dict(line, lineNumber=str(i + 1)) for i in range(line_count)],
+    }
+
+
+def old_path(raw: bytes, attempts: int) -> bytes:
+    body = json.loads(raw)
+    OrderPayload(**body)
+    for _ in range(attempts):
+        json.dumps(body).encode("utf-8")  # httpx `json=body` on each attempt
+    reply = json.loads(json.dumps(RECVUE_REPLY))
+    return json.dumps({"recvue": reply, "request_id": "x", "tenant": "t"}).encode("utf-8")
+
+
+def new_path(raw: bytes, attempts: int) -> bytes:
+    body = fastjson.loads(raw)
+    OrderPayload(**body)
+    for _ in range(attempts):
+        _ = raw  # forwarded as-is on each attempt
+    reply = fastjson.loads(fastjson.dumps(RECVUE_REPLY))
+    return fastjson.dumps({"recvue": reply, "request_id": "x", "tenant": "t"})
+
+
+def measure(fn, raw: bytes, attempts: int, iterations: int) -> float:
+    fn(raw, attempts)
+    start = time.process_time()
+    for _ in range(iterations):
+        fn(raw, attempts)
+    return (time.process_time() - start) / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--attempts", type=int, default=3, help="RecVue attempts per request (1 + retries)")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'lines':>6} {'bytes':>10} {'old ms':>9} {'new ms':>9} {'saved':>7}")
+    for line_count in args.lines:
+        raw = json.dumps(build_order(line_count)).encode("utf-8")
+        old = measure(old_path, raw, args.attempts, args.iterations)
+        new = measure(new_path, raw, args.attempts, args.iterations)
+        print(f"{line_count:>6} {len(raw):>10} {old * 1000:>9.3f} {new * 1000:>9.3f} {(1 - new / old):>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
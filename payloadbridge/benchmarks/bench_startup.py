@@ -0,0 +1,105 @@
+"""Cold start: time from launching a server process to its first successful GET /healthcheck.
+
+Autoscaled pods only take traffic once this has happened. Also reports, in fresh interpreters, the time to
+`import app.main` and to build the app (first access to `app.main.app`), where import-time work shows up.
+
+    python -m benchmarks.bench_startup --runs 10
+    python -m benchmarks.bench_startup --env ORDER_SCHEMA_MODE=core --env LOG_LEVEL=ERROR
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import httpx
+
+PROJECT_DIR = Path(__file__).resolve().parents[1]
+
+IMPORT_SCRIPT = """
+import time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+app.main.app
+print(imported - started, time.perf_counter() - imported)
+"""
+
+
+def app_env(overrides: List[str]) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("AUTHORIZE_URL_BASE", "http://127.0.0.1:9")
+    env.setdefault("RECVUE_API_BASE_URL", "http://127.0.0.1:9")
+    env.setdefault("RECVUE_API_TOKEN", "bench")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env["JOBS_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="payloadbridge-bench-"), "jobs.sqlite3")
+    for override in overrides:
+        name, _, value = override.partition("=")
+        env[name] = value
+    return env
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_times(env: Dict[str, str]) -> Tuple[float, float]:
+    result = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=PROJECT_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    imported, built = result.stdout.split()
+    return float(imported), float(built)
+
+
+def time_to_ready(env: Dict[str, str], timeout: float = 30.0) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+                               "--log-level", "warning"], cwd=PROJECT_DIR, env=env)
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while time.perf_counter() - started < timeout:
+                try:
+                    if client.get(f"http://127.0.0.1:{port}/healthcheck").status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None:
+                    raise RuntimeError(f"server exited with {server.returncode}")
+                time.sleep(0.005)
+        raise RuntimeError(f"server not ready after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def summary(label: str, samples: List[float]) -> str:
+    return f"{label:<24} median {statistics.median(samples) * 1000:8.1f} ms   min {min(samples) * 1000:8.1f} ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="setting for the server")
+    args = parser.parse_args()
+    env = app_env(args.env)
+
+    imports, builds, ready = [], [], []
+    for _ in range(args.runs):
+        imported, built = import_times(env)
+        imports.append(imported)
+        builds.append(built)
+        ready.append(time_to_ready(env))
+    print(summary("import app.main", imports))
+    print(summary("create_app()", builds))
+    print(summary("launch to /healthcheck", ready))
+
+
+if __name__ == "__main__":
+    main()
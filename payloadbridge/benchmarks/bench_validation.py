@@ -0,0 +1,61 @@
+"""Micro-benchmarks for the CPU-bound parts of the order hot path, per order size.
+
+    python -m benchmarks.bench_validation --lines 1 100 1000 --repeat 5
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("AUTHORIZE_URL_BASE", "https://auth.example.com")
+os.environ.setdefault("RECVUE_API_BASE_URL", "https://tenant.recvue.com/api/v2.0/order/orderlines")
+os.environ.setdefault("RECVUE_API_TOKEN", "bench")
+
+from app.models.order_line import OrderPayload  # noqa: E402
+from app.services.line_rules import get_rule_engine  # noqa: E402
+from app.utils import fastjson  # noqa: E402
+from benchmarks.payloads import encode_order  # noqa: E402
+
+
+def timed(fn, repeat: int, number: int) -> float:
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=0.2, help="approximate seconds per measurement sample")
+    args = parser.parse_args()
+
+    engine = get_rule_engine()
+    print(f"{'lines':>6} {'bytes':>10} {'parse ms':>9} {'model ms':>9} {'rules ms':>9} {'total ms':>9} {'lines/s':>10}")
+    for line_count in args.lines:
+        raw = encode_order(line_count)
+        body = fastjson.loads(raw)
+        order = OrderPayload(**body)
+        stages = {
+            "parse": lambda: fastjson.loads(raw),
+            "model": lambda: OrderPayload(**body),
+            "rules": lambda: engine.check_order(order, body.get("hdrIntent")),
+        }
+        results = {}
+        for name, fn in stages.items():
+            start = time.perf_counter()
+            fn()
+            number = max(1, int(args.budget / max(time.perf_counter() - start, 1e-6)))
+            results[name] = timed(fn, args.repeat, number)
+        total = sum(results.values())
+        print(f"{line_count:>6} {len(raw):>10} {results['parse'] * 1000:>9.3f} {results['model'] * 1000:>9.3f} "
+              f"{results['rules'] * 1000:>9.3f} {total * 1000:>9.3f} {line_count / total:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
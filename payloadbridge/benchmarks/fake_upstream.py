@@ -0,0 +1,164 @@
+"""Local stand-in for the authorize service and RecVue's order-lines API.
+
+Runs in a background thread on its own event loop, so its latency never blocks the app under test.
+
+    python -m benchmarks.fake_upstream --port 9100 --recvue-latency 0.05 --recvue-error-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from typing import Optional, Tuple
+
+import uvicorn
+
+AUTHORIZE_PATH = "/api/v2.0/authorize"
+ORDERLINES_SUFFIX = "/api/v2.0/order/orderlines"
+
+
+class UpstreamProfile:
+    def __init__(self, recvue_latency: float = 0.0, recvue_jitter: float = 0.0, recvue_error_rate: float = 0.0,
+                 auth_latency: float = 0.0, auth_error_rate: float = 0.0, seed: Optional[int] = None):
+        self.recvue_latency = recvue_latency
+        self.recvue_jitter = recvue_jitter
+        self.recvue_error_rate = recvue_error_rate
+        self.auth_latency = auth_latency
+        self.auth_error_rate = auth_error_rate
+        self.random = random.Random(seed)
+
+    def recvue_delay(self) -> float:
+        return max(0.0, self.recvue_latency + self.random.uniform(-self.recvue_jitter, self.recvue_jitter))
+
+
+class FakeUpstream:
+    """ASGI app serving GET /api/v2.0/authorize and POST /{tenant}/api/v2.0/order/orderlines."""
+
+    def __init__(self, profile: UpstreamProfile):
+        self.profile = profile
+        self.auth_calls = 0
+        self.recvue_calls = 0
+        self.recvue_bytes = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        path, method = scope["path"], scope["method"]
+        if method == "GET" and path == AUTHORIZE_PATH:
+            await self._authorize(scope, send)
+        elif method == "POST" and path.endswith(ORDERLINES_SUFFIX):
+            await self._orderlines(scope, path[1:-len(ORDERLINES_SUFFIX)], receive, send)
+        else:
+            await _reply(send, 404, {"error": "not found"})
+
+    async def _authorize(self, scope, send):
+        self.auth_calls += 1
+        if self.profile.auth_latency:
+            await asyncio.sleep(self.profile.auth_latency)
+        if self.profile.random.random() < self.profile.auth_error_rate:
+            await _reply(send, 503, {"error": "authorize unavailable"})
+            return
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        host = headers.get("hostname", "bench.recvue.com")
+        await _reply(send, 200, {"x-forwarded-user": "bench-user", "tenantIdentifier": host.split(".")[0], "hostName": host})
+
+    async def _orderlines(self, scope, tenant, receive, send):
+        self.recvue_calls += 1
+        chunks = []
+        more = True
+        while more:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more = message.get("more_body", False)
+        body = b"".join(chunks)
+        self.recvue_bytes += len(body)
+        delay, status = self.recvue_outcome(scope, tenant, body)
+        if delay:
+            await asyncio.sleep(delay)
+        if status >= 400:
+            await _reply(send, status, {"statusCode": "FAILURE", "message": "Service unavailable", "id": None})
+            return
+        await _reply(send, status, {"statusCode": "SUCCESS", "message": "Order created successfully", "id": str(self.recvue_calls), "tenant": tenant})
+
+    def recvue_outcome(self, scope, tenant: str, body: bytes) -> Tuple[float, int]:
+        # (delay, status) of one order-lines call; benchmarks.replay overrides it with recorded timings
+        delay = self.profile.recvue_delay()
+        return delay, 503 if self.profile.random.random() < self.profile.recvue_error_rate else 200
+
+
+async def _reply(send, status: int, body: dict) -> None:
+    payload = json.dumps(body).encode("utf-8")
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())]})
+    await send({"type": "http.response.body", "body": payload})
+
+
+class UpstreamServer:
+    """Runs FakeUpstream under uvicorn in a daemon thread; use as a context manager."""
+
+    def __init__(self, profile: UpstreamProfile, host: str = "127.0.0.1", port: int = 0, app: Optional[FakeUpstream] = None):
+        self.app = app or FakeUpstream(profile)
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning",
+                                                     access_log=False, lifespan="on"))
+        self._thread = threading.Thread(target=self._server.run, name="fake-upstream", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "UpstreamServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("fake upstream failed to start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    server = UpstreamServer(profile_from_args(args), args.host, args.port)
+    with server:
+        print(f"Fake upstream on {server.url}")
+        print(f"  AUTHORIZE_URL_BASE={server.url}")
+        print(f"  RECVUE_ORDERLINES_URL_TEMPLATE={server.url}/{{tenant}}{ORDERLINES_SUFFIX}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--recvue-latency", type=float, default=0.02, help="mean RecVue latency (s)")
+    parser.add_argument("--recvue-jitter", type=float, default=0.01, help="uniform +/- jitter (s)")
+    parser.add_argument("--recvue-error-rate", type=float, default=0.0, help="fraction of RecVue calls answered with 503")
+    parser.add_argument("--auth-latency", type=float, default=0.01, help="authorize latency (s)")
+    parser.add_argument("--auth-error-rate", type=float, default=0.0, help="fraction of authorize calls answered with 503")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def profile_from_args(args: argparse.Namespace) -> UpstreamProfile:
+    return UpstreamProfile(args.recvue_latency, args.recvue_jitter, args.recvue_error_rate,
+                           args.auth_latency, args.auth_error_rate, args.seed)
+
+
+if __name__ == "__main__":
+    main()
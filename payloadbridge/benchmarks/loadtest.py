@@ -0,0 +1,150 @@
+"""Throughput and latency of POST /invoke_order_creation against a local fake authorize + RecVue.
+
+Starts benchmarks.fake_upstream, points the app at it and drives it in-process (httpx ASGITransport) with
+`--concurrency` clients, or drives an already running server with `--target`. Payloads are generated from
+docs/OrderLines_API.json with the requested line counts, each with a unique orderNumber.
+
+    python -m benchmarks.loadtest --requests 2000 --concurrency 50 --lines 1 50 500
+    python -m benchmarks.loadtest --recvue-latency 0.2 --recvue-error-rate 0.05 --json results.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.fake_upstream import ORDERLINES_SUFFIX, UpstreamServer, add_profile_arguments, profile_from_args
+from benchmarks.payloads import encode_order
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def configure_app_env(upstream_url: str) -> None:
+    # Must run before the app first reads its settings (the first access to app.main.app)
+    os.environ["AUTHORIZE_URL_BASE"] = upstream_url
+    os.environ["RECVUE_ORDERLINES_URL_TEMPLATE"] = f"{upstream_url}/{{tenant}}{ORDERLINES_SUFFIX}"
+    os.environ.setdefault("RECVUE_API_BASE_URL", upstream_url)
+    os.environ.setdefault("RECVUE_API_TOKEN", "bench")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("JOBS_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="payloadbridge-bench-"), "jobs.sqlite3"))
+
+
+async def drive(client: httpx.AsyncClient, bodies: List[bytes], concurrency: int, callers: int, endpoint: str) -> Dict:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    next_index = iter(range(len(bodies)))
+
+    async def worker() -> None:
+        for i in next_index:
+            headers = {"access_token": f"bench-token-{i % callers}", "hostName": "bench.recvue.com",
+                       "content-type": "application/json"}
+            started = time.perf_counter()
+            try:
+                resp = await client.post(endpoint, content=bodies[i], headers=headers)
+                statuses[resp.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(bodies), "elapsed_s": round(elapsed, 3), "req_per_s": round(len(bodies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2), "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2), "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "statuses": {str(k): v for k, v in sorted(statuses.items(), key=str)},
+    }
+
+
+async def run(args: argparse.Namespace, upstream: Optional[UpstreamServer]) -> List[Dict]:
+    results = []
+    if args.target:
+        client = httpx.AsyncClient(base_url=args.target, timeout=args.timeout,
+                                   limits=httpx.Limits(max_connections=args.concurrency))
+        lifespan = None
+    else:
+        from app.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://payloadbridge", timeout=args.timeout)
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+    try:
+        for line_count in args.lines:
+            bodies = [encode_order(line_count, f"BENCH-{line_count}-{i}") for i in range(args.requests)]
+            await drive(client, bodies[:args.warmup], args.concurrency, args.callers, args.endpoint)
+            if args.memory:
+                tracemalloc.start()
+            result = await drive(client, bodies[args.warmup:], args.concurrency, args.callers, args.endpoint)
+            if args.memory:
+                result["peak_traced_mib"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+                tracemalloc.stop()
+            result["lines"] = line_count
+            result["body_bytes"] = len(bodies[0])
+            result["max_rss_mib"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+            if upstream:
+                result["recvue_calls"] = upstream.app.recvue_calls
+                result["auth_calls"] = upstream.app.auth_calls
+            results.append(result)
+            print_result(result)
+    finally:
+        await client.aclose()
+        if lifespan:
+            await lifespan.__aexit__(None, None, None)
+    return results
+
+
+def print_result(r: Dict) -> None:
+    memory = f" peak={r['peak_traced_mib']}MiB" if "peak_traced_mib" in r else ""
+    print(f"lines={r['lines']:<5} bytes={r['body_bytes']:<9} req/s={r['req_per_s']:<8} p50={r['p50_ms']}ms p95={r['p95_ms']}ms "
+          f"p99={r['p99_ms']}ms max={r['max_ms']}ms rss={r['max_rss_mib']}MiB{memory} statuses={r['statuses']}")
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict]:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per line count")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--callers", type=int, default=10, help="distinct access tokens (exercises the auth cache)")
+    parser.add_argument("--endpoint", default="/invoke_order_creation")
+    parser.add_argument("--target", help="base URL of a running PayloadBridge; default drives the app in-process")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--memory", action="store_true", help="trace Python allocations (slower)")
+    parser.add_argument("--json", help="write results to this file")
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    args.requests += args.warmup
+
+    upstream = None
+    if not args.target:
+        upstream = UpstreamServer(profile_from_args(args))
+        upstream.__enter__()
+        configure_app_env(upstream.url)
+    try:
+        results = asyncio.run(run(args, upstream))
+    finally:
+        if upstream:
+            upstream.__exit__(None, None, None)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"argv": sys.argv[1:], "results": results}, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
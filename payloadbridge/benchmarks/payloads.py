@@ -0,0 +1,32 @@
+"""Order payloads for the benchmarks, generated from the RecVue sample in docs/OrderLines_API.json."""
+import copy
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict
+
+SAMPLE_PATH = Path(__file__).resolve().parents[2] / "docs" / "OrderLines_API.json"
+
+
+@lru_cache(maxsize=1)
+def load_sample() -> Dict[str, Any]:
+    # The doc is the endpoint, method and "Sample payload:" followed by the JSON body
+    text = SAMPLE_PATH.read_text(encoding="utf-8")
+    return json.loads(text[text.index("{", text.index("Sample payload:")):])
+
+
+def build_order(line_count: int, order_number: str = "BENCH-1") -> Dict[str, Any]:
+    sample = load_sample()
+    lines = sample["orderLines"]
+    order = {k: v for k, v in sample.items() if k != "orderLines"}
+    order["orderNumber"] = order_number
+    order["orderLines"] = []
+    for i in range(line_count):
+        line = copy.copy(lines[i % len(lines)])
+        line["lineNumber"] = str(i + 1)
+        order["orderLines"].append(line)
+    return order
+
+
+def encode_order(line_count: int, order_number: str = "BENCH-1") -> bytes:
+    return json.dumps(build_order(line_count, order_number)).encode("utf-8")
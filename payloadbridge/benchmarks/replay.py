@@ -0,0 +1,231 @@
+"""Replays captured production traffic (CAPTURE_ENABLED) against the app, to compare throughput and tail latency
+between versions on production-shaped load.
+
+Requests are sent at their recorded arrival times, compressed by `--speed` (2 = twice as fast; 0 = back to back
+with `--concurrency` clients), with the recorded bodies, hostName, payload source and per-caller tokens. The
+RecVue stand-in answers each order with the latency and status recorded for it (a recorded transport failure is
+answered with a 503 after the same delay); /authorize answers after the median recorded authorize latency.
+
+    python -m benchmarks.replay capture/ --speed 1
+    python -m benchmarks.replay capture/ --speed 4 --json after.json --compare before.json
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import re
+import resource
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.utils import fastjson
+from benchmarks.fake_upstream import ORDERLINES_SUFFIX, FakeUpstream, UpstreamProfile, UpstreamServer
+from benchmarks.loadtest import configure_app_env, percentile
+
+_ORDER_NUMBER = re.compile(rb'"orderNumber"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def load_records(paths: List[str], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    # Imported here so the environment can be configured before anything reads the settings
+    from app.services.capture import read_capture
+
+    records = []
+    for record in read_capture(paths):
+        if record.get("body") is None:
+            continue
+        records.append(record)
+        if limit and len(records) >= limit:
+            break
+    records.sort(key=lambda r: r["ts"])
+    return records
+
+
+class ReplayUpstream(FakeUpstream):
+    """FakeUpstream answering each order with its recorded RecVue calls, matched by orderNumber (in order, so
+    retries and chunk PUTs replay too); orders it can't match get one of their tenant's recorded calls."""
+
+    def __init__(self, records: List[Dict[str, Any]], profile: UpstreamProfile):
+        super().__init__(profile)
+        self.calls: Dict[str, Deque[Tuple[float, int]]] = defaultdict(deque)
+        self.by_tenant: Dict[str, List[Tuple[float, int]]] = defaultdict(list)
+        self.matched = self.unmatched = 0
+        for record in records:
+            order_number = record["body"].get("orderNumber") if isinstance(record["body"], dict) else None
+            for call in record["calls"]:
+                if call["call"] != "recvue":
+                    continue
+                outcome = (call["seconds"], call["status"] or 503)
+                self.by_tenant[record.get("tenant") or ""].append(outcome)
+                if isinstance(order_number, str):
+                    self.calls[order_number].append(outcome)
+
+    def recvue_outcome(self, scope, tenant: str, body: bytes) -> Tuple[float, int]:
+        if body[:2] == b"\x1f\x8b":
+            body = gzip.decompress(body)
+        match = _ORDER_NUMBER.search(body)
+        recorded = self.calls.get(json.loads(b'"' + match.group(1) + b'"')) if match else None
+        if recorded:
+            self.matched += 1
+            return recorded.popleft()
+        self.unmatched += 1
+        fallback = self.by_tenant.get(tenant)
+        if fallback:
+            return fallback[self.profile.random.randrange(len(fallback))]
+        return super().recvue_outcome(scope, tenant, body)
+
+
+def auth_latency(records: List[Dict[str, Any]]) -> float:
+    samples = [call["seconds"] for record in records for call in record["calls"] if call["call"] == "authorize"]
+    return statistics.median(samples) if samples else 0.0
+
+
+def prepare(record: Dict[str, Any]) -> Tuple[bytes, Dict[str, str]]:
+    headers = dict(record["headers"])
+    headers["access_token"] = f"replay-{record.get('caller') or 'anonymous'}"
+    headers.setdefault("content-type", "application/json")
+    body = fastjson.dumps(record["body"])
+    if headers.get("content-encoding") == "gzip":
+        body = gzip.compress(body, 5)
+    else:
+        headers.pop("content-encoding", None)
+    return body, headers
+
+
+async def replay(client: httpx.AsyncClient, records: List[Dict[str, Any]], speed: float, concurrency: int) -> Dict:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    mismatches: Counter = Counter()
+    lag = [0.0]
+
+    # Encoded up front, so the driver doesn't compete with the app for the event loop
+    prepared = [prepare(record) for record in records]
+
+    async def send(i: int) -> None:
+        record = records[i]
+        body, headers = prepared[i]
+        started = time.perf_counter()
+        try:
+            resp = await client.post(record["path"], content=body, headers=headers)
+            status = resp.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        latencies.append(time.perf_counter() - started)
+        statuses[status] += 1
+        if status != record["status"]:
+            mismatches[f"{record['status']}->{status}"] += 1
+
+    started = time.perf_counter()
+    if speed > 0:
+        # Open loop: requests go out when they are due, however many are still in flight
+        first = records[0]["ts"]
+        tasks = set()
+        for i, record in enumerate(records):
+            due = started + (record["ts"] - first) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lag[0] = max(lag[0], time.perf_counter() - due)
+            task = asyncio.ensure_future(send(i))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+    else:
+        pending = iter(range(len(records)))
+
+        async def worker() -> None:
+            for i in pending:
+                await send(i)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    recorded = sorted(record["elapsed"] for record in records)
+    return {
+        "requests": len(records), "speed": speed, "elapsed_s": round(elapsed, 3), "req_per_s": round(len(records) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2), "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2), "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "recorded_p50_ms": round(percentile(recorded, 50) * 1000, 2), "recorded_p99_ms": round(percentile(recorded, 99) * 1000, 2),
+        "max_send_lag_ms": round(lag[0] * 1000, 2),
+        "statuses": {str(k): v for k, v in sorted(statuses.items(), key=str)},
+        "status_mismatches": dict(mismatches),
+    }
+
+
+async def run(args: argparse.Namespace, records: List[Dict[str, Any]], upstream: Optional[UpstreamServer]) -> Dict:
+    if args.target:
+        client = httpx.AsyncClient(base_url=args.target, timeout=args.timeout, limits=httpx.Limits(max_connections=None))
+        lifespan = None
+    else:
+        from app.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://payloadbridge", timeout=args.timeout)
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+    try:
+        result = await replay(client, records, args.speed, args.concurrency)
+    finally:
+        await client.aclose()
+        if lifespan:
+            await lifespan.__aexit__(None, None, None)
+    result["max_rss_mib"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    if upstream:
+        result["recvue_calls"] = upstream.app.recvue_calls
+        result["recvue_unmatched"] = upstream.app.unmatched
+        result["auth_calls"] = upstream.app.auth_calls
+    return result
+
+
+def print_result(r: Dict, baseline: Optional[Dict] = None) -> None:
+    print(f"requests={r['requests']} speed={r['speed']}x req/s={r['req_per_s']} p50={r['p50_ms']}ms p95={r['p95_ms']}ms "
+          f"p99={r['p99_ms']}ms max={r['max_ms']}ms (recorded p50={r['recorded_p50_ms']}ms p99={r['recorded_p99_ms']}ms) "
+          f"send lag={r['max_send_lag_ms']}ms statuses={r['statuses']} mismatches={r['status_mismatches']}")
+    if baseline:
+        for key in ("req_per_s", "p50_ms", "p95_ms", "p99_ms", "max_ms"):
+            before, after = baseline[key], r[key]
+            change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+            print(f"  {key:<10} {before:>10} -> {after:<10} {change}")
+
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("capture", nargs="+", help="capture segments, or directories of them")
+    parser.add_argument("--speed", type=float, default=1.0, help="arrival-time compression (0 = back to back)")
+    parser.add_argument("--concurrency", type=int, default=20, help="clients when --speed 0")
+    parser.add_argument("--limit", type=int, default=None, help="replay only the first N captured requests")
+    parser.add_argument("--target", help="base URL of a running PayloadBridge pointed at --upstream-port")
+    parser.add_argument("--upstream-port", type=int, default=0, help="port of the RecVue/authorize stand-in")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the result to this file")
+    parser.add_argument("--compare", help="a previous --json result to print the change against")
+    args = parser.parse_args(argv)
+
+    records = load_records(args.capture, args.limit)
+    if not records:
+        parser.error("no replayable requests in the capture")
+    standin = ReplayUpstream(records, UpstreamProfile(auth_latency=auth_latency(records), seed=args.seed))
+    upstream = UpstreamServer(standin.profile, port=args.upstream_port, app=standin)
+    with upstream:
+        if args.target:
+            print(f"Stand-in on {upstream.url}; the target needs AUTHORIZE_URL_BASE={upstream.url} and "
+                  f"RECVUE_ORDERLINES_URL_TEMPLATE={upstream.url}/{{tenant}}{ORDERLINES_SUFFIX}")
+        else:
+            configure_app_env(upstream.url)
+        result = asyncio.run(run(args, records, upstream))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["result"]
+    print_result(result, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"argv": sys.argv[1:], "result": result}, f, indent=2)
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+# gunicorn -c gunicorn.conf.py app.main:app
+from app.server import prepare_workers, worker_count
+
+bind = "0.0.0.0:8000"
+# uvicorn.workers is deprecated in favour of the uvicorn-worker package
+worker_class = "uvicorn_worker.UvicornWorker"
+workers = worker_count()
+# Workers are forked before the app is imported, so each gets its own event loop, HTTP pool and log listener
+preload_app = False
+
+
+def on_starting(server):
+    prepare_workers(server.cfg.workers)